@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+
+# Production launcher settings, read by: gunicorn -c gunicorn.conf.py src.wsgi:app
+# (start.sh runs this for `./start.sh wsgi` and `./start.sh asgi`)
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# WEB_CONCURRENCY is the conventional worker count variable (Heroku, Render, ...)
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+
+# Chats spend most of their time waiting on OpenAI and Shopify, so each
+# worker runs a thread pool. In ASGI mode the worker is an event loop and
+# threads only size the pool behind the plain Flask routes.
+GUNICORN_ASGI = os.getenv('GUNICORN_ASGI', '0') == '1'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+if GUNICORN_ASGI:
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    os.environ.setdefault('ASGI_WSGI_THREADS', str(threads))
+else:
+    worker_class = 'gthread'
+
+# Import the app and create the schema once in the master, then fork.
+# Set GUNICORN_PRELOAD=0 if `kill -HUP` should pick up new code (see
+# DEPLOYMENT_GUIDE.md, "Reloading").
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Long agent turns are bounded by AI_MAX_SECONDS; leave headroom above it
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then; the jitter keeps them from restarting together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Drop connections inherited from the master so workers never share sockets"""
+    from src.main import app
+    from src.models.user import db
+    from src.services.shopify_client import reset_shopify_client
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    reset_shopify_client()
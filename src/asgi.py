@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from a2wsgi import WSGIMiddleware
+from src.main import app as flask_app, init_database
+from src.routes.ai_agent_async import chat, chat_stream, close_async_clients
+from src.services.tracing import (
+    TRACING_ENABLED,
+    current_trace,
+    end_trace,
+    request_finished,
+    request_started,
+    span,
+    start_trace,
+)
+
+# ASGI entry point: uvicorn src.asgi:app --host 0.0.0.0 --port 5000 --workers 2
+#
+# The chat endpoints, which spend seconds waiting on OpenAI and Shopify,
+# run as coroutines so one process can hold hundreds of them open. Every
+# other route is the unchanged Flask app, run on a small thread pool.
+
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 16))
+
+init_database()
+
+wsgi_app = WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)
+
+_COMMON_HEADERS = [
+    # Same CORS policy flask-cors applies to the WSGI routes
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+async def _read_json(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+async def _send_json(send, status, payload):
+    with span('serialize'):
+        body = json.dumps(payload).encode()
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+    ]
+    trace = current_trace()
+    if trace is not None:
+        headers.append((b'server-timing', trace.server_timing().encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': _COMMON_HEADERS + headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_event_stream(send, events):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': _COMMON_HEADERS + [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    try:
+        async for chunk in events:
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    finally:
+        await events.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _chat(scope, receive, send):
+    status, payload = await chat(flask_app, await _read_json(receive))
+    await _send_json(send, status, payload)
+    return status
+
+
+async def _chat_stream(scope, receive, send):
+    status, payload = await chat_stream(flask_app, await _read_json(receive))
+    if status != 200:
+        await _send_json(send, status, payload)
+        return status
+    await _send_event_stream(send, payload)
+    return status
+
+
+async def _traced(handler, scope, receive, send):
+    # Same request histograms and Server-Timing as the Flask routes get
+    trace, token = start_trace()
+    request_started()
+    status = 500
+    try:
+        status = await handler(scope, receive, send)
+    finally:
+        request_finished(scope['method'], scope['path'], status, trace.elapsed())
+        end_trace(token)
+
+
+ASYNC_ROUTES = {
+    ('POST', '/api/ai/chat'): _chat,
+    ('POST', '/api/ai/chat/stream'): _chat_stream,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    handler = ASYNC_ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler is None:
+        await wsgi_app(scope, receive, send)
+        return
+    if TRACING_ENABLED:
+        await _traced(handler, scope, receive, send)
+        return
+    await handler(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(
+        'src.asgi:app',
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', 5000)),
+        workers=int(os.getenv('WEB_CONCURRENCY', 1)),
+    )
@@ -0,0 +1,320 @@
+"""Offline load benchmark for the app
+
+    python -m src.devtools.bench --server wsgi --concurrency 16 --requests 300
+    python -m src.devtools.bench --scenarios chat --shopify-latency 0.1 --openai-latency 0.8
+
+Starts the Shopify and OpenAI stand-ins in-process, launches the app
+against them (`--server dev|wsgi|asgi`) with a throwaway database, drives
+each scenario with --concurrency parallel clients and prints a JSON report:
+per scenario and endpoint p50/p95/p99 latency, requests per second, error
+counts and the upstream Shopify and OpenAI calls the scenario caused.
+
+To benchmark an app that is already running, start it against fixed stub
+ports and pass its address:
+
+    python -m src.devtools.bench --url http://127.0.0.1:5000 --shopify-port 8081 --openai-port 8082
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.devtools.openai_stub import OpenAIStub
+from src.devtools.shopify_stub import ShopifyStub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHAT_MESSAGES = [
+    'Show me my latest products',
+    'What are my recent orders?',
+    'Who are my newest customers?',
+    'Give me an overview of my store, products and orders',
+]
+
+
+def _get(path):
+    return lambda n, run_id: ('GET', path(n) if callable(path) else path, None)
+
+
+# Each endpoint maps request number n to (method, path, JSON body)
+SCENARIOS = {
+    'shopify': {
+        'products': _get('/api/shopify/products?limit=10'),
+        'product': _get(lambda n: f'/api/shopify/product/{n % 50 + 1}'),
+        'orders': _get('/api/shopify/orders?limit=10'),
+        'customers': _get('/api/shopify/customers?limit=10'),
+        'store_info': _get('/api/shopify/store-info'),
+        'stats': _get('/api/shopify/stats'),
+        'search_products': _get(lambda n: f'/api/shopify/search/products?q=product%20{n % 100 + 1}'),
+    },
+    'chat': {
+        'chat': lambda n, run_id: ('POST', '/api/ai/chat', {
+            'message': f'{CHAT_MESSAGES[n % len(CHAT_MESSAGES)]} (request {n})',
+        }),
+    },
+    'users': {
+        'create_user': lambda n, run_id: ('POST', '/api/users', {
+            'username': f'bench-{run_id}-{n}',
+            'email': f'bench-{run_id}-{n}@example.com',
+        }),
+        'list_users': _get('/api/users'),
+    },
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies):
+    """Latency summary in milliseconds"""
+    values = sorted(latencies)
+    if not values:
+        return {}
+    return {
+        'p50': round(percentile(values, 50) * 1000, 2),
+        'p95': round(percentile(values, 95) * 1000, 2),
+        'p99': round(percentile(values, 99) * 1000, 2),
+        'mean': round(sum(values) / len(values) * 1000, 2),
+        'max': round(values[-1] * 1000, 2),
+    }
+
+
+def diff_stats(before, after):
+    """after - before for every number in a (nested) stats dict"""
+    delta = {}
+    for key, value in after.items():
+        if isinstance(value, dict):
+            delta[key] = {k: v for k, v in diff_stats(before.get(key) or {}, value).items() if v}
+        elif isinstance(value, (int, float)):
+            delta[key] = round(value - (before.get(key) or 0), 3)
+    return delta
+
+
+def run_scenario(base_url, endpoints, total, concurrency, run_id, repeat_chat=False, timeout=120):
+    """Send `total` requests round-robin over endpoints; return per-endpoint samples"""
+    names = list(endpoints)
+    counter = itertools.count()
+    local = threading.local()
+    samples = {name: {'latencies': [], 'errors': 0, 'status': {}} for name in names}
+    lock = threading.Lock()
+
+    def one_request(_):
+        n = next(counter)
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        name = names[n % len(names)]
+        method, path, body = endpoints[name](n, run_id)
+        if repeat_chat and body and 'message' in body:
+            body = {'message': CHAT_MESSAGES[n % len(CHAT_MESSAGES)]}
+        started = time.perf_counter()
+        try:
+            response = local.session.request(method, base_url + path, json=body, timeout=timeout)
+            response.content
+            status = response.status_code
+        except requests.RequestException:
+            status = 'connection_error'
+        elapsed = time.perf_counter() - started
+        with lock:
+            sample = samples[name]
+            sample['latencies'].append(elapsed)
+            sample['status'][str(status)] = sample['status'].get(str(status), 0) + 1
+            if status == 'connection_error' or status >= 400:
+                sample['errors'] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total)))
+    return samples
+
+
+def report_scenario(samples, seconds):
+    latencies = [value for sample in samples.values() for value in sample['latencies']]
+    return {
+        'requests': len(latencies),
+        'errors': sum(sample['errors'] for sample in samples.values()),
+        'seconds': round(seconds, 3),
+        'rps': round(len(latencies) / seconds, 2) if seconds else None,
+        'latency_ms': summarize(latencies),
+        'endpoints': {
+            name: {
+                'requests': len(sample['latencies']),
+                'errors': sample['errors'],
+                'status': sample['status'],
+                'latency_ms': summarize(sample['latencies']),
+            }
+            for name, sample in samples.items()
+        },
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(server, port, env, workers, threads, log):
+    """Launch the app in a subprocess; return the Popen"""
+    env = dict(os.environ, **env, PORT=str(port), FLASK_DEBUG='0',
+               WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads))
+    if server == 'dev':
+        command = [sys.executable, 'src/main.py']
+    elif server == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.wsgi:app']
+    else:
+        env['GUNICORN_ASGI'] = '1'
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.asgi:app']
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url, process=None, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'App exited with status {process.returncode} before becoming ready')
+        try:
+            if requests.get(base_url + '/health/ready', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'App at {base_url} did not become ready within {timeout}s')
+
+
+def log_progress(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the app against local Shopify and OpenAI stand-ins')
+    parser.add_argument('--scenarios', default='shopify,chat,users',
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=None, help='unrecorded requests first (default: concurrency)')
+    parser.add_argument('--server', choices=('dev', 'wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--url', help='benchmark an app that is already running instead of starting one')
+    parser.add_argument('--mirror', action='store_true', help='run a full catalog mirror sync first')
+    parser.add_argument('--repeat-chat', action='store_true',
+                        help='reuse identical chat messages (exercises the completion cache)')
+    parser.add_argument('--shopify-port', type=int, default=0)
+    parser.add_argument('--shopify-latency', type=float, default=0.05)
+    parser.add_argument('--shopify-jitter', type=float, default=0.0)
+    parser.add_argument('--shopify-restore-rate', type=float, default=50.0)
+    parser.add_argument('--no-throttle', action='store_true')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--openai-port', type=int, default=0)
+    parser.add_argument('--openai-latency', type=float, default=0.3)
+    parser.add_argument('--openai-jitter', type=float, default=0.0)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--app-log', help='file for the app server output (default: discarded)')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    shopify = ShopifyStub(port=args.shopify_port, products=args.products, orders=args.orders,
+                          customers=args.customers, latency=args.shopify_latency,
+                          jitter=args.shopify_jitter, throttle=not args.no_throttle,
+                          restore_rate=args.shopify_restore_rate).start()
+    openai_stub = OpenAIStub(port=args.openai_port, latency=args.openai_latency,
+                             jitter=args.openai_jitter).start()
+
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    process = None
+    log = open(args.app_log, 'w') if args.app_log else subprocess.DEVNULL
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            process = start_app(args.server, port, {
+                'SHOPIFY_GRAPHQL_URL': shopify.graphql_url,
+                'OPENAI_BASE_URL': openai_stub.url,
+                'OPENAI_API_BASE': openai_stub.url,
+                'OPENAI_API_KEY': 'bench',
+                'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                'CATALOG_SYNC_INTERVAL': '0',
+            }, args.workers, args.threads, log)
+        log_progress(f'Waiting for {base_url} ...')
+        wait_ready(base_url, process)
+
+        if args.mirror:
+            log_progress('Syncing catalog mirror ...')
+            requests.post(base_url + '/api/shopify/mirror/sync', json={'wait': True, 'full': True}, timeout=600)
+
+        run_id = uuid.uuid4().hex[:8]
+        report = {
+            'config': {
+                'server': 'external' if args.url else args.server,
+                'workers': None if args.url else args.workers,
+                'threads': None if args.url else args.threads,
+                'concurrency': args.concurrency,
+                'requests_per_scenario': args.requests,
+                'mirror': args.mirror,
+                'shopify_latency': args.shopify_latency,
+                'openai_latency': args.openai_latency,
+                'throttle': not args.no_throttle,
+            },
+            'scenarios': {},
+        }
+        for name in scenarios:
+            endpoints = SCENARIOS[name]
+            warmup = args.concurrency if args.warmup is None else args.warmup
+            if warmup:
+                run_scenario(base_url, endpoints, warmup, args.concurrency, f'{run_id}w', args.repeat_chat)
+
+            log_progress(f'Running {name}: {args.requests} requests at concurrency {args.concurrency} ...')
+            shopify_before, openai_before = shopify.stats(), openai_stub.stats()
+            started = time.perf_counter()
+            samples = run_scenario(base_url, endpoints, args.requests, args.concurrency, run_id, args.repeat_chat)
+            result = report_scenario(samples, time.perf_counter() - started)
+            result['upstream'] = {
+                'shopify': diff_stats(shopify_before, shopify.stats()),
+                'openai': diff_stats(openai_before, openai_stub.stats()),
+            }
+            report['scenarios'][name] = result
+
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + '\n')
+            log_progress(f'Report written to {args.output}')
+        else:
+            print(output)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.app_log:
+            log.close()
+        shopify.stop()
+        openai_stub.stop()
+
+
+if __name__ == '__main__':
+    main()
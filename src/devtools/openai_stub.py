@@ -0,0 +1,262 @@
+"""Local stand-in for the OpenAI chat completions API
+
+Run it and point the app at it with OPENAI_BASE_URL (read by the openai
+package itself) or OPENAI_API_BASE:
+
+    python -m src.devtools.openai_stub --port 8082 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8082/v1 OPENAI_API_KEY=stub python src/main.py
+
+The "model" is a script: when the latest message is from the user it asks
+for the tools the message mentions (products, orders, customers, store, revenue),
+and once tool results are in it answers with a short summary. Both plain
+and streamed (Server-Sent Events) responses are supported, including the
+usage chunk requested by stream_options.include_usage.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words in the user's message and the tool each one asks for
+TOOL_KEYWORDS = {
+    'product': 'get_products',
+    'order': 'get_orders',
+    'customer': 'get_customers',
+    'store': 'get_store_info',
+    'shop': 'get_store_info',
+    'revenue': 'get_order_analytics',
+    'sales': 'get_order_analytics',
+}
+
+# Arguments for tools that do not take a limit
+TOOL_ARGUMENTS = {
+    'get_store_info': {},
+    'get_order_analytics': {'report': 'summary'},
+}
+
+
+def count_tokens(messages):
+    """Rough prompt size, about four characters per token"""
+    return max(1, len(json.dumps(messages)) // 4)
+
+
+def plan_tool_calls(message, tools, max_tool_calls):
+    """Tool calls the scripted model makes for a user message"""
+    available = {tool['function']['name'] for tool in tools or ()}
+    names = []
+    text = (message or '').lower()
+    for keyword, name in TOOL_KEYWORDS.items():
+        if keyword in text and name in available and name not in names:
+            names.append(name)
+    return [
+        {
+            'id': f'call_{uuid.uuid4().hex[:12]}',
+            'type': 'function',
+            'function': {'name': name, 'arguments': json.dumps(TOOL_ARGUMENTS.get(name, {'limit': 5}))},
+        }
+        for name in names[:max_tool_calls]
+    ]
+
+
+def reply_text(messages):
+    """Final answer once tool results are available"""
+    results = [message for message in messages if message.get('role') == 'tool']
+    if not results:
+        return 'Hello! I can look up products, orders and customers in your store.'
+    size = sum(len(message.get('content') or '') for message in results)
+    return f'I looked that up with {len(results)} tool call(s) and read {size} bytes of store data. Here is a summary.'
+
+
+class OpenAIStub:
+    """In-process HTTP server emulating POST /v1/chat/completions
+
+    latency (plus up to jitter seconds) is spent before the first byte of
+    every response; streamed answers then add token_delay per chunk.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, token_delay=0.0,
+                 max_tool_calls=2):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.max_tool_calls = max_tool_calls
+        self.requests = 0
+        self.streamed = 0
+        self.tool_call_responses = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'streamed': self.streamed,
+                'tool_call_responses': self.tool_call_responses,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+            }
+
+    def complete(self, payload):
+        """Return (assistant message, usage) for a chat completion request"""
+        messages = payload.get('messages') or []
+        last = messages[-1] if messages else {}
+        tool_calls = []
+        if last.get('role') == 'user':
+            tool_calls = plan_tool_calls(last.get('content'), payload.get('tools'), self.max_tool_calls)
+
+        if tool_calls:
+            message = {'role': 'assistant', 'content': None, 'tool_calls': tool_calls}
+            completion_tokens = 20 * len(tool_calls)
+        else:
+            content = reply_text(messages)
+            message = {'role': 'assistant', 'content': content}
+            completion_tokens = max(1, len(content) // 4)
+
+        usage = {
+            'prompt_tokens': count_tokens(messages),
+            'completion_tokens': completion_tokens,
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        with self._lock:
+            self.requests += 1
+            self.streamed += 1 if payload.get('stream') else 0
+            self.tool_call_responses += 1 if tool_calls else 0
+            self.prompt_tokens += usage['prompt_tokens']
+            self.completion_tokens += usage['completion_tokens']
+        return message, usage
+
+    def response_body(self, payload, message, usage):
+        finish_reason = 'tool_calls' if message.get('tool_calls') else 'stop'
+        return {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model') or 'gpt-4',
+            'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+            'usage': usage,
+        }
+
+    def stream_chunks(self, payload, message, usage):
+        """Yield chat.completion.chunk objects for a streamed response"""
+        base = {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': payload.get('model') or 'gpt-4',
+        }
+
+        def chunk(delta, finish_reason=None):
+            return dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': finish_reason}])
+
+        yield chunk({'role': 'assistant', 'content': ''})
+        for index, tool_call in enumerate(message.get('tool_calls') or []):
+            yield chunk({'tool_calls': [{
+                'index': index,
+                'id': tool_call['id'],
+                'type': 'function',
+                'function': {'name': tool_call['function']['name'], 'arguments': ''},
+            }]})
+            yield chunk({'tool_calls': [{
+                'index': index,
+                'function': {'arguments': tool_call['function']['arguments']},
+            }]})
+        words = (message.get('content') or '').split(' ')
+        for index, word in enumerate(words if message.get('content') else []):
+            yield chunk({'content': word if index == 0 else ' ' + word})
+        yield chunk({}, 'tool_calls' if message.get('tool_calls') else 'stop')
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            yield dict(base, choices=[], usage=usage)
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    return self._send_json(404, {'error': {'message': 'Not found'}})
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    return self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+
+                message, usage = stub.complete(payload)
+                delay = stub.latency + random.uniform(0, stub.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if not payload.get('stream'):
+                    return self._send_json(200, stub.response_body(payload, message, usage))
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in stub.stream_chunks(payload, message, usage):
+                    self._write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode())
+                    if stub.token_delay > 0:
+                        time.sleep(stub.token_delay)
+                self._write_chunk(b'data: [DONE]\n\n')
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _write_chunk(self, data):
+                self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+                self.wfile.flush()
+
+            def _send_json(self, status, body):
+                out = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local OpenAI chat completions stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before the first byte')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between streamed chunks')
+    parser.add_argument('--max-tool-calls', type=int, default=2)
+    args = parser.parse_args()
+
+    stub = OpenAIStub(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                      token_delay=args.token_delay, max_tool_calls=args.max_tool_calls)
+    print(f'OpenAI stub listening on {stub.url}')
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,738 @@
+"""Local stand-in for the Shopify Admin GraphQL API
+
+Run it and point the app at it with SHOPIFY_GRAPHQL_URL:
+
+    python -m src.devtools.shopify_stub --port 8081 --products 5000
+    SHOPIFY_GRAPHQL_URL=http://127.0.0.1:8081/graphql.json python src/main.py
+
+It implements just enough of the API for offline work and benchmarks
+(see src/devtools/bench.py): products, orders and customers as paginated
+connections with basic search filters, single-object and count queries,
+shop, productCreate, bulk operations (bulkOperationRunQuery, polling via
+node(id:), and a JSONL result download), query cost and throttling.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def product_node(i, variants_per_product=3):
+    """Synthetic product number i, with its images and variants"""
+    return {
+        'id': f'gid://shopify/Product/{i}',
+        'title': f'Product {i}',
+        'handle': f'product-{i}',
+        'description': f'Description for product {i}',
+        'vendor': f'Vendor {i % 7}',
+        'productType': f'Type {i % 5}',
+        'tags': [f'tag-{i % 3}'],
+        'status': 'ACTIVE',
+        'createdAt': '2024-01-01T00:00:00Z',
+        'updatedAt': '2024-01-02T00:00:00Z',
+        'images': [{'url': f'https://cdn.example.com/product-{i}.jpg', 'altText': f'Product {i}'}],
+        'variants': [
+            {
+                'id': f'gid://shopify/ProductVariant/{i * 100 + v}',
+                'title': f'Variant {v}',
+                'price': f'{(i % 50) + v}.00',
+                'inventoryQuantity': (i * v) % 20,
+                'sku': f'SKU-{i}-{v}',
+                'weight': 0.5,
+                'weightUnit': 'KILOGRAMS',
+            }
+            for v in range(1, variants_per_product + 1)
+        ],
+    }
+
+
+def order_node(i, line_items_per_order=2, customers=50):
+    """Synthetic order number i, with its line items"""
+    total = 0.0
+    items = []
+    for n in range(1, line_items_per_order + 1):
+        product = (i * n) % 97 + 1
+        price = (product % 50) + 1
+        # Every fifth order has 10% off its lines
+        paid = price * n * (0.9 if i % 5 == 0 else 1)
+        total += paid
+        items.append({
+            'id': f'gid://shopify/LineItem/{i * 100 + n}',
+            'title': f'Product {product}',
+            'quantity': n,
+            'sku': f'SKU-{product}-1',
+            'originalUnitPriceSet': {'shopMoney': {'amount': f'{price:.2f}', 'currencyCode': 'USD'}},
+            'discountedTotalSet': {'shopMoney': {'amount': f'{paid:.2f}', 'currencyCode': 'USD'}},
+            'variant': {
+                'id': f'gid://shopify/ProductVariant/{product * 100 + 1}',
+                'title': 'Variant 1',
+                'price': f'{price}.00',
+                'sku': f'SKU-{product}-1',
+            },
+        })
+    day = 1 + (i % 28)
+    # Always one of customer_node(1..customers)
+    customer = i % max(customers, 1) + 1
+    return {
+        'id': f'gid://shopify/Order/{i}',
+        'name': f'#{1000 + i}',
+        'email': f'customer{customer - 1}@example.com',
+        'phone': None,
+        'createdAt': f'2024-02-{day:02d}T12:00:00Z',
+        'updatedAt': f'2024-02-{day:02d}T12:00:00Z',
+        'totalPrice': f'{total:.2f}',
+        'subtotalPrice': f'{total:.2f}',
+        'totalTax': '0.00',
+        'currencyCode': 'USD',
+        'financialStatus': 'PAID',
+        'fulfillmentStatus': 'FULFILLED',
+        'tags': [],
+        'note': None,
+        'customer': {
+            'id': f'gid://shopify/Customer/{customer}',
+            'firstName': f'First{customer}',
+            'lastName': f'Last{customer}',
+            'email': f'customer{customer - 1}@example.com',
+        },
+        'shippingAddress': _address(customer),
+        'lineItems': items,
+    }
+
+
+def customer_node(i):
+    """Synthetic customer number i"""
+    return {
+        'id': f'gid://shopify/Customer/{i}',
+        'firstName': f'First{i}',
+        'lastName': f'Last{i}',
+        'email': f'customer{i - 1}@example.com',
+        'phone': None,
+        'createdAt': '2024-01-01T00:00:00Z',
+        'updatedAt': '2024-01-02T00:00:00Z',
+        'tags': [],
+        'note': None,
+        'ordersCount': '0',
+        'totalSpent': '0.00',
+        'addresses': [dict(_address(i), id=f'gid://shopify/MailingAddress/{i}')],
+    }
+
+
+def _address(i):
+    return {
+        'firstName': f'First{i}',
+        'lastName': f'Last{i}',
+        'address1': f'{i} Main Street',
+        'address2': None,
+        'city': 'Springfield',
+        'province': 'Oregon',
+        'country': 'United States',
+        'zip': '97477',
+        'phone': None,
+    }
+
+
+def synthetic_products(count, variants_per_product=3):
+    """Yield bulk-style JSONL objects for a synthetic catalog"""
+    for i in range(1, count + 1):
+        product = product_node(i, variants_per_product)
+        variants = product.pop('variants')
+        product.pop('images')
+        yield product
+        for variant in variants:
+            yield dict(variant, __parentId=product['id'])
+
+
+def synthetic_orders(count, line_items_per_order=2, customers=50):
+    """Yield bulk-style JSONL objects for a synthetic order history"""
+    for i in range(1, count + 1):
+        order = order_node(i, line_items_per_order, customers)
+        items = order.pop('lineItems')
+        yield order
+        for item in items:
+            yield dict(item, __parentId=order['id'])
+
+
+def synthetic_customers(count):
+    """Yield bulk-style JSONL objects for synthetic customers"""
+    for i in range(1, count + 1):
+        customer = customer_node(i)
+        customer.pop('addresses')
+        yield customer
+
+
+NODE_BUILDERS = {
+    'products': product_node,
+    'orders': order_node,
+    'customers': customer_node,
+}
+
+# Single-object root fields and the connection they belong to
+SINGLE_ROOTS = {'product': 'products', 'order': 'orders', 'customer': 'customers'}
+
+GID_RESOURCES = {'Product': 'products', 'Order': 'orders', 'Customer': 'customers'}
+
+
+# -- A very small GraphQL reader ----------------------------------------
+#
+# Enough of the language to answer the app's own queries: operation
+# headers, aliases, arguments, nested selections and inline fragments.
+# Selections come back as (alias, name, args, children) tuples.
+
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\.\.\.|[{}():$!\[\]=@]|-?\d+(?:\.\d+)?|\w+')
+
+
+class _Parser:
+    def __init__(self, query, variables):
+        self.tokens = _TOKEN_RE.findall(query)
+        self.variables = variables
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def operation(self):
+        """(operation type, operation name, root selections)"""
+        kind, name = 'query', None
+        if self.peek() in ('query', 'mutation', 'subscription'):
+            kind = self.take()
+            if self.peek() not in ('{', '('):
+                name = self.take()
+        if self.peek() == '(':
+            self.skip_group('(', ')')
+        return kind, name, self.selection_set()
+
+    def skip_group(self, opening, closing):
+        depth = 0
+        while self.peek() is not None:
+            token = self.take()
+            if token == opening:
+                depth += 1
+            elif token == closing:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def selection_set(self):
+        fields = []
+        self.take()  # {
+        while self.peek() not in ('}', None):
+            if self.peek() == '...':
+                self.take()
+                if self.peek() == 'on':
+                    self.take()
+                    self.take()
+                fields.extend(self.selection_set())
+                continue
+            alias = name = self.take()
+            if self.peek() == ':':
+                self.take()
+                name = self.take()
+            args = self.arguments() if self.peek() == '(' else {}
+            children = self.selection_set() if self.peek() == '{' else None
+            fields.append((alias, name, args, children))
+        self.take()  # }
+        return fields
+
+    def arguments(self):
+        args = {}
+        self.take()  # (
+        while self.peek() not in (')', None):
+            key = self.take()
+            self.take()  # :
+            args[key] = self.value()
+        self.take()  # )
+        return args
+
+    def value(self):
+        token = self.take()
+        if token == '$':
+            return self.variables.get(self.take())
+        if token == '[':
+            values = []
+            while self.peek() not in (']', None):
+                values.append(self.value())
+            self.take()
+            return values
+        if token == '{':
+            values = {}
+            while self.peek() not in ('}', None):
+                key = self.take()
+                self.take()
+                values[key] = self.value()
+            self.take()
+            return values
+        if token.startswith('"'):
+            return json.loads(token)
+        if token in ('null', 'true', 'false'):
+            return {'null': None, 'true': True, 'false': False}[token]
+        try:
+            return int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                return token  # enum value
+
+
+def parse_operation(query, variables=None):
+    """Parse a GraphQL document into (operation type, name, root selections)"""
+    return _Parser(query or '', variables or {}).operation()
+
+
+def _is_connection(children):
+    return any(name in ('edges', 'nodes', 'pageInfo') for _alias, name, _args, _children in children or ())
+
+
+def _node_selection(children):
+    """The fields selected on each node of a connection"""
+    for _alias, name, _args, sub in children or ():
+        if name == 'nodes':
+            return sub
+        if name == 'edges':
+            for _a, edge_name, _ar, edge_children in sub or ():
+                if edge_name == 'node':
+                    return edge_children
+    return []
+
+
+def query_cost(fields):
+    """Requested cost in the spirit of Shopify's calculator
+
+    Objects cost 1, connections 2 plus `first` times the cost of one node,
+    scalars are free.
+    """
+    cost = 0
+    for _alias, name, args, children in fields:
+        if children is None:
+            continue
+        if 'first' in args or _is_connection(children):
+            cost += 2 + (args.get('first') or 1) * max(1, query_cost(_node_selection(children)))
+        else:
+            cost += 1 + query_cost(children)
+    return cost
+
+
+def select(value, children):
+    """Project a synthetic object onto a selection set"""
+    if children is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [select(item, children) for item in value]
+    return {
+        alias: _select_field(value.get(name), args, sub)
+        for alias, name, args, sub in children
+        if name != '__typename'
+    }
+
+
+def _select_field(value, args, children):
+    if isinstance(value, list):
+        value = value[:args['first']] if args.get('first') else value
+        if _is_connection(children):
+            return connection(value, children, has_next_page=False)
+    return select(value, children)
+
+
+def connection(nodes, children, has_next_page, end_cursor=None):
+    """Wrap nodes in edges/nodes/pageInfo as the selection asks"""
+    node_fields = _node_selection(children)
+    result = {}
+    for alias, name, _args, sub in children:
+        if name == 'edges':
+            result[alias] = [
+                select({'node': node, 'cursor': str(index)}, sub)
+                for index, node in enumerate(nodes)
+            ]
+        elif name == 'nodes':
+            result[alias] = [select(node, node_fields) for node in nodes]
+        elif name == 'pageInfo':
+            result[alias] = select({'hasNextPage': has_next_page, 'endCursor': end_cursor}, sub)
+    return result
+
+
+def search_matcher(search):
+    """Predicate for the subset of Shopify search syntax the app sends"""
+    search = (search or '').strip()
+    if not search:
+        return lambda node: True
+
+    ids = set(re.findall(r'\bid:(\d+)', search))
+    if ids:
+        return lambda node: node['id'].rsplit('/', 1)[-1] in ids
+
+    title = re.search(r'title:\*?([^*\s]+)\*?', search)
+    if title:
+        needle = title.group(1).lower()
+        return lambda node: needle in node.get('title', '').lower()
+
+    # updated_at:>= and other field filters match the whole synthetic data set
+    words = [word.lower() for word in search.split() if ':' not in word and word.upper() not in ('AND', 'OR')]
+    if not words:
+        return lambda node: True
+
+    def matches(node):
+        text = ' '.join(str(node.get(key) or '') for key in ('title', 'firstName', 'lastName', 'email', 'name'))
+        text = text.lower()
+        return all(word in text for word in words)
+
+    return matches
+
+
+class ShopifyStub:
+    """In-process HTTP server emulating the parts of Shopify we use
+
+    Every GraphQL response carries extensions.cost like the real API. With
+    throttle on, requests are charged against a leaky bucket of bucket_size
+    points restoring at restore_rate per second and are rejected with a
+    THROTTLED error when it runs dry. latency (plus up to jitter seconds)
+    is added to every GraphQL response.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, products=100, orders=100, customers=50,
+                 bulk_delay=0.5, latency=0.0, jitter=0.0, throttle=True, bucket_size=1000.0,
+                 restore_rate=50.0):
+        self.counts = {'products': products, 'orders': orders, 'customers': customers}
+        self.bulk_delay = bulk_delay
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.bucket_size = bucket_size
+        self.restore_rate = restore_rate
+        self.operations = {}
+        self.requests = 0
+        self.throttled = 0
+        self.calls = Counter()
+        self._available = bucket_size
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._dir = tempfile.mkdtemp(prefix='shopify-stub-')
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def graphql_url(self):
+        return f'{self.url}/graphql.json'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        """Request counters, by operation name"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'operations': dict(self.calls),
+            }
+
+    # -- GraphQL --------------------------------------------------------
+
+    def handle_graphql(self, payload):
+        query = payload.get('query') or ''
+        variables = payload.get('variables') or {}
+        try:
+            kind, name, fields = parse_operation(query, variables)
+        except (IndexError, TypeError, ValueError) as e:
+            return {'errors': [{'message': f'Could not parse query: {e}'}]}
+
+        cost = min(query_cost(fields), self.bucket_size)
+        with self._lock:
+            self.requests += 1
+            self.calls[name or ','.join(field[1] for field in fields)] += 1
+            status = self._charge(cost)
+        extensions = {'cost': {
+            'requestedQueryCost': cost,
+            'actualQueryCost': None if status is None else cost,
+            'throttleStatus': status or self._throttle_status(),
+        }}
+        if status is None:
+            return {
+                'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+                'extensions': extensions,
+            }
+
+        data = {}
+        errors = []
+        for alias, field_name, args, children in fields:
+            try:
+                data[alias] = self.resolve(kind, field_name, args, children)
+            except KeyError as e:
+                errors.append({'message': f'Field not supported by the Shopify stub: {e}', 'path': [alias]})
+        body = {'data': data, 'extensions': extensions}
+        if errors:
+            body['errors'] = errors
+        return body
+
+    def _charge(self, cost):
+        """Take cost from the bucket; None when it cannot cover it"""
+        now = time.monotonic()
+        self._available = min(self.bucket_size, self._available + (now - self._refilled) * self.restore_rate)
+        self._refilled = now
+        if self.throttle:
+            if cost > self._available:
+                self.throttled += 1
+                return None
+            self._available -= cost
+        return self._throttle_status()
+
+    def _throttle_status(self):
+        return {
+            'maximumAvailable': self.bucket_size,
+            'currentlyAvailable': round(self._available, 1),
+            'restoreRate': self.restore_rate,
+        }
+
+    def resolve(self, kind, name, args, children):
+        """Answer one root field"""
+        if name == 'bulkOperationRunQuery':
+            return select(self._run_bulk(args.get('query') or ''), children)
+        if name == 'node':
+            gid = args.get('id') or ''
+            if '/BulkOperation/' in gid:
+                return select(self._bulk_status(gid), children)
+            return select(self.find_node(gid), children)
+        if name == 'nodes':
+            return [select(self.find_node(gid), children) for gid in args.get('ids') or []]
+        if name == 'shop':
+            return select(self.shop(), children)
+        if name.endswith('Count') and name[:-len('Count')] in self.counts:
+            return select({'count': self.counts[name[:-len('Count')]], 'precision': 'EXACT'}, children)
+        if name in self.counts:
+            return self.connection(name, args, children)
+        if name in SINGLE_ROOTS:
+            return select(self.find_node(args.get('id') or ''), children)
+        if name == 'productCreate':
+            return select(self.create_product(args.get('input') or args.get('product') or {}), children)
+        raise KeyError(name)
+
+    def shop(self):
+        return {
+            'id': 'gid://shopify/Shop/1',
+            'name': 'Stub Store',
+            'email': 'owner@example.com',
+            'domain': 'stub.example.com',
+            'myshopifyDomain': 'stub-store.myshopify.com',
+            'currencyCode': 'USD',
+            'timezone': '(GMT+00:00) UTC',
+            'plan': {'displayName': 'Development'},
+        }
+
+    def find_node(self, gid):
+        """Synthetic object for a product, order or customer GID"""
+        parts = gid.split('/')
+        resource = GID_RESOURCES.get(parts[3]) if len(parts) > 4 else None
+        if resource is None or not parts[4].isdigit():
+            return None
+        index = int(parts[4])
+        if not 1 <= index <= self.counts[resource]:
+            return None
+        return self.build_node(resource, index)
+
+    def build_node(self, resource, index):
+        if resource == 'orders':
+            # Orders only reference customers this stub serves
+            return order_node(index, customers=self.counts['customers'])
+        return NODE_BUILDERS[resource](index)
+
+    def connection(self, resource, args, children):
+        """One page of a resource, honouring first, after and query"""
+        first = args.get('first') or 10
+        after = int(args['after']) if args.get('after') else 0
+        matches = search_matcher(args.get('query'))
+        nodes = []
+        index = after
+        last = None
+        has_next_page = False
+        while index < self.counts[resource]:
+            index += 1
+            node = self.build_node(resource, index)
+            if not matches(node):
+                continue
+            if len(nodes) == first:
+                has_next_page = True
+                break
+            nodes.append(node)
+            last = index
+        return connection(nodes, children, has_next_page, end_cursor=str(last) if last else None)
+
+    def create_product(self, product_input):
+        with self._lock:
+            self.counts['products'] += 1
+            index = self.counts['products']
+        product = product_node(index, variants_per_product=1)
+        product.update({key: value for key, value in product_input.items() if key in product})
+        product['handle'] = (product_input.get('handle')
+                             or re.sub(r'[^a-z0-9]+', '-', product['title'].lower()).strip('-'))
+        return {'product': product, 'userErrors': []}
+
+    # -- Bulk operations ------------------------------------------------
+
+    def _run_bulk(self, bulk_query):
+        match = re.search(r'{\s*(\w+)', bulk_query)
+        resource = match.group(1) if match else None
+        if resource not in self.counts:
+            return {
+                'bulkOperation': None,
+                'userErrors': [{'field': ['query'], 'message': f'Unsupported resource: {resource}'}],
+            }
+
+        with self._lock:
+            op_id = self._next_id
+            self._next_id += 1
+        gid = f'gid://shopify/BulkOperation/{op_id}'
+        self.operations[gid] = {
+            'id': gid,
+            'resource': resource,
+            'started': time.monotonic(),
+            'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'file': None,
+        }
+        return {
+            'bulkOperation': {'id': gid, 'status': 'CREATED'},
+            'userErrors': [],
+        }
+
+    def _write_results(self, operation):
+        generators = {
+            'products': synthetic_products,
+            'orders': lambda count: synthetic_orders(count, customers=self.counts['customers']),
+            'customers': synthetic_customers,
+        }
+        path = os.path.join(self._dir, operation['id'].rsplit('/', 1)[-1] + '.jsonl')
+        count = 0
+        with open(path, 'w') as f:
+            for obj in generators[operation['resource']](self.counts[operation['resource']]):
+                f.write(json.dumps(obj, separators=(',', ':')) + '\n')
+                count += 1
+        operation['file'] = path
+        operation['objectCount'] = count
+        operation['fileSize'] = os.path.getsize(path)
+
+    def _bulk_status(self, gid):
+        operation = self.operations.get(gid)
+        if operation is None:
+            return None
+        elapsed = time.monotonic() - operation['started']
+        if elapsed < self.bulk_delay:
+            return {
+                'id': gid, 'status': 'RUNNING', 'errorCode': None,
+                'createdAt': operation['createdAt'], 'completedAt': None,
+                'objectCount': '0', 'fileSize': None, 'url': None, 'partialDataUrl': None,
+            }
+        if operation['file'] is None:
+            self._write_results(operation)
+        return {
+            'id': gid, 'status': 'COMPLETED', 'errorCode': None,
+            'createdAt': operation['createdAt'],
+            'completedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'objectCount': str(operation['objectCount']),
+            'fileSize': str(operation['fileSize']),
+            'url': f"{self.url}/bulk/{os.path.basename(operation['file'])}",
+            'partialDataUrl': None,
+        }
+
+    def bulk_file(self, name):
+        path = os.path.join(self._dir, os.path.basename(name))
+        return path if os.path.exists(path) else None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    return self._send_json(400, {'errors': [{'message': 'Invalid JSON'}]})
+                body = stub.handle_graphql(payload)
+                delay = stub.latency + random.uniform(0, stub.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                self._send_json(200, body)
+
+            def do_GET(self):
+                if not self.path.startswith('/bulk/'):
+                    return self._send_json(404, {'error': 'Not found'})
+                path = stub.bulk_file(self.path[len('/bulk/'):])
+                if path is None:
+                    return self._send_json(404, {'error': 'Not found'})
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/jsonl')
+                self.send_header('Content-Length', str(os.path.getsize(path)))
+                self.end_headers()
+                with open(path, 'rb') as f:
+                    while True:
+                        chunk = f.read(64 * 1024)
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+
+            def _send_json(self, status, body):
+                out = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local Shopify Admin API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--bulk-delay', type=float, default=0.5)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds')
+    parser.add_argument('--bucket-size', type=float, default=1000.0)
+    parser.add_argument('--restore-rate', type=float, default=50.0)
+    parser.add_argument('--no-throttle', action='store_true', help='report cost but never throttle')
+    args = parser.parse_args()
+
+    stub = ShopifyStub(args.host, args.port, args.products, args.orders, args.customers,
+                       bulk_delay=args.bulk_delay, latency=args.latency, jitter=args.jitter,
+                       throttle=not args.no_throttle, bucket_size=args.bucket_size,
+                       restore_rate=args.restore_rate)
+    print(f'Shopify stub listening on {stub.graphql_url}')
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -3,46 +3,66 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.shopify import shopify_bp
+from src.routes.shopify_bulk import shopify_bulk_bp
+from src.routes.catalog import catalog_bp
+from src.routes.analytics import analytics_bp
+from src.routes.webhooks import webhooks_bp
 from src.routes.ai_agent import ai_agent_bp
+from src.routes.health import health_bp
+from src.routes.metrics import metrics_bp
+from src.services.static_assets import static_assets
+from src.services.storage import init_storage
+from src.services.tracing import TracingJSONProvider
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Response encoding shows up as the 'serialize' span
+app.json = TracingJSONProvider(app)
 
 # Enable CORS for all routes
 CORS(app)
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(shopify_bp, url_prefix='/api/shopify')
+app.register_blueprint(shopify_bulk_bp, url_prefix='/api/shopify/bulk')
+app.register_blueprint(catalog_bp, url_prefix='/api/shopify/mirror')
+app.register_blueprint(analytics_bp, url_prefix='/api/shopify/analytics')
+app.register_blueprint(webhooks_bp, url_prefix='/api/shopify/webhooks')
 app.register_blueprint(ai_agent_bp, url_prefix='/api/ai')
+app.register_blueprint(health_bp, url_prefix='/health')
+app.register_blueprint(metrics_bp, url_prefix='/metrics')
 
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+# DATABASE_URL and DB_* / SQLITE_* settings, see src/services/storage.py
+init_storage(app)
+
+def init_database():
+    """Create missing tables; run once at startup, before any workers fork"""
+    with app.app_context():
+        db.create_all()
+
+# Loaded once: serving a file is a lookup in memory, not a stat per request
+static_assets.load(app.static_folder)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
+    if app.debug:
+        static_assets.reload_if_changed()
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    response = static_assets.response(path) if path else None
+    # Anything else is a client-side route of the single page app
+    if response is None:
+        response = static_assets.response('index.html')
+    if response is None:
+        return "index.html not found", 404
+    return response
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    init_database()
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=os.getenv('FLASK_DEBUG', '1') == '1')
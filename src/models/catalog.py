@@ -0,0 +1,100 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+# Local mirror of Shopify data. Each row keeps the node exactly as the
+# GraphQL API returned it (payload) so reads can be answered in the same
+# shape as a live query, plus the columns needed to filter and sort.
+
+class Product(db.Model):
+    __tablename__ = 'shopify_product'
+
+    id = db.Column(db.String(64), primary_key=True)
+    legacy_id = db.Column(db.BigInteger, nullable=False, index=True)
+    title = db.Column(db.String(255), nullable=False, default='', index=True)
+    handle = db.Column(db.String(255), nullable=True)
+    vendor = db.Column(db.String(255), nullable=True, index=True)
+    product_type = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), nullable=True)
+    tags = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.String(32), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Product {self.id}>'
+
+    def to_node(self):
+        return json.loads(self.payload)
+
+class ProductVariant(db.Model):
+    __tablename__ = 'shopify_product_variant'
+
+    id = db.Column(db.String(64), primary_key=True)
+    product_id = db.Column(db.String(64), db.ForeignKey('shopify_product.id'), nullable=False, index=True)
+    title = db.Column(db.String(255), nullable=True)
+    sku = db.Column(db.String(255), nullable=True, index=True)
+    price = db.Column(db.Float, nullable=True)
+    inventory_quantity = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f'<ProductVariant {self.id}>'
+
+class Order(db.Model):
+    __tablename__ = 'shopify_order'
+
+    id = db.Column(db.String(64), primary_key=True)
+    legacy_id = db.Column(db.BigInteger, nullable=False, index=True)
+    name = db.Column(db.String(64), nullable=True)
+    email = db.Column(db.String(255), nullable=True)
+    customer_id = db.Column(db.String(64), nullable=True, index=True)
+    total_price = db.Column(db.Float, nullable=True)
+    currency_code = db.Column(db.String(8), nullable=True)
+    financial_status = db.Column(db.String(32), nullable=True)
+    created_at = db.Column(db.String(32), nullable=True, index=True)
+    updated_at = db.Column(db.String(32), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Order {self.id}>'
+
+    def to_node(self):
+        return json.loads(self.payload)
+
+class Customer(db.Model):
+    __tablename__ = 'shopify_customer'
+
+    id = db.Column(db.String(64), primary_key=True)
+    legacy_id = db.Column(db.BigInteger, nullable=False, index=True)
+    first_name = db.Column(db.String(255), nullable=True)
+    last_name = db.Column(db.String(255), nullable=True)
+    email = db.Column(db.String(255), nullable=True, index=True)
+    updated_at = db.Column(db.String(32), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Customer {self.id}>'
+
+    def to_node(self):
+        return json.loads(self.payload)
+
+class SyncState(db.Model):
+    __tablename__ = 'shopify_sync_state'
+
+    resource = db.Column(db.String(32), primary_key=True)
+    # Highest updatedAt seen, used as the updated_at:> cursor for the next sync
+    last_updated_at = db.Column(db.String(32), nullable=True)
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+    last_full_sync_at = db.Column(db.DateTime, nullable=True)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'resource': self.resource,
+            'last_updated_at': self.last_updated_at,
+            'last_synced_at': self.last_synced_at.isoformat() + 'Z' if self.last_synced_at else None,
+            'last_full_sync_at': self.last_full_sync_at.isoformat() + 'Z' if self.last_full_sync_at else None,
+            'row_count': self.row_count,
+        }
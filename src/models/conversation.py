@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+class Conversation(db.Model):
+    id = db.Column(db.String(36), primary_key=True)
+    summary = db.Column(db.Text, nullable=True)
+    # Bumped on every write so other workers can tell their cached copy is stale
+    version = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Conversation {self.id}>'
+
+class ConversationMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.String(36), db.ForeignKey('conversation.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(20), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    tokens = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('conversation_id', 'position'),
+    )
+
+    def __repr__(self):
+        return f'<ConversationMessage {self.conversation_id}#{self.position}>'
+
+    def to_message(self):
+        """Return the stored OpenAI chat message dict"""
+        return json.loads(self.content)
@@ -1,9 +1,25 @@
 import os
 import json
+import time
 import openai
-from flask import Blueprint, request, jsonify
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-from src.routes.shopify import make_shopify_request
+from src.routes.analytics import order_analytics
+from src.routes.shopify import (
+    live_search_request,
+    make_shopify_request,
+    product_input,
+    search_locally,
+    submit_product_batch,
+)
+from src.services.catalog_mirror import read_customers, read_orders, read_product, read_products
+from src.services.completion_cache import completion_cache
+from src.services.conversation_store import ConversationConflict, ConversationNotFound, conversation_store
+from src.services.jobs import get_job
+from src.services.tool_compaction import compact_tool_result
+from src.services.tracing import span, traced, traced_iter
 
 load_dotenv()
 
@@ -11,7 +27,59 @@ ai_agent_bp = Blueprint('ai_agent', __name__)
 
 # Initialize OpenAI client
 openai.api_key = os.getenv('OPENAI_API_KEY')
-openai.api_base = os.getenv('OPENAI_API_BASE')
+if os.getenv('OPENAI_API_BASE'):
+    # Paths are appended to base_url as-is, so it must end with a slash
+    openai.base_url = os.getenv('OPENAI_API_BASE').rstrip('/') + '/'
+
+# Tools that only read store data and can safely run side by side
+READ_ONLY_TOOLS = {
+    'get_products',
+    'get_product_by_id',
+    'get_orders',
+    'get_customers',
+    'get_store_info',
+    'search_products',
+    'search_customers',
+    'get_order_analytics',
+    'get_job_status',
+}
+
+# Read-only tools whose answers change without a store data change (so the
+# completion cache would never notice); turns that call them are not cached
+UNCACHEABLE_TOOLS = {
+    'get_job_status',
+}
+
+# Agent loop budgets. Requests may ask for tighter limits, never looser ones.
+AI_MAX_ROUNDS = int(os.getenv('AI_MAX_ROUNDS', 5))
+AI_MAX_TOTAL_TOKENS = int(os.getenv('AI_MAX_TOTAL_TOKENS', 30000))
+AI_MAX_SECONDS = float(os.getenv('AI_MAX_SECONDS', 60))
+
+AI_TOOL_WORKERS = int(os.getenv('AI_TOOL_WORKERS', 4))
+_tool_executor = ThreadPoolExecutor(max_workers=AI_TOOL_WORKERS, thread_name_prefix='ai-tool')
+
+SYSTEM_PROMPT = """You are a helpful AI assistant for a Shopify store. You can help users manage their store by:
+                - Getting product information
+                - Retrieving order details
+                - Managing customer data
+                - Creating new products, one at a time or in bulk
+                - Getting store information
+                - Analyzing sales: revenue over time, average order value, top products and customer cohorts
+                
+                When users ask about their store, use the available functions to get real-time data from their Shopify store.
+                For totals, trends or rankings across orders, use get_order_analytics rather than adding up get_orders results yourself.
+                To create more than a few products, use create_products_batch once instead of calling create_product repeatedly, then check progress with get_job_status.
+                Always provide helpful, accurate responses based on the actual store data.
+                
+                If you need to perform any Shopify operations, use the appropriate function calls.
+                Be conversational and helpful in your responses."""
+
+def build_messages(user_message, conversation_history):
+    """Build the message list sent to the model for one turn"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.extend(conversation_history)
+    messages.append({"role": "user", "content": user_message})
+    return messages
 
 def get_shopify_tools():
     """Define available Shopify tools for the AI agent"""
@@ -37,6 +105,28 @@ def get_shopify_tools():
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_products",
+                "description": "Search products by words or partial words in their title, description, tags, SKU or vendor, best matches first. Prefer this over get_products for fuzzy questions.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Free-text search, e.g. 'blue cotton shirt'"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of products to return (default: 10)",
+                            "default": 10
+                        }
+                    },
+                    "required": ["query"]
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -98,6 +188,28 @@ def get_shopify_tools():
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_customers",
+                "description": "Search customers by name or email (partial words allowed), best matches first",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Free-text search, e.g. 'jane smi' or 'example.com'"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of customers to return (default: 10)",
+                            "default": 10
+                        }
+                    },
+                    "required": ["query"]
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -138,6 +250,119 @@ def get_shopify_tools():
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "create_products_batch",
+                "description": "Create many products at once in the background. Returns a job_id; use get_job_status to follow progress and see per-product errors",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "products": {
+                            "type": "array",
+                            "description": "Products to create",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "title": {
+                                        "type": "string",
+                                        "description": "Product title"
+                                    },
+                                    "descriptionHtml": {
+                                        "type": "string",
+                                        "description": "Product description in HTML format"
+                                    },
+                                    "vendor": {
+                                        "type": "string",
+                                        "description": "Product vendor"
+                                    },
+                                    "productType": {
+                                        "type": "string",
+                                        "description": "Product type"
+                                    },
+                                    "tags": {
+                                        "type": "array",
+                                        "items": {"type": "string"},
+                                        "description": "Product tags"
+                                    },
+                                    "status": {
+                                        "type": "string",
+                                        "enum": ["ACTIVE", "DRAFT", "ARCHIVED"],
+                                        "description": "Product status",
+                                        "default": "DRAFT"
+                                    }
+                                },
+                                "required": ["title"]
+                            }
+                        }
+                    },
+                    "required": ["products"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "get_job_status",
+                "description": "Get the progress of a background job such as create_products_batch, including errors for products that failed",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "Job ID returned when the job was started"
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "get_order_analytics",
+                "description": "Compute sales analytics over all orders: summary (order count, revenue, average order value, repeat-customer rate), revenue per period, top products, or customer cohorts",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "report": {
+                            "type": "string",
+                            "enum": ["summary", "revenue", "top_products", "cohorts"],
+                            "description": "Which report to compute",
+                            "default": "summary"
+                        },
+                        "days": {
+                            "type": "number",
+                            "description": "Only orders from the last N days (default: all orders)"
+                        },
+                        "since": {
+                            "type": "string",
+                            "description": "Only orders created at or after this ISO date, e.g. 2024-01-01"
+                        },
+                        "until": {
+                            "type": "string",
+                            "description": "Only orders created before this ISO date"
+                        },
+                        "period": {
+                            "type": "string",
+                            "enum": ["day", "week", "month"],
+                            "description": "Bucket size for revenue and cohorts (default: day for revenue, month for cohorts)"
+                        },
+                        "by": {
+                            "type": "string",
+                            "enum": ["revenue", "quantity", "orders"],
+                            "description": "Ranking for top_products (default: revenue)",
+                            "default": "revenue"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of top products to return (default: 10)",
+                            "default": 10
+                        }
+                    }
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -151,149 +376,170 @@ def get_shopify_tools():
         }
     ]
 
-def execute_shopify_function(function_name, arguments):
-    """Execute a Shopify function based on the function name and arguments"""
-    try:
-        if function_name == "get_products":
-            query = """
-            query getProducts($first: Int!, $query: String) {
-                products(first: $first, query: $query) {
-                    edges {
-                        node {
-                            id
-                            title
-                            handle
-                            description
-                            vendor
-                            productType
-                            tags
-                            status
-                            createdAt
-                            updatedAt
-                            images(first: 1) {
-                                edges {
-                                    node {
-                                        url
-                                        altText
-                                    }
+def _resolve_search(resource, arguments):
+    search = arguments.get('query', '')
+    limit = arguments.get('limit', 10)
+    result = search_locally(resource, search, limit)
+    if result is not None:
+        return ("result", result)
+    return ("request",) + live_search_request(resource, search, limit)
+
+def resolve_shopify_function(function_name, arguments):
+    """Resolve a tool call to a local answer or the GraphQL request it needs
+
+    Returns ('result', value) when the mirror (or an argument error) answers
+    it, otherwise ('request', query, variables) for the caller to send with
+    its own (sync or async) Shopify client.
+    """
+    if function_name == "get_products":
+        mirrored = read_products(arguments.get('limit', 10), arguments.get('searchTitle', ''))
+        if mirrored is not None:
+            return ("result", mirrored)
+        query = """
+        query getProducts($first: Int!, $query: String) {
+            products(first: $first, query: $query) {
+                edges {
+                    node {
+                        id
+                        title
+                        handle
+                        description
+                        vendor
+                        productType
+                        tags
+                        status
+                        createdAt
+                        updatedAt
+                        images(first: 1) {
+                            edges {
+                                node {
+                                    url
+                                    altText
                                 }
                             }
-                            variants(first: 5) {
-                                edges {
-                                    node {
-                                        id
-                                        title
-                                        price
-                                        inventoryQuantity
-                                        sku
-                                    }
+                        }
+                        variants(first: 5) {
+                            edges {
+                                node {
+                                    id
+                                    title
+                                    price
+                                    inventoryQuantity
+                                    sku
                                 }
                             }
                         }
                     }
                 }
             }
-            """
-            variables = {
-                'first': arguments.get('limit', 10),
-                'query': f'title:*{arguments.get("searchTitle", "")}*' if arguments.get("searchTitle") else ''
-            }
-            return make_shopify_request(query, variables)
+        }
+        """
+        variables = {
+            'first': arguments.get('limit', 10),
+            'query': f'title:*{arguments.get("searchTitle", "")}*' if arguments.get("searchTitle") else ''
+        }
+        return ("request", query, variables)
+        
+    elif function_name == "get_product_by_id":
+        product_id = arguments.get('productId')
+        if not product_id.startswith('gid://shopify/Product/'):
+            product_id = f'gid://shopify/Product/{product_id}'
+
+        mirrored = read_product(product_id)
+        if mirrored is not None:
+            return ("result", mirrored)
             
-        elif function_name == "get_product_by_id":
-            product_id = arguments.get('productId')
-            if not product_id.startswith('gid://shopify/Product/'):
-                product_id = f'gid://shopify/Product/{product_id}'
-                
-            query = """
-            query getProduct($id: ID!) {
-                product(id: $id) {
-                    id
-                    title
-                    handle
-                    description
-                    vendor
-                    productType
-                    tags
-                    status
-                    createdAt
-                    updatedAt
-                    images(first: 10) {
-                        edges {
-                            node {
-                                url
-                                altText
-                            }
+        query = """
+        query getProduct($id: ID!) {
+            product(id: $id) {
+                id
+                title
+                handle
+                description
+                vendor
+                productType
+                tags
+                status
+                createdAt
+                updatedAt
+                images(first: 10) {
+                    edges {
+                        node {
+                            url
+                            altText
                         }
                     }
-                    variants(first: 10) {
-                        edges {
-                            node {
-                                id
-                                title
-                                price
-                                inventoryQuantity
-                                sku
-                                weight
-                                weightUnit
-                            }
+                }
+                variants(first: 10) {
+                    edges {
+                        node {
+                            id
+                            title
+                            price
+                            inventoryQuantity
+                            sku
+                            weight
+                            weightUnit
                         }
                     }
                 }
             }
-            """
-            variables = {'id': product_id}
-            return make_shopify_request(query, variables)
-            
-        elif function_name == "get_orders":
-            query = """
-            query getOrders($first: Int!) {
-                orders(first: $first) {
-                    edges {
-                        node {
+        }
+        """
+        variables = {'id': product_id}
+        return ("request", query, variables)
+        
+    elif function_name == "get_orders":
+        mirrored = read_orders(arguments.get('limit', 10))
+        if mirrored is not None:
+            return ("result", mirrored)
+        query = """
+        query getOrders($first: Int!) {
+            orders(first: $first) {
+                edges {
+                    node {
+                        id
+                        name
+                        email
+                        phone
+                        createdAt
+                        updatedAt
+                        totalPrice
+                        subtotalPrice
+                        totalTax
+                        currencyCode
+                        financialStatus
+                        fulfillmentStatus
+                        tags
+                        note
+                        customer {
                             id
-                            name
+                            firstName
+                            lastName
                             email
+                        }
+                        shippingAddress {
+                            firstName
+                            lastName
+                            address1
+                            address2
+                            city
+                            province
+                            country
+                            zip
                             phone
-                            createdAt
-                            updatedAt
-                            totalPrice
-                            subtotalPrice
-                            totalTax
-                            currencyCode
-                            financialStatus
-                            fulfillmentStatus
-                            tags
-                            note
-                            customer {
-                                id
-                                firstName
-                                lastName
-                                email
-                            }
-                            shippingAddress {
-                                firstName
-                                lastName
-                                address1
-                                address2
-                                city
-                                province
-                                country
-                                zip
-                                phone
-                            }
-                            lineItems(first: 10) {
-                                edges {
-                                    node {
+                        }
+                        lineItems(first: 10) {
+                            edges {
+                                node {
+                                    id
+                                    title
+                                    quantity
+                                    variant {
                                         id
                                         title
-                                        quantity
-                                        variant {
-                                            id
-                                            title
-                                            price
-                                            sku
-                                        }
+                                        price
+                                        sku
                                     }
                                 }
                             }
@@ -301,107 +547,502 @@ def execute_shopify_function(function_name, arguments):
                     }
                 }
             }
-            """
-            variables = {'first': arguments.get('limit', 10)}
-            return make_shopify_request(query, variables)
-            
-        elif function_name == "get_customers":
-            query = """
-            query getCustomers($first: Int!, $query: String) {
-                customers(first: $first, query: $query) {
-                    edges {
-                        node {
+        }
+        """
+        variables = {'first': arguments.get('limit', 10)}
+        return ("request", query, variables)
+        
+    elif function_name == "get_customers":
+        mirrored = read_customers(arguments.get('limit', 10), arguments.get('searchQuery', ''))
+        if mirrored is not None:
+            return ("result", mirrored)
+        query = """
+        query getCustomers($first: Int!, $query: String) {
+            customers(first: $first, query: $query) {
+                edges {
+                    node {
+                        id
+                        firstName
+                        lastName
+                        email
+                        phone
+                        createdAt
+                        updatedAt
+                        tags
+                        note
+                        ordersCount
+                        totalSpent
+                        addresses(first: 5) {
                             id
                             firstName
                             lastName
-                            email
+                            address1
+                            address2
+                            city
+                            province
+                            country
+                            zip
                             phone
-                            createdAt
-                            updatedAt
-                            tags
-                            note
-                            ordersCount
-                            totalSpent
-                            addresses(first: 5) {
-                                id
-                                firstName
-                                lastName
-                                address1
-                                address2
-                                city
-                                province
-                                country
-                                zip
-                                phone
-                            }
                         }
                     }
                 }
             }
-            """
-            variables = {
-                'first': arguments.get('limit', 10),
-                'query': arguments.get('searchQuery', '')
-            }
-            return make_shopify_request(query, variables)
-            
-        elif function_name == "create_product":
-            query = """
-            mutation productCreate($input: ProductInput!) {
-                productCreate(input: $input) {
-                    product {
-                        id
-                        title
-                        handle
-                        status
-                        vendor
-                        productType
-                        tags
-                        createdAt
-                    }
-                    userErrors {
-                        field
-                        message
-                    }
+        }
+        """
+        variables = {
+            'first': arguments.get('limit', 10),
+            'query': arguments.get('searchQuery', '')
+        }
+        return ("request", query, variables)
+        
+    elif function_name == "search_products":
+        return _resolve_search('products', arguments)
+
+    elif function_name == "search_customers":
+        return _resolve_search('customers', arguments)
+        
+    elif function_name == "create_product":
+        query = """
+        mutation productCreate($input: ProductInput!) {
+            productCreate(input: $input) {
+                product {
+                    id
+                    title
+                    handle
+                    status
+                    vendor
+                    productType
+                    tags
+                    createdAt
+                }
+                userErrors {
+                    field
+                    message
                 }
             }
-            """
-            product_input = {
-                'title': arguments['title'],
-                'descriptionHtml': arguments.get('descriptionHtml', ''),
-                'vendor': arguments.get('vendor', ''),
-                'productType': arguments.get('productType', ''),
-                'tags': arguments.get('tags', []),
-                'status': arguments.get('status', 'DRAFT')
-            }
-            variables = {'input': product_input}
-            return make_shopify_request(query, variables)
-            
-        elif function_name == "get_store_info":
-            query = """
-            query {
-                shop {
-                    id
-                    name
-                    email
-                    domain
-                    myshopifyDomain
-                    currencyCode
-                    timezone
-                    plan {
-                        displayName
-                    }
+        }
+        """
+        variables = {'input': product_input(arguments)}
+        return ("request", query, variables)
+
+    elif function_name == "create_products_batch":
+        job, error, _status = submit_product_batch(arguments.get('products'))
+        return ("result", {"error": error} if error else job)
+
+    elif function_name == "get_job_status":
+        job = get_job(arguments.get('job_id', ''))
+        if job is None:
+            return ("result", {"error": "Job not found"})
+        return ("result", _job_summary(job))
+        
+    elif function_name == "get_order_analytics":
+        return ("result", order_analytics(arguments.get('report', 'summary'), arguments))
+
+    elif function_name == "get_store_info":
+        query = """
+        query {
+            shop {
+                id
+                name
+                email
+                domain
+                myshopifyDomain
+                currencyCode
+                timezone
+                plan {
+                    displayName
                 }
             }
-            """
-            return make_shopify_request(query)
-            
-        else:
-            return {"error": f"Unknown function: {function_name}"}
-            
+        }
+        """
+        return ("request", query, None)
+        
+    else:
+        return ("result", {"error": f"Unknown function: {function_name}"})
+
+# Failed items included in get_job_status; the rest are only counted
+AI_JOB_FAILED_ITEMS = int(os.getenv('AI_JOB_FAILED_ITEMS', 20))
+
+def _job_summary(job):
+    """A job's status without per-item results for the items that succeeded"""
+    result = job.pop('result', None) or {}
+    failed_items = [item for item in result.get('items', []) if item.get('userErrors')]
+    if failed_items:
+        job['failed_items'] = failed_items[:AI_JOB_FAILED_ITEMS]
+    return job
+
+@traced('tool')
+def execute_shopify_function(function_name, arguments):
+    """Execute a Shopify function based on the function name and arguments"""
+    try:
+        resolved = resolve_shopify_function(function_name, arguments)
+        if resolved[0] == "result":
+            return resolved[1]
+        return make_shopify_request(resolved[1], resolved[2])
     except Exception as e:
         return {"error": str(e)}
 
+def _message_to_dict(message):
+    """Convert an OpenAI message object into a plain, JSON-serializable dict"""
+    data = {"role": "assistant", "content": message.content}
+    if message.tool_calls:
+        data["tool_calls"] = [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments,
+                },
+            }
+            for tool_call in message.tool_calls
+        ]
+    return data
+
+def _usage_to_dict(usage):
+    return {
+        "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+        "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+        "total_tokens": getattr(usage, 'total_tokens', 0) or 0,
+    }
+
+def _call_tool(tool_call):
+    function_name = tool_call["function"]["name"]
+    try:
+        function_args = json.loads(tool_call["function"]["arguments"] or '{}')
+    except ValueError as e:
+        return {"error": f"Invalid arguments for {function_name}: {e}"}
+    return execute_shopify_function(function_name, function_args)
+
+def _call_tool_in_app(app, tool_call):
+    # Pool threads have no app context of their own; mirror reads need one
+    with app.app_context():
+        return _call_tool(tool_call)
+
+def iter_tool_results(tool_calls):
+    """Execute tool calls and yield (index, result) as each one finishes
+
+    Consecutive read-only calls run in parallel on the tool pool. Any other
+    call (e.g. create_product) waits for the reads before it, runs alone,
+    and finishes before later calls start, so writes keep their order.
+    """
+    if len(tool_calls) == 1:
+        yield 0, _call_tool(tool_calls[0])
+        return
+
+    app = current_app._get_current_object()
+    pending = {}
+    for index, tool_call in enumerate(tool_calls):
+        if tool_call["function"]["name"] in READ_ONLY_TOOLS:
+            # copy_context carries the request's trace into the pool thread
+            pending[_tool_executor.submit(copy_context().run, _call_tool_in_app, app, tool_call)] = index
+            continue
+        for future in as_completed(pending):
+            yield pending[future], future.result()
+        pending = {}
+        yield index, _call_tool(tool_call)
+
+    for future in as_completed(pending):
+        yield pending[future], future.result()
+
+def run_tool_calls(tool_calls):
+    """Execute tool calls and return their results in the original order"""
+    results = [None] * len(tool_calls)
+    for index, result in iter_tool_results(tool_calls):
+        results[index] = result
+    return results
+
+def stream_completion(messages, tools=None):
+    """Stream a chat completion
+
+    Yields ('token', text) for each content delta as it arrives, ('usage',
+    dict) once the API reports token counts, then a final ('message', dict)
+    with the assembled assistant message, including any tool calls the
+    model streamed in fragments.
+    """
+    kwargs = {
+        "model": "gpt-4",
+        "messages": messages,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    if tools:
+        kwargs.update(tools=tools, tool_choice="auto")
+
+    content = []
+    tool_calls = {}
+    for chunk in traced_iter('openai', lambda: openai.chat.completions.create(**kwargs)):
+        if getattr(chunk, 'usage', None):
+            yield 'usage', _usage_to_dict(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield 'token', delta.content
+        for fragment in delta.tool_calls or []:
+            tool_call = tool_calls.setdefault(fragment.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""},
+            })
+            if fragment.id:
+                tool_call["id"] = fragment.id
+            if fragment.function:
+                tool_call["function"]["name"] += fragment.function.name or ''
+                tool_call["function"]["arguments"] += fragment.function.arguments or ''
+
+    message = {"role": "assistant", "content": ''.join(content) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    yield 'message', message
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def complete(messages, tools=None, stream=False):
+    """Run one chat completion, yielding the same events as stream_completion"""
+    if stream:
+        yield from stream_completion(messages, tools)
+        return
+
+    kwargs = {"model": "gpt-4", "messages": messages}
+    if tools:
+        kwargs.update(tools=tools, tool_choice="auto")
+    with span('openai'):
+        response = openai.chat.completions.create(**kwargs)
+    message = _message_to_dict(response.choices[0].message)
+    if message["content"]:
+        yield 'token', message["content"]
+    if getattr(response, 'usage', None):
+        yield 'usage', _usage_to_dict(response.usage)
+    yield 'message', message
+
+def agent_limits(overrides=None):
+    """Resolve the loop budgets for one request
+
+    Raises ValueError for a boolean limit, which would otherwise pass as 1.
+    """
+    limits = {
+        'max_rounds': AI_MAX_ROUNDS,
+        'max_tokens': AI_MAX_TOTAL_TOKENS,
+        'max_seconds': AI_MAX_SECONDS,
+    }
+    if not isinstance(overrides, dict):
+        overrides = {}
+    for key, value in overrides.items():
+        if key in limits and isinstance(value, bool):
+            raise ValueError(f'limits.{key} must be a number')
+        if key in limits and isinstance(value, (int, float)) and value > 0:
+            limits[key] = min(limits[key], type(limits[key])(value))
+    return limits
+
+def _exhausted_budget(limits, tool_rounds, usage, started):
+    if tool_rounds >= limits['max_rounds']:
+        return 'max_rounds'
+    if usage['total_tokens'] >= limits['max_tokens']:
+        return 'max_tokens'
+    if time.perf_counter() - started >= limits['max_seconds']:
+        return 'max_seconds'
+    return None
+
+class AgentLoop:
+    """Bookkeeping for one agent turn: budgets, per-round stats and tool results
+
+    run_agent (and arun_agent in src/routes/ai_agent_async.py) supply the
+    completions and tool results; this class decides when to stop, keeps
+    messages up to date and builds the event payloads both drivers emit.
+    """
+
+    def __init__(self, messages, limits):
+        self.messages = messages
+        self.limits = limits
+        self.started = time.perf_counter()
+        self.tools = get_shopify_tools()
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.compaction = {"raw_bytes": 0, "compact_bytes": 0, "saved_bytes": 0, "saved_tokens": 0}
+        self.rounds = []
+        self.tool_rounds = 0
+        self.stopped_reason = None
+        self.message = None
+
+    def begin_round(self):
+        """Start a round and return the tools to offer (None once a budget is spent)"""
+        self.stopped_reason = _exhausted_budget(self.limits, self.tool_rounds, self.usage, self.started)
+        self.round_info = {'round': len(self.rounds) + 1, 'tool_calls': []}
+        self.round_started = time.perf_counter()
+        return None if self.stopped_reason else self.tools
+
+    def end_completion(self, message, round_usage):
+        """Record the round's completion and return the tool calls it requested"""
+        self.message = message
+        self.messages.append(message)
+        round_info = self.round_info
+        round_info['llm_ms'] = round((time.perf_counter() - self.round_started) * 1000, 1)
+        for key in self.usage:
+            round_info[key] = (round_usage or {}).get(key, 0)
+            self.usage[key] += round_info[key]
+
+        tool_calls = message.get("tool_calls") or []
+        if not tool_calls:
+            self.rounds.append(round_info)
+            return []
+
+        self.tool_rounds += 1
+        self.tool_calls = tool_calls
+        self.tools_started = time.perf_counter()
+        self.contents = [None] * len(tool_calls)
+        round_info['compaction'] = [None] * len(tool_calls)
+        return tool_calls
+
+    def tool_call_event(self, tool_call):
+        return {
+            'id': tool_call["id"],
+            'name': tool_call["function"]["name"],
+            'arguments': tool_call["function"]["arguments"],
+        }
+
+    def add_tool_result(self, index, result):
+        """Compact one tool result and return its 'tool_result' event payload"""
+        tool_call = self.tool_calls[index]
+        name = tool_call["function"]["name"]
+        # Only the compacted form is sent to the model
+        with span('compact'):
+            self.contents[index], stats = compact_tool_result(name, result)
+        self.round_info['compaction'][index] = stats
+        for key in self.compaction:
+            self.compaction[key] += stats[key]
+        return {
+            'id': tool_call["id"],
+            'name': name,
+            'ok': not (isinstance(result, dict) and 'error' in result),
+            'elapsed_ms': round((time.perf_counter() - self.tools_started) * 1000, 1),
+            'saved_bytes': stats['saved_bytes'],
+            'saved_tokens': stats['saved_tokens'],
+        }
+
+    def end_tools(self):
+        """Append the tool messages in call order and close the round"""
+        for tool_call, content in zip(self.tool_calls, self.contents):
+            self.messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": content
+            })
+            self.round_info['tool_calls'].append(tool_call["function"]["name"])
+        self.round_info['tool_ms'] = round((time.perf_counter() - self.tools_started) * 1000, 1)
+        self.rounds.append(self.round_info)
+        return self.round_info
+
+    def result(self):
+        return {
+            'response': self.message["content"],
+            'rounds': self.rounds,
+            'usage': self.usage,
+            'compaction': self.compaction,
+            'stopped_reason': self.stopped_reason or 'completed',
+            'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 1),
+        }
+
+def run_agent(messages, limits, stream=False):
+    """Run the tool-calling loop until the model answers or a budget runs out
+
+    Yields (event, data) pairs: 'token', 'tool_call', 'tool_result', 'round'
+    and finally 'done'. Each round is one completion plus the tool calls it
+    requested. Once the round, token or time budget is spent, the model is
+    asked for a final answer without tools; that last completion is allowed
+    to overrun the time budget. messages is extended in place.
+    """
+    loop = AgentLoop(messages, limits)
+    while True:
+        tools = loop.begin_round()
+        message = None
+        round_usage = None
+        for kind, value in complete(messages, tools, stream):
+            if kind == 'token':
+                yield 'token', value
+            elif kind == 'usage':
+                round_usage = value
+            else:
+                message = value
+
+        tool_calls = loop.end_completion(message, round_usage)
+        if not tool_calls:
+            yield 'round', loop.round_info
+            break
+
+        for tool_call in tool_calls:
+            yield 'tool_call', loop.tool_call_event(tool_call)
+        for index, result in iter_tool_results(tool_calls):
+            yield 'tool_result', loop.add_tool_result(index, result)
+        yield 'round', loop.end_tools()
+
+    yield 'done', loop.result()
+
+def replay_cached_turn(messages, tools):
+    """Return the cached result for this turn, appending its messages, or None"""
+    cached = completion_cache.lookup(list(messages), tools)
+    if cached is None:
+        return None
+    messages.extend(cached['messages'])
+    return dict(cached['result'], cached=True, saved_ms=cached['elapsed_ms'])
+
+class TurnRecorder:
+    """Watches a turn's events and caches the turn if it is safe to replay
+
+    Only turns that finished normally and used nothing but read-only tools
+    (outside UNCACHEABLE_TOOLS) are cached.
+    """
+
+    def __init__(self, messages, tools):
+        self.messages = messages
+        self.tools = tools
+        self.input_messages = list(messages)
+        self.first_new = len(messages)
+        self.cacheable = True
+
+    def observe(self, event, value):
+        if event == 'tool_call':
+            self.cacheable = (self.cacheable and value['name'] in READ_ONLY_TOOLS
+                              and value['name'] not in UNCACHEABLE_TOOLS)
+        elif event == 'tool_result':
+            self.cacheable = self.cacheable and value['ok']
+        elif event == 'done' and self.cacheable and value['stopped_reason'] == 'completed':
+            completion_cache.store(self.input_messages, self.tools, self.messages[self.first_new:], dict(value))
+
+def run_agent_cached(messages, limits, stream=False):
+    """run_agent with the completion cache in front
+
+    A hit replays the cached turn (its messages are appended as if the
+    model had produced them) without calling OpenAI or Shopify.
+    """
+    tools = get_shopify_tools()
+    result = replay_cached_turn(messages, tools)
+    if result is not None:
+        if result['response']:
+            yield 'token', result['response']
+        yield 'done', result
+        return
+
+    recorder = TurnRecorder(messages, tools)
+    for event, value in run_agent(messages, limits, stream):
+        recorder.observe(event, value)
+        yield event, value
+
+def _start_turn(data):
+    """Resolve the conversation for a chat request and build the model input"""
+    conversation_id = data.get('conversation_id') or conversation_store.create()
+    history = conversation_store.history(conversation_id)
+    return conversation_id, history, build_messages(data['message'], history)
+
+# Reported with the answer when a concurrent turn kept the history from being saved
+CONVERSATION_CONFLICT_ERROR = 'Conversation was updated concurrently; this turn was not saved'
+
+def _finish_turn(conversation_id, history, messages):
+    """Persist the user message and everything the agent added this turn"""
+    # messages = [system] + history + [user, ...new messages]
+    return conversation_store.append(conversation_id, messages[len(history) + 1:])
+
 @ai_agent_bp.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages and execute Shopify operations via AI agent"""
@@ -410,81 +1051,92 @@ def chat():
         if not data or 'message' not in data:
             return jsonify({'error': 'Message is required'}), 400
         
-        user_message = data['message']
-        conversation_history = data.get('history', [])
-        
-        # Build the conversation messages
-        messages = [
-            {
-                "role": "system",
-                "content": """You are a helpful AI assistant for a Shopify store. You can help users manage their store by:
-                - Getting product information
-                - Retrieving order details
-                - Managing customer data
-                - Creating new products
-                - Getting store information
-                
-                When users ask about their store, use the available functions to get real-time data from their Shopify store.
-                Always provide helpful, accurate responses based on the actual store data.
-                
-                If you need to perform any Shopify operations, use the appropriate function calls.
-                Be conversational and helpful in your responses."""
-            }
-        ]
-        
-        # Add conversation history
-        messages.extend(conversation_history)
-        
-        # Add the current user message
-        messages.append({"role": "user", "content": user_message})
-        
-        # Make the OpenAI API call with function calling
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            tools=get_shopify_tools(),
-            tool_choice="auto"
-        )
+        try:
+            limits = agent_limits(data.get('limits'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        assistant_message = response.choices[0].message
+        try:
+            conversation_id, history, messages = _start_turn(data)
+        except ConversationNotFound:
+            return jsonify({'error': 'Conversation not found'}), 404
         
-        # Check if the assistant wants to call a function
-        if assistant_message.tool_calls:
-            # Execute the function calls
-            messages.append(assistant_message)
-            
-            for tool_call in assistant_message.tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                # Execute the Shopify function
-                function_result = execute_shopify_function(function_name, function_args)
-                
-                # Add the function result to the conversation
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(function_result)
-                })
-            
-            # Get the final response from the assistant
-            final_response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=messages
-            )
-            
-            final_message = final_response.choices[0].message.content
-        else:
-            final_message = assistant_message.content
+        result = None
+        for event, value in run_agent_cached(messages, limits):
+            if event == 'done':
+                result = value
         
-        return jsonify({
-            'response': final_message,
-            'conversation_history': messages[1:]  # Exclude system message
-        })
+        result['conversation_id'] = conversation_id
+        try:
+            result['conversation'] = _finish_turn(conversation_id, history, messages)
+        except ConversationConflict:
+            # Still hand back the answer; only saving it to the history failed
+            result['error'] = CONVERSATION_CONFLICT_ERROR
+            return jsonify(result), 409
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@ai_agent_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream tool progress and the final answer as Server-Sent Events"""
+    data = request.get_json(silent=True)
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message is required'}), 400
+
+    try:
+        limits = agent_limits(data.get('limits'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        conversation_id, history, messages = _start_turn(data)
+    except ConversationNotFound:
+        return jsonify({'error': 'Conversation not found'}), 404
+
+    def generate():
+        try:
+            # Send something right away so the client knows the turn started
+            yield _sse('start', {'conversation_id': conversation_id, 'limits': limits})
+            for event, value in run_agent_cached(messages, limits, stream=True):
+                if event == 'done':
+                    value['conversation_id'] = conversation_id
+                    try:
+                        value['conversation'] = _finish_turn(conversation_id, history, messages)
+                    except ConversationConflict:
+                        value['error'] = CONVERSATION_CONFLICT_ERROR
+                yield _sse(event, value if event != 'token' else {'content': value})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@ai_agent_bp.route('/conversations/<conversation_id>', methods=['GET'])
+def get_conversation(conversation_id):
+    """Get the user-visible transcript of a conversation"""
+    try:
+        messages = conversation_store.transcript(conversation_id)
+    except ConversationNotFound:
+        return jsonify({'error': 'Conversation not found'}), 404
+    return jsonify({'conversation_id': conversation_id, 'messages': messages})
+
+@ai_agent_bp.route('/conversations/<conversation_id>', methods=['DELETE'])
+def delete_conversation(conversation_id):
+    """Delete a conversation and its stored messages"""
+    if not conversation_store.delete(conversation_id):
+        return jsonify({'error': 'Conversation not found'}), 404
+    return '', 204
+
+@ai_agent_bp.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Get completion cache hit rate and saved latency"""
+    return jsonify({'completion_cache': completion_cache.stats()})
+
 @ai_agent_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import os
+import openai
+from src.routes.ai_agent import (
+    CONVERSATION_CONFLICT_ERROR,
+    READ_ONLY_TOOLS,
+    AgentLoop,
+    TurnRecorder,
+    _finish_turn,
+    _message_to_dict,
+    _sse,
+    _start_turn,
+    _usage_to_dict,
+    agent_limits,
+    get_shopify_tools,
+    replay_cached_turn,
+    resolve_shopify_function,
+)
+from src.services.async_shopify_client import async_make_shopify_request, close_async_shopify_client
+from src.services.conversation_store import ConversationConflict, ConversationNotFound
+from src.services.tracing import span, traced_aiter
+
+# Async counterparts of the /api/ai chat handlers, served by src/asgi.py.
+# While a chat waits on OpenAI or Shopify it holds no thread, only a
+# coroutine; blocking database work goes through asyncio.to_thread.
+
+_openai_client = None
+
+
+def get_async_openai():
+    """Return the process-wide AsyncOpenAI client, creating it on first use"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.AsyncOpenAI(base_url=os.getenv('OPENAI_API_BASE') or None)
+    return _openai_client
+
+
+async def close_async_clients():
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    await close_async_shopify_client()
+
+
+def _run_in_app(app, fn, *args):
+    with app.app_context():
+        return fn(*args)
+
+
+async def in_app_thread(app, fn, *args):
+    """Run blocking app code (database access) off the event loop"""
+    return await asyncio.to_thread(_run_in_app, app, fn, *args)
+
+
+async def astream_completion(messages, tools=None):
+    """Async stream_completion: same ('token' | 'usage' | 'message', value) events"""
+    kwargs = {
+        "model": "gpt-4",
+        "messages": messages,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    if tools:
+        kwargs.update(tools=tools, tool_choice="auto")
+
+    content = []
+    tool_calls = {}
+    async for chunk in traced_aiter('openai', lambda: get_async_openai().chat.completions.create(**kwargs)):
+        if getattr(chunk, 'usage', None):
+            yield 'usage', _usage_to_dict(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield 'token', delta.content
+        for fragment in delta.tool_calls or []:
+            tool_call = tool_calls.setdefault(fragment.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""},
+            })
+            if fragment.id:
+                tool_call["id"] = fragment.id
+            if fragment.function:
+                tool_call["function"]["name"] += fragment.function.name or ''
+                tool_call["function"]["arguments"] += fragment.function.arguments or ''
+
+    message = {"role": "assistant", "content": ''.join(content) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    yield 'message', message
+
+
+async def acomplete(messages, tools=None, stream=False):
+    """Async complete: one chat completion as stream_completion events"""
+    if stream:
+        async for event in astream_completion(messages, tools):
+            yield event
+        return
+
+    kwargs = {"model": "gpt-4", "messages": messages}
+    if tools:
+        kwargs.update(tools=tools, tool_choice="auto")
+    with span('openai'):
+        response = await get_async_openai().chat.completions.create(**kwargs)
+    message = _message_to_dict(response.choices[0].message)
+    if message["content"]:
+        yield 'token', message["content"]
+    if getattr(response, 'usage', None):
+        yield 'usage', _usage_to_dict(response.usage)
+    yield 'message', message
+
+
+async def aexecute_shopify_function(app, function_name, arguments):
+    """Async execute_shopify_function: mirror reads in a thread, live calls via httpx"""
+    with span('tool'):
+        try:
+            resolved = await in_app_thread(app, resolve_shopify_function, function_name, arguments)
+            if resolved[0] == "result":
+                return resolved[1]
+            return await async_make_shopify_request(resolved[1], resolved[2])
+        except Exception as e:
+            return {"error": str(e)}
+
+
+async def _acall_tool(app, index, tool_call):
+    function_name = tool_call["function"]["name"]
+    try:
+        function_args = json.loads(tool_call["function"]["arguments"] or '{}')
+    except ValueError as e:
+        return index, {"error": f"Invalid arguments for {function_name}: {e}"}
+    return index, await aexecute_shopify_function(app, function_name, function_args)
+
+
+async def aiter_tool_results(app, tool_calls):
+    """Async iter_tool_results: reads run concurrently, writes run alone and in order"""
+    pending = []
+    for index, tool_call in enumerate(tool_calls):
+        if tool_call["function"]["name"] in READ_ONLY_TOOLS:
+            pending.append(asyncio.ensure_future(_acall_tool(app, index, tool_call)))
+            continue
+        for future in asyncio.as_completed(pending):
+            yield await future
+        pending = []
+        yield await _acall_tool(app, index, tool_call)
+
+    for future in asyncio.as_completed(pending):
+        yield await future
+
+
+async def arun_agent(app, messages, limits, stream=False):
+    """Async run_agent; yields the same (event, data) pairs"""
+    loop = AgentLoop(messages, limits)
+    while True:
+        tools = loop.begin_round()
+        message = None
+        round_usage = None
+        async for kind, value in acomplete(messages, tools, stream):
+            if kind == 'token':
+                yield 'token', value
+            elif kind == 'usage':
+                round_usage = value
+            else:
+                message = value
+
+        tool_calls = loop.end_completion(message, round_usage)
+        if not tool_calls:
+            yield 'round', loop.round_info
+            break
+
+        for tool_call in tool_calls:
+            yield 'tool_call', loop.tool_call_event(tool_call)
+        async for index, result in aiter_tool_results(app, tool_calls):
+            yield 'tool_result', loop.add_tool_result(index, result)
+        yield 'round', loop.end_tools()
+
+    yield 'done', loop.result()
+
+
+async def arun_agent_cached(app, messages, limits, stream=False):
+    """Async run_agent_cached"""
+    tools = get_shopify_tools()
+    result = replay_cached_turn(messages, tools)
+    if result is not None:
+        if result['response']:
+            yield 'token', result['response']
+        yield 'done', result
+        return
+
+    recorder = TurnRecorder(messages, tools)
+    async for event, value in arun_agent(app, messages, limits, stream):
+        recorder.observe(event, value)
+        yield event, value
+
+
+async def chat(app, data):
+    """Async POST /api/ai/chat; returns (status, payload)"""
+    try:
+        if not data or 'message' not in data:
+            return 400, {'error': 'Message is required'}
+
+        try:
+            limits = agent_limits(data.get('limits'))
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+        try:
+            conversation_id, history, messages = await in_app_thread(app, _start_turn, data)
+        except ConversationNotFound:
+            return 404, {'error': 'Conversation not found'}
+
+        result = None
+        async for event, value in arun_agent_cached(app, messages, limits):
+            if event == 'done':
+                result = value
+
+        result['conversation_id'] = conversation_id
+        try:
+            result['conversation'] = await in_app_thread(app, _finish_turn, conversation_id, history, messages)
+        except ConversationConflict:
+            # Still hand back the answer; only saving it to the history failed
+            result['error'] = CONVERSATION_CONFLICT_ERROR
+            return 409, result
+        return 200, result
+
+    except Exception as e:
+        return 500, {'error': str(e)}
+
+
+async def chat_stream(app, data):
+    """Async POST /api/ai/chat/stream
+
+    Returns (status, payload) for requests rejected up front, otherwise
+    (200, async iterator of Server-Sent Event strings).
+    """
+    if not data or 'message' not in data:
+        return 400, {'error': 'Message is required'}
+
+    try:
+        limits = agent_limits(data.get('limits'))
+    except ValueError as e:
+        return 400, {'error': str(e)}
+
+    try:
+        conversation_id, history, messages = await in_app_thread(app, _start_turn, data)
+    except ConversationNotFound:
+        return 404, {'error': 'Conversation not found'}
+
+    async def generate():
+        try:
+            yield _sse('start', {'conversation_id': conversation_id, 'limits': limits})
+            async for event, value in arun_agent_cached(app, messages, limits, stream=True):
+                if event == 'done':
+                    value['conversation_id'] = conversation_id
+                    try:
+                        value['conversation'] = await in_app_thread(
+                            app, _finish_turn, conversation_id, history, messages
+                        )
+                    except ConversationConflict:
+                        value['error'] = CONVERSATION_CONFLICT_ERROR
+                yield _sse(event, value if event != 'token' else {'content': value})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+
+    return 200, generate()
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify
+from src.routes.shopify import ShopifyQueryError, iter_connection
+from src.services.catalog_mirror import read_order_nodes
+from src.services.order_analytics import OrderFrame, cohorts, revenue_by_period, summary, top_products
+from src.services.shopify_cache import shopify_cache
+from src.services.singleflight import SingleFlight
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Orders read from the live API per report; the mirror has no cap
+ANALYTICS_MAX_ORDERS = int(os.getenv('ANALYTICS_MAX_ORDERS', 20000))
+# Loaded order columns are reused for this long (or until store data changes)
+ANALYTICS_CACHE_TTL = float(os.getenv('ANALYTICS_CACHE_TTL', 60))
+ANALYTICS_CACHE_SIZE = int(os.getenv('ANALYTICS_CACHE_SIZE', 8))
+
+# Only the fields the reports use. Line revenue is what the customer paid
+# (discountedTotalSet), not the variant's current price; the line's own sku
+# survives the variant being deleted. Each line costs 2 points (the MoneyBag
+# and its MoneyV2), so an order is 1 + 2 + 20 x 2 = 43 and 23 orders keep a
+# page (991) under Shopify's 1000-point query cost limit.
+ANALYTICS_ORDERS_QUERY = """
+query getAnalyticsOrders($first: Int!, $after: String, $query: String) {
+    orders(first: $first, after: $after, query: $query) {
+        pageInfo {
+            hasNextPage
+            endCursor
+        }
+        edges {
+            node {
+                id
+                createdAt
+                totalPrice
+                currencyCode
+                customer {
+                    id
+                }
+                lineItems(first: 20) {
+                    edges {
+                        node {
+                            title
+                            quantity
+                            sku
+                            discountedTotalSet {
+                                shopMoney {
+                                    amount
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+ANALYTICS_PAGE_SIZE = 23
+
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+_frame_flight = SingleFlight()
+
+
+def _timestamp(value, name):
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 date or timestamp')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def order_window(arguments):
+    """(since, until) as UTC ISO timestamps from since/until or days; None means unbounded
+
+    days=N starts at midnight UTC N days ago (on the minute for fractional N).
+    """
+    since = arguments.get('since')
+    until = arguments.get('until')
+    days = arguments.get('days')
+    if days is not None and not since:
+        try:
+            days = float(days)
+        except (TypeError, ValueError):
+            raise ValueError('days must be a number')
+        since = datetime.utcnow() - timedelta(days=days)
+        # Rounded down so repeated calls share one cache key: whole days
+        # start at midnight UTC, fractional ones on the minute
+        if days == int(days):
+            since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            since = since.replace(second=0, microsecond=0)
+        since = since.isoformat()
+    return (
+        _timestamp(since, 'since') if since else None,
+        _timestamp(until, 'until') if until else None,
+    )
+
+
+def _load_frame(since, until):
+    mirrored = read_order_nodes(since, until)
+    if mirrored is not None:
+        nodes, age = mirrored
+        return OrderFrame(nodes), {'source': 'mirror', 'age_seconds': round(age, 1), 'truncated': False}
+
+    filters = []
+    if since:
+        filters.append(f"created_at:>='{since}'")
+    if until:
+        filters.append(f"created_at:<'{until}'")
+    nodes = list(iter_connection(ANALYTICS_ORDERS_QUERY, 'orders', {'query': ' '.join(filters)},
+                                 page_size=ANALYTICS_PAGE_SIZE, max_items=ANALYTICS_MAX_ORDERS))
+    return OrderFrame(nodes), {'source': 'live', 'age_seconds': 0.0, 'truncated': len(nodes) >= ANALYTICS_MAX_ORDERS}
+
+
+def order_frame(since=None, until=None):
+    """Columnar orders for a window, from the mirror when fresh, else paged from Shopify"""
+    key = (since, until)
+    data_version = shopify_cache.data_version
+    with _frames_lock:
+        cached = _frames.get(key)
+        if cached is not None and time.time() - cached[0] < ANALYTICS_CACHE_TTL and cached[1] == data_version:
+            _frames.move_to_end(key)
+            return cached[2], cached[3]
+
+    (frame, meta), _shared = _frame_flight.do(key, lambda: _load_frame(since, until))
+    with _frames_lock:
+        _frames[key] = (time.time(), data_version, frame, meta)
+        _frames.move_to_end(key)
+        while len(_frames) > ANALYTICS_CACHE_SIZE:
+            _frames.popitem(last=False)
+    return frame, meta
+
+
+def _limit(arguments, default=10):
+    try:
+        return max(1, min(int(arguments.get('limit', default)), 250))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+
+
+REPORTS = {
+    'summary': lambda frame, arguments: summary(frame),
+    'revenue': lambda frame, arguments: revenue_by_period(frame, arguments.get('period', 'day')),
+    'top_products': lambda frame, arguments: top_products(frame, arguments.get('by', 'revenue'), _limit(arguments)),
+    'cohorts': lambda frame, arguments: cohorts(frame, arguments.get('period', 'month')),
+}
+
+
+def order_analytics(report, arguments):
+    """Run one report over the orders in the requested window
+
+    Raises ValueError for bad arguments and ShopifyQueryError when orders
+    could not be fetched.
+    """
+    if report not in REPORTS:
+        raise ValueError(f"report must be one of {', '.join(REPORTS)}")
+    since, until = order_window(arguments)
+    frame, meta = order_frame(since, until)
+    return {
+        'report': report,
+        'since': since,
+        'until': until,
+        'orders': len(frame),
+        **meta,
+        'result': REPORTS[report](frame, arguments),
+    }
+
+
+def _report_response(report):
+    try:
+        return jsonify(order_analytics(report, request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ShopifyQueryError as e:
+        return jsonify({'error': str(e)}), 502
+
+
+@analytics_bp.route('/summary', methods=['GET'])
+def get_summary():
+    """Order count, revenue, average order value and repeat-customer rate"""
+    return _report_response('summary')
+
+
+@analytics_bp.route('/revenue', methods=['GET'])
+def get_revenue():
+    """Revenue, orders and AOV per day, week or month (?period=)"""
+    return _report_response('revenue')
+
+
+@analytics_bp.route('/top-products', methods=['GET'])
+def get_top_products():
+    """Best-selling products by revenue, quantity or orders (?by=&limit=)"""
+    return _report_response('top_products')
+
+
+@analytics_bp.route('/cohorts', methods=['GET'])
+def get_cohorts():
+    """Customers by first-order period, with their activity in later periods"""
+    return _report_response('cohorts')
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from datetime import datetime
+import requests
+from flask import Blueprint, current_app, request, jsonify
+from src.routes.shopify import (
+    CUSTOMERS_PAGE_QUERY,
+    ORDERS_PAGE_QUERY,
+    ShopifyQueryError,
+    iter_connection,
+)
+from src.routes.shopify_bulk import BulkOperationError, export_resource
+from src.services.catalog_mirror import (
+    MIRROR_MODELS,
+    get_sync_state,
+    legacy_id,
+    mirror_status,
+    record_sync,
+    sweep,
+    upsert_nodes,
+)
+from src.services.shopify_cache import shopify_cache
+
+catalog_bp = Blueprint('catalog', __name__)
+
+# Seconds between background syncs in each worker; 0 leaves syncing to
+# POST /api/shopify/mirror/sync (or webhooks)
+CATALOG_SYNC_INTERVAL = float(os.getenv('CATALOG_SYNC_INTERVAL', 0))
+CATALOG_SYNC_BATCH = int(os.getenv('CATALOG_SYNC_BATCH', 500))
+CATALOG_BULK_TIMEOUT = float(os.getenv('CATALOG_BULK_TIMEOUT', 3600))
+
+# The mirror answers single-product reads too, so it keeps more images and
+# variants per product than the list query selects
+MIRROR_PRODUCTS_QUERY = """
+query getMirrorProducts($first: Int!, $after: String, $query: String) {
+    products(first: $first, after: $after, query: $query) {
+        pageInfo {
+            hasNextPage
+            endCursor
+        }
+        edges {
+            node {
+                id
+                title
+                handle
+                description
+                vendor
+                productType
+                tags
+                status
+                createdAt
+                updatedAt
+                images(first: 10) {
+                    edges {
+                        node {
+                            url
+                            altText
+                        }
+                    }
+                }
+                variants(first: 100) {
+                    edges {
+                        node {
+                            id
+                            title
+                            price
+                            inventoryQuantity
+                            sku
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+SYNC_QUERIES = {
+    'products': MIRROR_PRODUCTS_QUERY,
+    'orders': ORDERS_PAGE_QUERY,
+    'customers': CUSTOMERS_PAGE_QUERY,
+}
+
+_sync_lock = threading.Lock()
+_sync_worker = {'pid': None}
+_last_sync = {}
+
+
+def _write_batches(resource, nodes, synced_at):
+    """Upsert nodes in batches; return (count, highest updatedAt)"""
+    count = 0
+    last_updated_at = None
+    batch = []
+    for node in nodes:
+        batch.append(node)
+        updated_at = node.get('updatedAt')
+        if updated_at and (last_updated_at is None or updated_at > last_updated_at):
+            last_updated_at = updated_at
+        if len(batch) >= CATALOG_SYNC_BATCH:
+            count += upsert_nodes(resource, batch, synced_at)
+            batch = []
+    count += upsert_nodes(resource, batch, synced_at)
+    return count, last_updated_at
+
+
+def _full_nodes(resource):
+    try:
+        # A bulk export costs a handful of points however large the store is
+        return export_resource(resource, timeout=CATALOG_BULK_TIMEOUT), 'bulk'
+    except BulkOperationError as e:
+        current_app.logger.warning('Bulk export of %s failed, paginating instead: %s', resource, e)
+        return iter_connection(SYNC_QUERIES[resource], resource, page_size=250), 'pages'
+
+
+def sync_resource(resource, full=False):
+    """Bring one mirrored resource up to date
+
+    The first sync (or full=True) loads everything through a bulk export
+    and then drops rows the export did not contain. Later syncs only fetch
+    nodes changed since the stored cursor with an updated_at:>= filter;
+    the boundary timestamp is re-fetched so nothing updated in that same
+    second is missed, which is harmless because writes are upserts.
+    """
+    started = time.monotonic()
+    synced_at = datetime.utcnow()
+    state = get_sync_state(resource)
+    full = full or state is None or not state.last_updated_at
+
+    if full:
+        nodes, method = _full_nodes(resource)
+    else:
+        variables = {'query': f"updated_at:>='{state.last_updated_at}'"}
+        nodes, method = iter_connection(SYNC_QUERIES[resource], resource, variables, page_size=250), 'incremental'
+
+    count, last_updated_at = _write_batches(resource, nodes, synced_at)
+    removed = sweep(resource, synced_at) if full else 0
+    state = record_sync(resource, last_updated_at, synced_at, full=full)
+
+    if count or removed:
+        # Cached live reads and agent turns may predate these changes
+        shopify_cache.invalidate([resource])
+
+    return {
+        'resource': resource,
+        'method': method,
+        'synced': count,
+        'removed': removed,
+        'row_count': state.row_count,
+        'last_updated_at': state.last_updated_at,
+        'elapsed_ms': round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+def refresh_nodes(resource, ids):
+    """Re-fetch specific records by GID and upsert them into the mirror"""
+    ids = list(dict.fromkeys(ids))
+    written = 0
+    for start in range(0, len(ids), 50):
+        chunk = ids[start:start + 50]
+        search = ' OR '.join(f'id:{legacy_id(gid)}' for gid in chunk)
+        nodes = iter_connection(SYNC_QUERIES[resource], resource, {'query': search}, page_size=len(chunk))
+        written += upsert_nodes(resource, list(nodes))
+    return written
+
+
+def sync_catalog(resources=None, full=False):
+    """Sync several resources; returns None if a sync is already running"""
+    if not _sync_lock.acquire(blocking=False):
+        return None
+    try:
+        results = {}
+        for resource in resources or MIRROR_MODELS:
+            try:
+                results[resource] = sync_resource(resource, full=full)
+            except (BulkOperationError, ShopifyQueryError, requests.exceptions.RequestException, ValueError) as e:
+                results[resource] = {'resource': resource, 'error': str(e)}
+            _last_sync[resource] = {**results[resource], 'finished_at': datetime.utcnow().isoformat() + 'Z'}
+        return results
+    finally:
+        _sync_lock.release()
+
+
+def _sync_in_background(app, resources, full):
+    with app.app_context():
+        sync_catalog(resources, full)
+
+
+def _sync_forever(app):
+    while True:
+        with app.app_context():
+            try:
+                sync_catalog()
+            except Exception:
+                app.logger.exception('Catalog sync failed')
+        time.sleep(CATALOG_SYNC_INTERVAL)
+
+
+def start_background_sync(app):
+    """Start the periodic sync thread once per worker process"""
+    if CATALOG_SYNC_INTERVAL <= 0 or _sync_worker['pid'] == os.getpid():
+        return
+    _sync_worker['pid'] = os.getpid()
+    threading.Thread(target=_sync_forever, args=(app,), daemon=True, name='catalog-sync').start()
+
+
+@catalog_bp.before_app_request
+def _ensure_background_sync():
+    # Started lazily so pre-fork servers don't lose the thread at fork
+    start_background_sync(current_app._get_current_object())
+
+
+@catalog_bp.route('/sync', methods=['POST'])
+def trigger_sync():
+    """Sync the local catalog mirror from Shopify"""
+    data = request.get_json(silent=True) or {}
+    resources = data.get('resources') or list(MIRROR_MODELS)
+    unknown = [resource for resource in resources if resource not in MIRROR_MODELS]
+    if unknown:
+        return jsonify({'error': f"Unsupported mirror resources: {', '.join(unknown)}"}), 400
+    full = bool(data.get('full'))
+
+    if data.get('wait'):
+        results = sync_catalog(resources, full)
+        if results is None:
+            return jsonify({'error': 'A catalog sync is already running'}), 409
+        return jsonify({'results': results})
+
+    if _sync_lock.locked():
+        return jsonify({'error': 'A catalog sync is already running'}), 409
+    app = current_app._get_current_object()
+    threading.Thread(target=_sync_in_background, args=(app, resources, full), daemon=True).start()
+    return jsonify({'started': resources, 'full': full}), 202
+
+
+@catalog_bp.route('/status', methods=['GET'])
+def get_mirror_status():
+    """Get sync state and freshness of the local catalog mirror"""
+    status = mirror_status()
+    status['syncing'] = _sync_lock.locked()
+    status['sync_interval'] = CATALOG_SYNC_INTERVAL
+    status['last_sync'] = _last_sync
+    return jsonify(status)
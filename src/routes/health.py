@@ -0,0 +1,65 @@
+import os
+import time
+from flask import Blueprint, request, jsonify
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.user import db
+from src.routes.shopify import make_shopify_request
+from src.services.shopify_client import SHOPIFY_ACCESS_TOKEN, MYSHOPIFY_DOMAIN
+
+health_bp = Blueprint('health', __name__)
+
+_started_at = time.time()
+
+SHOP_PING_QUERY = """
+query healthCheck {
+    shop {
+        id
+    }
+}
+"""
+
+
+@health_bp.route('/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the worker is up and answering requests"""
+    return jsonify({
+        'status': 'alive',
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started_at, 1),
+    })
+
+
+@health_bp.route('/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: the database answers and credentials are configured
+
+    Pass ?deep=1 to also run a minimal Shopify query (normally served from
+    the response cache, so frequent probes cost almost nothing).
+    """
+    checks = {}
+
+    started = time.perf_counter()
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks['database'] = {'ok': True}
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        checks['database'] = {'ok': False, 'error': str(e)}
+    checks['database']['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    checks['shopify_config'] = {
+        'ok': bool((SHOPIFY_ACCESS_TOKEN and MYSHOPIFY_DOMAIN) or os.getenv('SHOPIFY_GRAPHQL_URL')),
+    }
+    checks['openai_config'] = {'ok': bool(os.getenv('OPENAI_API_KEY'))}
+
+    if request.args.get('deep') == '1':
+        started = time.perf_counter()
+        result = make_shopify_request(SHOP_PING_QUERY)
+        ok = 'error' not in result and not result.get('errors')
+        checks['shopify'] = {'ok': ok, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)}
+        if not ok:
+            checks['shopify']['error'] = result.get('error') or result.get('errors')
+
+    ready = all(check['ok'] for check in checks.values())
+    return jsonify({'status': 'ready' if ready else 'not_ready', 'checks': checks}), 200 if ready else 503
@@ -0,0 +1,106 @@
+from flask import Blueprint, Response, g, request, jsonify
+from src.services.shopify_cache import shopify_cache
+from src.services.storage import write_batcher
+from src.services.tracing import (
+    TRACE_PROFILE_ENABLED,
+    TRACING_ENABLED,
+    SamplingProfiler,
+    end_trace,
+    get_profile,
+    list_profiles,
+    queue_seconds,
+    record_span,
+    render_metrics,
+    request_finished,
+    request_started,
+    start_trace,
+    store_profile,
+)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.before_app_request
+def _begin_request_trace():
+    if not TRACING_ENABLED:
+        return
+    g.trace, g.trace_token = start_trace()
+    g.trace_open = True
+    request_started()
+
+    # Time spent waiting in the proxy / accept queue before we saw the request
+    waited = queue_seconds(request.headers.get('X-Request-Start'))
+    if waited is not None:
+        record_span('queue', waited)
+
+    if TRACE_PROFILE_ENABLED and '1' in (request.args.get('profile'), request.headers.get('X-Profile')):
+        g.profiler = SamplingProfiler().start()
+
+
+@metrics_bp.after_app_request
+def _finish_request_trace(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        response.headers['X-Profile-Id'] = store_profile(profiler, trace, request.path)
+
+    # For streamed responses this only covers the time to the first byte
+    response.headers['Server-Timing'] = trace.server_timing()
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status = request.method, response.status_code
+    if response.is_streamed:
+        response.call_on_close(lambda: request_finished(method, endpoint, status, trace.elapsed()))
+    else:
+        request_finished(method, endpoint, status, trace.elapsed())
+    g.trace_open = False
+    return response
+
+
+@metrics_bp.teardown_app_request
+def _close_request_trace(exc):
+    if g.get('trace') is None:
+        return
+    if g.get('trace_open'):
+        # An unhandled exception skipped after_request
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_finished(request.method, endpoint, 500, g.trace.elapsed())
+        g.trace_open = False
+    end_trace(g.trace_token)
+
+
+@metrics_bp.route('', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of request and span histograms"""
+    sources = (
+        ('app_shopify_cache', 'Shopify response cache', shopify_cache.stats()),
+        ('app_db_writer', 'Batched database writer', write_batcher.stats()),
+    )
+    gauges = {
+        f'{prefix}_{key}': (f'{description} {key}', value)
+        for prefix, description, stats in sources
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/profiles', methods=['GET'])
+def get_profiles():
+    """List recent request profiles"""
+    return jsonify({'enabled': TRACE_PROFILE_ENABLED, 'profiles': list_profiles()})
+
+
+@metrics_bp.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile_by_id(profile_id):
+    """Download a profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    profile = get_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return Response(profile['collapsed'] + '\n', mimetype='text/plain')
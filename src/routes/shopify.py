@@ -1,43 +1,387 @@
+import json
 import os
+import threading
+import time
 import requests
-from flask import Blueprint, request, jsonify
-from dotenv import load_dotenv
-
-load_dotenv()
+from flask import Blueprint, Response, current_app, request, jsonify
+from src.services.shopify_client import (
+    SHOPIFY_ACCESS_TOKEN,
+    MYSHOPIFY_DOMAIN,
+    SHOPIFY_API_VERSION,
+    get_shopify_client,
+)
+from src.services.catalog_mirror import (
+    read_customers,
+    read_orders,
+    read_product,
+    read_products,
+    search_customers,
+    search_products,
+)
+from src.services.jobs import JobQueueFull, get_job, job_queue
+from src.services.shopify_cache import cache_key, operation_type, shopify_cache
+from src.services.shopify_throttle import ShopifyThrottledError
+from src.services.singleflight import SingleFlight
+from src.services.tracing import span, traced
 
 shopify_bp = Blueprint('shopify', __name__)
 
-SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN')
-MYSHOPIFY_DOMAIN = os.getenv('MYSHOPIFY_DOMAIN')
-SHOPIFY_API_VERSION = '2023-07'
+shopify_flight = SingleFlight()
+
+def _execute_shopify_request(query, variables=None, api_version=None):
+    try:
+        with span('shopify_api'):
+            return get_shopify_client().execute(query, variables, api_version=api_version)
+    except (requests.exceptions.RequestException, ShopifyThrottledError) as e:
+        return {'error': str(e)}
+
+@traced('shopify')
+def make_shopify_request(query, variables=None, use_cache=True, api_version=None):
+    """Make a GraphQL request to Shopify Admin API
+
+    Read-only queries are served from the response cache when possible;
+    mutations go straight through and invalidate the reads they affect.
+    """
+    if operation_type(query) == 'mutation':
+        result = _execute_shopify_request(query, variables, api_version)
+        if 'error' not in result:
+            shopify_cache.invalidate_for_mutation(query)
+        return result
+
+    key, hit, cached = (
+        shopify_cache.lookup(query, variables, api_version) if use_cache else (None, False, None)
+    )
+    if hit:
+        return cached
+
+    data_version = shopify_cache.data_version
 
-def make_shopify_request(query, variables=None):
-    """Make a GraphQL request to Shopify Admin API"""
-    url = f"https://{MYSHOPIFY_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
-    headers = {
-        'X-Shopify-Access-Token': SHOPIFY_ACCESS_TOKEN,
-        'Content-Type': 'application/json'
+    def fetch():
+        result = _execute_shopify_request(query, variables, api_version)
+        # Store before the flight lands so late arrivals hit the cache
+        shopify_cache.store(key, query, result, data_version=data_version)
+        return result
+
+    # Identical queries already on the wire share that request's result,
+    # unless store data changed after it was sent
+    flight_key = (key or cache_key(query, variables, api_version), data_version)
+    result, _shared = shopify_flight.do(flight_key, fetch)
+    return result
+
+# Count fields (productsCount etc.) only exist in newer API versions, so this
+# one query is pinned separately from SHOPIFY_API_VERSION.
+SHOPIFY_STATS_API_VERSION = os.getenv('SHOPIFY_STATS_API_VERSION', '2024-07')
+STORE_STATS_TTL = float(os.getenv('STORE_STATS_TTL', 60))
+
+STORE_STATS_QUERY = """
+query storeCounts {
+    products: productsCount(limit: null) {
+        count
+        precision
     }
-    
-    payload = {
-        'query': query
+    orders: ordersCount(limit: null) {
+        count
+        precision
     }
-    
-    if variables:
-        payload['variables'] = variables
-    
+    customers: customersCount(limit: null) {
+        count
+        precision
+    }
+}
+"""
+
+class ShopifyQueryError(Exception):
+    """Raised when a paginated query returns errors instead of data"""
+
+
+_store_stats_lock = threading.Lock()
+_store_stats = {'value': None, 'fetched_at': 0.0, 'data_version': None, 'refreshing': False, 'last_error': None}
+
+def _fetch_store_stats():
+    """Fetch all dashboard counts in one aliased query and store them
+
+    Raises ShopifyQueryError when Shopify returns no data.
+    """
+    data_version = shopify_cache.data_version
+    result = make_shopify_request(STORE_STATS_QUERY, use_cache=False, api_version=SHOPIFY_STATS_API_VERSION)
+    if 'error' in result:
+        raise ShopifyQueryError(result['error'])
+    if not result.get('data'):
+        raise ShopifyQueryError(json.dumps(result.get('errors')))
+
+    value = {
+        name: result['data'].get(name)
+        for name in ('products', 'orders', 'customers')
+    }
+    with _store_stats_lock:
+        _store_stats.update(value=value, fetched_at=time.time(), data_version=data_version, last_error=None)
+    return value
+
+def _refresh_store_stats_in_background(app):
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {'error': str(e)}
+        _fetch_store_stats()
+    except Exception as e:
+        with _store_stats_lock:
+            _store_stats['last_error'] = str(e)
+        app.logger.exception('Store stats refresh failed')
+    finally:
+        with _store_stats_lock:
+            _store_stats['refreshing'] = False
+
+def get_store_stats():
+    """Return dashboard counts, refreshing stale values in the background
+
+    Fresh values are served from memory. Once they pass STORE_STATS_TTL, or
+    a mutation has changed store data, the last value is still served while
+    a background thread fetches a new one. Only the very first call waits
+    on Shopify, and raises ShopifyQueryError if that fetch fails.
+    """
+    with _store_stats_lock:
+        value = _store_stats['value']
+        fetched_at = _store_stats['fetched_at']
+        last_error = _store_stats['last_error']
+        age = time.time() - fetched_at
+        stale = age >= STORE_STATS_TTL or _store_stats['data_version'] != shopify_cache.data_version
+        if value is not None and stale and not _store_stats['refreshing']:
+            _store_stats['refreshing'] = True
+            threading.Thread(target=_refresh_store_stats_in_background,
+                             args=(current_app._get_current_object(),), daemon=True).start()
+
+    if value is None:
+        value = _fetch_store_stats()
+        with _store_stats_lock:
+            fetched_at = _store_stats['fetched_at']
+        age = 0.0
+        stale = False
+        last_error = None
+
+    stats = {
+        'stats': value,
+        'fetched_at': fetched_at,
+        'age_seconds': round(age, 1),
+        'stale': stale,
+    }
+    if stale and last_error:
+        # Why the value is not being refreshed
+        stats['refresh_error'] = last_error
+    return stats
+
+# Maximum page size Shopify accepts for a connection
+MAX_PAGE_SIZE = 250
+
+PRODUCTS_PAGE_QUERY = """
+query getProductsPage($first: Int!, $after: String, $query: String) {
+    products(first: $first, after: $after, query: $query) {
+        pageInfo {
+            hasNextPage
+            endCursor
+        }
+        edges {
+            node {
+                id
+                title
+                handle
+                description
+                vendor
+                productType
+                tags
+                status
+                createdAt
+                updatedAt
+                images(first: 1) {
+                    edges {
+                        node {
+                            url
+                            altText
+                        }
+                    }
+                }
+                variants(first: 5) {
+                    edges {
+                        node {
+                            id
+                            title
+                            price
+                            inventoryQuantity
+                            sku
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+ORDERS_PAGE_QUERY = """
+query getOrdersPage($first: Int!, $after: String, $query: String) {
+    orders(first: $first, after: $after, query: $query) {
+        pageInfo {
+            hasNextPage
+            endCursor
+        }
+        edges {
+            node {
+                id
+                name
+                email
+                phone
+                createdAt
+                updatedAt
+                totalPrice
+                subtotalPrice
+                totalTax
+                currencyCode
+                financialStatus
+                fulfillmentStatus
+                tags
+                note
+                customer {
+                    id
+                    firstName
+                    lastName
+                    email
+                }
+                shippingAddress {
+                    firstName
+                    lastName
+                    address1
+                    address2
+                    city
+                    province
+                    country
+                    zip
+                    phone
+                }
+                lineItems(first: 10) {
+                    edges {
+                        node {
+                            id
+                            title
+                            quantity
+                            originalUnitPriceSet {
+                                shopMoney {
+                                    amount
+                                }
+                            }
+                            discountedTotalSet {
+                                shopMoney {
+                                    amount
+                                }
+                            }
+                            variant {
+                                id
+                                title
+                                price
+                                sku
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+CUSTOMERS_PAGE_QUERY = """
+query getCustomersPage($first: Int!, $after: String, $query: String) {
+    customers(first: $first, after: $after, query: $query) {
+        pageInfo {
+            hasNextPage
+            endCursor
+        }
+        edges {
+            node {
+                id
+                firstName
+                lastName
+                email
+                phone
+                createdAt
+                updatedAt
+                tags
+                note
+                ordersCount
+                totalSpent
+                addresses(first: 5) {
+                    id
+                    firstName
+                    lastName
+                    address1
+                    address2
+                    city
+                    province
+                    country
+                    zip
+                    phone
+                }
+            }
+        }
+    }
+}
+"""
+
+def iter_connection(query, connection, variables=None, page_size=50, max_items=None):
+    """Yield nodes from a Shopify connection, following endCursor page by page
+
+    Only one page is held in memory at a time. The query must accept
+    $first and $after and select pageInfo { hasNextPage endCursor }.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    variables = dict(variables or {})
+    after = None
+    yielded = 0
+
+    while True:
+        first = page_size
+        if max_items is not None:
+            first = min(first, max_items - yielded)
+            if first <= 0:
+                return
+
+        variables.update({'first': first, 'after': after})
+        # Pages are consumed once, so caching them would only evict hot entries
+        result = make_shopify_request(query, variables, use_cache=False)
+        if 'error' in result:
+            raise ShopifyQueryError(result['error'])
+        if result.get('errors') and not result.get('data'):
+            raise ShopifyQueryError(json.dumps(result['errors']))
+
+        page = ((result.get('data') or {}).get(connection)) or {}
+        for edge in page.get('edges') or []:
+            yield edge['node']
+            yielded += 1
+
+        page_info = page.get('pageInfo') or {}
+        after = page_info.get('endCursor')
+        if not page_info.get('hasNextPage') or not after:
+            return
+
+def stream_ndjson(nodes):
+    """Serialize an iterator of nodes as newline-delimited JSON"""
+    try:
+        for node in nodes:
+            yield json.dumps(node, separators=(',', ':')) + '\n'
+    except ShopifyQueryError as e:
+        # Headers are already sent, so the error travels in-band
+        yield json.dumps({'error': str(e)}) + '\n'
+
+def _stream_response(query, connection, variables):
+    page_size = request.args.get('pageSize', 100, type=int)
+    max_items = request.args.get('limit', type=int)
+    nodes = iter_connection(query, connection, variables, page_size=page_size, max_items=max_items)
+    return Response(stream_ndjson(nodes), mimetype='application/x-ndjson')
 
 @shopify_bp.route('/products', methods=['GET'])
 def get_products():
     """Get products from Shopify store"""
     limit = request.args.get('limit', 10, type=int)
     search_title = request.args.get('searchTitle', '')
+
+    mirrored = read_products(limit, search_title)
+    if mirrored is not None:
+        return jsonify(mirrored)
     
     query = """
     query getProducts($first: Int!, $query: String) {
@@ -87,6 +431,48 @@ def get_products():
     result = make_shopify_request(query, variables)
     return jsonify(result)
 
+@shopify_bp.route('/products/stream', methods=['GET'])
+def stream_products():
+    """Stream every matching product as NDJSON"""
+    search_title = request.args.get('searchTitle', '')
+    variables = {'query': f'title:*{search_title}*' if search_title else ''}
+    return _stream_response(PRODUCTS_PAGE_QUERY, 'products', variables)
+
+def search_locally(resource, search, limit=10):
+    """Ranked search from the local index, or None if it cannot answer"""
+    search_local = search_products if resource == 'products' else search_customers
+    return search_local(search, limit)
+
+def live_search_request(resource, search, limit=10):
+    """(query, variables) for the same search against Shopify"""
+    query = PRODUCTS_PAGE_QUERY if resource == 'products' else CUSTOMERS_PAGE_QUERY
+    return query, {'first': max(1, min(limit, MAX_PAGE_SIZE)), 'query': search}
+
+def search_catalog(resource, search, limit=10):
+    """Ranked search from the local index, falling back to Shopify's own search"""
+    result = search_locally(resource, search, limit)
+    if result is not None:
+        return result
+    return make_shopify_request(*live_search_request(resource, search, limit))
+
+@shopify_bp.route('/search/products', methods=['GET'])
+def search_products_route():
+    """Full-text search over product title, description, tags, SKU and vendor"""
+    search = request.args.get('q', '').strip()
+    if not search:
+        return jsonify({'error': 'Search query (q) is required'}), 400
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify(search_catalog('products', search, limit))
+
+@shopify_bp.route('/search/customers', methods=['GET'])
+def search_customers_route():
+    """Full-text search over customer name and email"""
+    search = request.args.get('q', '').strip()
+    if not search:
+        return jsonify({'error': 'Search query (q) is required'}), 400
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify(search_catalog('customers', search, limit))
+
 @shopify_bp.route('/product/<product_id>', methods=['GET'])
 def get_product_by_id(product_id):
     """Get a specific product by ID"""
@@ -131,6 +517,10 @@ def get_product_by_id(product_id):
     # Ensure the product ID has the proper GraphQL format
     if not product_id.startswith('gid://shopify/Product/'):
         product_id = f'gid://shopify/Product/{product_id}'
+
+    mirrored = read_product(product_id)
+    if mirrored is not None:
+        return jsonify(mirrored)
     
     variables = {'id': product_id}
     result = make_shopify_request(query, variables)
@@ -141,6 +531,10 @@ def get_orders():
     """Get orders from Shopify store"""
     limit = request.args.get('limit', 10, type=int)
     status = request.args.get('status', 'any')
+
+    mirrored = read_orders(limit)
+    if mirrored is not None:
+        return jsonify(mirrored)
     
     query = """
     query getOrders($first: Int!) {
@@ -203,11 +597,22 @@ def get_orders():
     result = make_shopify_request(query, variables)
     return jsonify(result)
 
+@shopify_bp.route('/orders/stream', methods=['GET'])
+def stream_orders():
+    """Stream every matching order as NDJSON"""
+    status = request.args.get('status', 'any')
+    variables = {'query': f'status:{status}' if status != 'any' else ''}
+    return _stream_response(ORDERS_PAGE_QUERY, 'orders', variables)
+
 @shopify_bp.route('/customers', methods=['GET'])
 def get_customers():
     """Get customers from Shopify store"""
     limit = request.args.get('limit', 10, type=int)
     search_query = request.args.get('searchQuery', '')
+
+    mirrored = read_customers(limit, search_query)
+    if mirrored is not None:
+        return jsonify(mirrored)
     
     query = """
     query getCustomers($first: Int!, $query: String) {
@@ -251,6 +656,13 @@ def get_customers():
     result = make_shopify_request(query, variables)
     return jsonify(result)
 
+@shopify_bp.route('/customers/stream', methods=['GET'])
+def stream_customers():
+    """Stream every matching customer as NDJSON"""
+    search_query = request.args.get('searchQuery', '')
+    variables = {'query': search_query}
+    return _stream_response(CUSTOMERS_PAGE_QUERY, 'customers', variables)
+
 @shopify_bp.route('/product', methods=['POST'])
 def create_product():
     """Create a new product"""
@@ -280,7 +692,13 @@ def create_product():
     }
     """
     
-    product_input = {
+    variables = {'input': product_input(data)}
+    result = make_shopify_request(query, variables)
+    return jsonify(result)
+
+def product_input(data):
+    """ProductInput for productCreate from a request or tool payload"""
+    return {
         'title': data['title'],
         'descriptionHtml': data.get('descriptionHtml', ''),
         'vendor': data.get('vendor', ''),
@@ -288,10 +706,121 @@ def create_product():
         'tags': data.get('tags', []),
         'status': data.get('status', 'DRAFT')
     }
-    
-    variables = {'input': product_input}
-    result = make_shopify_request(query, variables)
-    return jsonify(result)
+
+# Shopify charges 10 points per mutation field; each batched mutation asks
+# for at most this many points so it never waits on a drained bucket for long
+PRODUCT_BATCH_COST_BUDGET = float(os.getenv('PRODUCT_BATCH_COST_BUDGET', 500))
+PRODUCT_CREATE_COST = float(os.getenv('PRODUCT_CREATE_COST', 10))
+PRODUCT_BATCH_MAX_ITEMS = int(os.getenv('PRODUCT_BATCH_MAX_ITEMS', 5000))
+
+def product_batch_size():
+    """productCreate calls per aliased mutation, within the cost budget and the bucket"""
+    budget = min(PRODUCT_BATCH_COST_BUDGET, get_shopify_client().bucket.maximum)
+    return max(1, int(budget // PRODUCT_CREATE_COST))
+
+def product_create_batch_mutation(count):
+    """One mutation with count aliased productCreate fields (p0..pN) taking $input0..$inputN"""
+    params = ', '.join(f'$input{i}: ProductInput!' for i in range(count))
+    fields = '\n'.join(
+        f"""    p{i}: productCreate(input: $input{i}) {{
+        product {{ id title handle status }}
+        userErrors {{ field message }}
+    }}"""
+        for i in range(count)
+    )
+    return f'mutation productCreateBatch({params}) {{\n{fields}\n}}'
+
+def _create_product_chunk(inputs, first_index):
+    # One result per input: the created product or its userErrors
+    result = make_shopify_request(
+        product_create_batch_mutation(len(inputs)),
+        {f'input{i}': product for i, product in enumerate(inputs)},
+    )
+    data = result.get('data') or {}
+    if 'error' in result or not data:
+        message = result.get('error') or json.dumps(result.get('errors'))
+        return [
+            {'index': first_index + i, 'title': product['title'], 'product': None,
+             'userErrors': [{'field': None, 'message': message}]}
+            for i, product in enumerate(inputs)
+        ]
+    items = []
+    for i, product in enumerate(inputs):
+        created = data.get(f'p{i}') or {}
+        user_errors = created.get('userErrors') or []
+        if not created:
+            user_errors = [{'field': None, 'message': 'No result returned for this product'}]
+        items.append({
+            'index': first_index + i,
+            'title': product['title'],
+            'product': created.get('product') if not user_errors else None,
+            'userErrors': user_errors,
+        })
+    return items
+
+def run_product_batch(context, payload):
+    """Job handler: create products in aliased batches, reporting progress per batch"""
+    inputs = payload['products']
+    size = payload.get('batch_size') or product_batch_size()
+    items = []
+    for start in range(0, len(inputs), size):
+        chunk = _create_product_chunk(inputs[start:start + size], start)
+        failed = sum(1 for item in chunk if item['userErrors'])
+        context.progress(completed=len(chunk) - failed, failed=failed)
+        items.extend(chunk)
+    return {
+        'created': sum(1 for item in items if not item['userErrors']),
+        'failed': sum(1 for item in items if item['userErrors']),
+        'batch_size': size,
+        'items': items,
+    }
+
+job_queue.register('create_products', run_product_batch)
+
+def submit_product_batch(products):
+    """Validate products and queue their creation; returns (job info, error, status code)"""
+    if not isinstance(products, list) or not products:
+        return None, 'Expected a non-empty list of products', 400
+    if len(products) > PRODUCT_BATCH_MAX_ITEMS:
+        return None, f'At most {PRODUCT_BATCH_MAX_ITEMS} products per batch', 413
+    missing = [i for i, item in enumerate(products) if not isinstance(item, dict) or not item.get('title')]
+    if missing:
+        return None, f'Product title is required (items {missing[:20]})', 400
+
+    size = product_batch_size()
+    try:
+        job_id = job_queue.submit(
+            current_app._get_current_object(), 'create_products',
+            {'products': [product_input(item) for item in products], 'batch_size': size},
+            total=len(products),
+        )
+    except JobQueueFull as e:
+        return None, str(e), 503
+    return {
+        'job_id': job_id,
+        'status': 'queued',
+        'total': len(products),
+        'batch_size': size,
+        'status_url': f'/api/shopify/jobs/{job_id}',
+    }, None, 202
+
+@shopify_bp.route('/products/batch', methods=['POST'])
+def create_products_batch():
+    """Queue creation of many products; poll the returned status_url for progress"""
+    data = request.get_json(silent=True)
+    products = data.get('products') if isinstance(data, dict) else data
+    job, error, status = submit_product_batch(products)
+    if error:
+        return jsonify({'error': error}), status
+    return jsonify(job), status
+
+@shopify_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Status, progress and (once finished) per-item results of a background job"""
+    job = get_job(job_id, include_result=request.args.get('results', '1') != '0')
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 @shopify_bp.route('/store-info', methods=['GET'])
 def get_store_info():
@@ -316,3 +845,27 @@ def get_store_info():
     result = make_shopify_request(query)
     return jsonify(result)
 
+
+@shopify_bp.route('/stats', methods=['GET'])
+def get_stats():
+    """Get product, order and customer counts for the dashboard"""
+    try:
+        return jsonify(get_store_stats())
+    except ShopifyQueryError as e:
+        return jsonify({'error': str(e)}), 502
+
+@shopify_bp.route('/client-stats', methods=['GET'])
+def get_client_stats():
+    """Get Shopify HTTP client and connection pool statistics"""
+    return jsonify({
+        'client': get_shopify_client().stats(),
+        'cache': shopify_cache.stats(),
+        'singleflight': shopify_flight.stats(),
+    })
+
+@shopify_bp.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """Drop cached Shopify responses"""
+    data = request.get_json(silent=True) or {}
+    removed = shopify_cache.invalidate(data.get('resources'))
+    return jsonify({'removed': removed})
@@ -0,0 +1,373 @@
+import json
+import time
+import requests
+from flask import Blueprint, Response, request, jsonify
+from src.routes.shopify import make_shopify_request, stream_ndjson
+
+shopify_bulk_bp = Blueprint('shopify_bulk', __name__)
+
+# Results are downloaded from a signed storage URL, so this session must not
+# carry the Shopify access token.
+_download_session = requests.Session()
+
+BULK_DOWNLOAD_TIMEOUT = (5, 60)
+BULK_POLL_INTERVAL = 1.0
+BULK_POLL_MAX_INTERVAL = 10.0
+BULK_TERMINAL_STATUSES = {'COMPLETED', 'FAILED', 'CANCELED', 'EXPIRED'}
+
+# Bulk queries take no page sizes; Shopify walks every connection itself and
+# writes nested nodes as separate JSONL lines pointing at their __parentId.
+BULK_QUERIES = {
+    'products': """
+    {
+        products {
+            edges {
+                node {
+                    id
+                    title
+                    handle
+                    description
+                    vendor
+                    productType
+                    tags
+                    status
+                    createdAt
+                    updatedAt
+                    images {
+                        edges {
+                            node {
+                                id
+                                url
+                                altText
+                            }
+                        }
+                    }
+                    variants {
+                        edges {
+                            node {
+                                id
+                                title
+                                price
+                                inventoryQuantity
+                                sku
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    """,
+    'orders': """
+    {
+        orders {
+            edges {
+                node {
+                    id
+                    name
+                    email
+                    phone
+                    createdAt
+                    updatedAt
+                    totalPrice
+                    subtotalPrice
+                    totalTax
+                    currencyCode
+                    financialStatus
+                    fulfillmentStatus
+                    tags
+                    note
+                    customer {
+                        id
+                        firstName
+                        lastName
+                        email
+                    }
+                    shippingAddress {
+                        firstName
+                        lastName
+                        address1
+                        address2
+                        city
+                        province
+                        country
+                        zip
+                        phone
+                    }
+                    lineItems {
+                        edges {
+                            node {
+                                id
+                                title
+                                quantity
+                                originalUnitPriceSet {
+                                    shopMoney {
+                                        amount
+                                    }
+                                }
+                                discountedTotalSet {
+                                    shopMoney {
+                                        amount
+                                    }
+                                }
+                                variant {
+                                    id
+                                    price
+                                    sku
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    """,
+    'customers': """
+    {
+        customers {
+            edges {
+                node {
+                    id
+                    firstName
+                    lastName
+                    email
+                    phone
+                    createdAt
+                    updatedAt
+                    tags
+                    note
+                    ordersCount
+                    totalSpent
+                    addresses {
+                        id
+                        firstName
+                        lastName
+                        address1
+                        address2
+                        city
+                        province
+                        country
+                        zip
+                        phone
+                    }
+                }
+            }
+        }
+    }
+    """,
+}
+
+# Key under which child lines are collected on their parent, by GID type
+BULK_CHILD_KEYS = {
+    'ProductVariant': 'variants',
+    'ProductImage': 'images',
+    'LineItem': 'lineItems',
+}
+
+BULK_RUN_MUTATION = """
+mutation bulkOperationRunQuery($query: String!) {
+    bulkOperationRunQuery(query: $query) {
+        bulkOperation {
+            id
+            status
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+"""
+
+BULK_STATUS_QUERY = """
+query bulkOperationStatus($id: ID!) {
+    node(id: $id) {
+        ... on BulkOperation {
+            id
+            status
+            errorCode
+            createdAt
+            completedAt
+            objectCount
+            fileSize
+            url
+            partialDataUrl
+        }
+    }
+}
+"""
+
+
+class BulkOperationError(Exception):
+    """Raised when a bulk operation cannot be started or does not complete"""
+
+
+class BulkOperationNotFound(BulkOperationError):
+    """Raised when Shopify has no bulk operation with the given ID"""
+
+
+def _gid_type(gid):
+    # gid://shopify/ProductVariant/123 -> ProductVariant
+    parts = (gid or '').split('/')
+    return parts[3] if len(parts) > 4 else None
+
+
+def to_bulk_operation_gid(operation_id):
+    if str(operation_id).startswith('gid://'):
+        return operation_id
+    return f'gid://shopify/BulkOperation/{operation_id}'
+
+
+def run_bulk_query(query):
+    """Submit a bulkOperationRunQuery and return the created operation"""
+    result = make_shopify_request(BULK_RUN_MUTATION, {'query': query})
+    if 'error' in result:
+        raise BulkOperationError(result['error'])
+    if result.get('errors'):
+        raise BulkOperationError(json.dumps(result['errors']))
+
+    payload = (result.get('data') or {}).get('bulkOperationRunQuery') or {}
+    if payload.get('userErrors'):
+        raise BulkOperationError(json.dumps(payload['userErrors']))
+    operation = payload.get('bulkOperation')
+    if not operation:
+        raise BulkOperationError('Shopify did not return a bulk operation')
+    return operation
+
+
+def get_bulk_operation(operation_id):
+    """Fetch the current state of a bulk operation"""
+    result = make_shopify_request(BULK_STATUS_QUERY, {'id': to_bulk_operation_gid(operation_id)})
+    if 'error' in result:
+        raise BulkOperationError(result['error'])
+    operation = (result.get('data') or {}).get('node')
+    if not operation and result.get('errors'):
+        raise BulkOperationError(json.dumps(result['errors']))
+    if not operation:
+        raise BulkOperationNotFound(f'Bulk operation {operation_id} not found')
+    return operation
+
+
+def poll_bulk_operation(operation_id, timeout=3600, interval=None):
+    """Poll a bulk operation until it reaches a terminal status"""
+    interval = interval or BULK_POLL_INTERVAL
+    deadline = time.monotonic() + timeout
+    while True:
+        operation = get_bulk_operation(operation_id)
+        if operation.get('status') in BULK_TERMINAL_STATUSES:
+            return operation
+        if time.monotonic() + interval > deadline:
+            raise BulkOperationError(
+                f"Bulk operation {operation_id} still {operation.get('status')} after {timeout}s"
+            )
+        time.sleep(interval)
+        # Long exports finish in minutes; back off instead of spending points
+        interval = min(interval * 1.5, BULK_POLL_MAX_INTERVAL)
+
+
+def iter_bulk_lines(url, chunk_size=64 * 1024):
+    """Stream a bulk result file and yield one decoded JSON object per line"""
+    if not url:
+        return
+    with _download_session.get(url, stream=True, timeout=BULK_DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(chunk_size=chunk_size):
+            if line:
+                yield json.loads(line)
+
+
+def iter_bulk_objects(url, nest=True):
+    """Yield top-level objects from a bulk result file
+
+    With nest=True, child lines (which Shopify writes directly after their
+    parent) are folded back into lists on the parent, e.g. a product's
+    'variants'. Only the current top-level object is held in memory.
+    """
+    current = None
+    index = {}
+    for obj in iter_bulk_lines(url):
+        parent_id = obj.get('__parentId')
+        if not nest:
+            yield obj
+            continue
+        if parent_id is None:
+            if current is not None:
+                yield current
+            current = obj
+            index = {obj.get('id'): obj}
+            continue
+
+        parent = index.get(parent_id)
+        if parent is None:
+            # Out-of-order child; pass it through rather than drop it
+            yield obj
+            continue
+        del obj['__parentId']
+        key = BULK_CHILD_KEYS.get(_gid_type(obj.get('id')), 'children')
+        parent.setdefault(key, []).append(obj)
+        if obj.get('id'):
+            index[obj['id']] = obj
+
+    if current is not None:
+        yield current
+
+
+def export_resource(resource, timeout=3600, nest=True):
+    """Run a full bulk export for a resource and yield its objects"""
+    operation = run_bulk_query(BULK_QUERIES[resource])
+    operation = poll_bulk_operation(operation['id'], timeout=timeout)
+    if operation.get('status') != 'COMPLETED':
+        raise BulkOperationError(
+            f"Bulk operation {operation['id']} ended as {operation.get('status')}: "
+            f"{operation.get('errorCode')}"
+        )
+    return iter_bulk_objects(operation.get('url'), nest=nest)
+
+
+def _stream_bulk_objects(objects):
+    try:
+        yield from stream_ndjson(objects)
+    except (BulkOperationError, requests.exceptions.RequestException, ValueError) as e:
+        yield json.dumps({'error': str(e)}) + '\n'
+
+
+@shopify_bulk_bp.route('/<resource>', methods=['POST'])
+def start_bulk_export(resource):
+    """Start a bulk export of products, orders or customers"""
+    if resource not in BULK_QUERIES:
+        return jsonify({'error': f'Unsupported bulk resource: {resource}'}), 400
+    try:
+        operation = run_bulk_query(BULK_QUERIES[resource])
+    except BulkOperationError as e:
+        return jsonify({'error': str(e)}), 502
+    return jsonify({'bulkOperation': operation}), 202
+
+
+@shopify_bulk_bp.route('/operations/<operation_id>', methods=['GET'])
+def get_bulk_export(operation_id):
+    """Get the status of a bulk export"""
+    try:
+        operation = get_bulk_operation(operation_id)
+    except BulkOperationNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except BulkOperationError as e:
+        return jsonify({'error': str(e)}), 502
+    return jsonify({'bulkOperation': operation})
+
+
+@shopify_bulk_bp.route('/operations/<operation_id>/results', methods=['GET'])
+def stream_bulk_export(operation_id):
+    """Stream the results of a completed bulk export as NDJSON"""
+    try:
+        operation = get_bulk_operation(operation_id)
+    except BulkOperationNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except BulkOperationError as e:
+        return jsonify({'error': str(e)}), 502
+    if operation.get('status') != 'COMPLETED':
+        return jsonify({'bulkOperation': operation, 'error': 'Bulk operation is not complete'}), 409
+
+    nest = request.args.get('nest', '1') != '0'
+    objects = iter_bulk_objects(operation.get('url'), nest=nest)
+    return Response(_stream_bulk_objects(objects), mimetype='application/x-ndjson')
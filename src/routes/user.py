@@ -1,22 +1,191 @@
-from flask import Blueprint, jsonify, request
+import json
+import os
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from src.models.user import User, db
+from src.services.storage import write_batcher
 
 user_bp = Blueprint('user', __name__)
 
+USERS_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE', 100))
+USERS_PAGE_MAX = int(os.getenv('USERS_PAGE_MAX', 1000))
+USERS_BULK_MAX = int(os.getenv('USERS_BULK_MAX', 10000))
+# Rows per executemany batch, and per IN (...) lookup (SQLite caps bound parameters)
+USERS_BULK_BATCH = int(os.getenv('USERS_BULK_BATCH', 500))
+
+UNIQUE_FIELDS = ('username', 'email')
+
+def _user_filters(args):
+    filters = []
+    if args.get('username'):
+        filters.append(User.username.startswith(args['username'], autoescape=True))
+    if args.get('email'):
+        filters.append(User.email == args['email'])
+    if args.get('email_domain'):
+        filters.append(User.email.endswith('@' + args['email_domain'].lstrip('@'), autoescape=True))
+    if args.get('q'):
+        filters.append(db.or_(
+            User.username.contains(args['q'], autoescape=True),
+            User.email.contains(args['q'], autoescape=True),
+        ))
+    return filters
+
+def _page_bounds(filters, after_id, limit):
+    # Find the page's last id, and whether anything follows it, with two
+    # index-only lookups, so the cursor header can go out before the rows
+    last_id = db.session.execute(
+        select(User.id).where(User.id > after_id, *filters).order_by(User.id).offset(limit - 1).limit(1)
+    ).scalar()
+    if last_id is None:
+        return None, None
+    more = db.session.execute(
+        select(User.id).where(User.id > last_id, *filters).order_by(User.id).limit(1)
+    ).scalar()
+    return last_id, (last_id if more is not None else None)
+
+def _stream_users(rows):
+    # One JSON array, encoded a batch of rows at a time
+    yield '['
+    first = True
+    batch = []
+    for row in rows:
+        batch.append(json.dumps({'id': row.id, 'username': row.username, 'email': row.email}))
+        if len(batch) >= USERS_BULK_BATCH:
+            yield ('' if first else ',') + ','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + ','.join(batch)
+    yield ']'
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    limit = max(1, min(request.args.get('limit', USERS_PAGE_SIZE, type=int), USERS_PAGE_MAX))
+    after_id = request.args.get('after_id', 0, type=int)
+    filters = _user_filters(request.args)
+
+    last_id, next_cursor = _page_bounds(filters, after_id, limit)
+    query = select(User.id, User.username, User.email).where(User.id > after_id, *filters)
+    if last_id is not None:
+        query = query.where(User.id <= last_id)
+    rows = db.session.execute(query.order_by(User.id).execution_options(yield_per=USERS_BULK_BATCH))
+
+    response = Response(stream_with_context(_stream_users(rows)), mimetype='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
-    
+
     data = request.json
     user = User(username=data['username'], email=data['email'])
-    db.session.add(user)
-    db.session.commit()
+    try:
+        # Concurrent sign-ups share one commit on the writer thread
+        user.id = write_batcher.run(
+            lambda: db.session.execute(insert(User).values(username=user.username, email=user.email))
+            .inserted_primary_key[0]
+        )
+    except IntegrityError:
+        return jsonify({'error': 'Username or email already exists'}), 409
     return jsonify(user.to_dict()), 201
 
+def _existing_values(field, values):
+    column = getattr(User, field)
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), USERS_BULK_BATCH):
+        chunk = values[start:start + USERS_BULK_BATCH]
+        found.update(db.session.execute(select(column).where(column.in_(chunk))).scalars())
+    return found
+
+def _validate_bulk_rows(items):
+    # Returns (rows to insert with their request index, per-row errors)
+    rows = []
+    errors = []
+    seen = {field: {} for field in UNIQUE_FIELDS}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Expected an object'})
+            continue
+        missing = [field for field in UNIQUE_FIELDS if not isinstance(item.get(field), str) or not item[field]]
+        if missing:
+            errors.append({'index': index, 'error': f"Missing {', '.join(missing)}"})
+            continue
+        duplicate = next((field for field in UNIQUE_FIELDS if item[field] in seen[field]), None)
+        if duplicate:
+            errors.append({
+                'index': index,
+                'field': duplicate,
+                'value': item[duplicate],
+                'error': f'Duplicate {duplicate} in request (row {seen[duplicate][item[duplicate]]})',
+            })
+            continue
+        for field in UNIQUE_FIELDS:
+            seen[field][item[field]] = index
+        rows.append((index, {'username': item['username'], 'email': item['email']}))
+    return rows, errors
+
+def _insert_rows_one_by_one(rows):
+    # Fallback when a concurrent writer took a value after our checks
+    created = 0
+    conflicts = []
+    for index, row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(User), [row])
+            created += 1
+        except IntegrityError as e:
+            field = next((f for f in UNIQUE_FIELDS if f'user.{f}' in str(e.orig)), None)
+            conflicts.append({
+                'index': index,
+                'field': field,
+                'value': row.get(field) if field else None,
+                'error': 'Already exists',
+            })
+    return created, conflicts
+
+@user_bp.route('/users/bulk', methods=['POST'])
+def create_users_bulk():
+    data = request.get_json(silent=True)
+    items = data.get('users') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty list of users (or {"users": [...]})'}), 400
+    if len(items) > USERS_BULK_MAX:
+        return jsonify({'error': f'At most {USERS_BULK_MAX} users per request'}), 413
+
+    rows, errors = _validate_bulk_rows(items)
+
+    # Conflicts with rows already in the table, found with batched IN lookups
+    for field in UNIQUE_FIELDS:
+        existing = _existing_values(field, (row[field] for _index, row in rows))
+        if not existing:
+            continue
+        kept = []
+        for index, row in rows:
+            if row[field] in existing:
+                errors.append({'index': index, 'field': field, 'value': row[field], 'error': 'Already exists'})
+            else:
+                kept.append((index, row))
+        rows = kept
+
+    try:
+        for start in range(0, len(rows), USERS_BULK_BATCH):
+            batch = rows[start:start + USERS_BULK_BATCH]
+            db.session.execute(insert(User), [row for _index, row in batch])
+        db.session.commit()
+        created = len(rows)
+    except IntegrityError:
+        db.session.rollback()
+        created, conflicts = _insert_rows_one_by_one(rows)
+        db.session.commit()
+        errors.extend(conflicts)
+
+    errors.sort(key=lambda error: error['index'])
+    status = 201 if created else (409 if any('field' in error for error in errors) else 400)
+    return jsonify({'created': created, 'failed': len(errors), 'errors': errors}), status
+
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
@@ -0,0 +1,187 @@
+import base64
+import hashlib
+import hmac
+import os
+import queue
+import threading
+import time
+from flask import Blueprint, current_app, request, jsonify
+from src.routes.catalog import refresh_nodes
+from src.services.catalog_mirror import MIRROR_MODELS, delete_nodes, get_sync_state
+from src.services.shopify_cache import TTLCache, shopify_cache
+
+webhooks_bp = Blueprint('webhooks', __name__)
+
+SHOPIFY_WEBHOOK_SECRET = os.getenv('SHOPIFY_WEBHOOK_SECRET', '')
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 10000))
+# Shopify retries deliveries it did not see acknowledged; remember IDs this long
+WEBHOOK_DEDUPE_TTL = float(os.getenv('WEBHOOK_DEDUPE_TTL', 24 * 3600))
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 100))
+
+# Topic prefix -> resource whose cached reads the event makes stale
+WEBHOOK_RESOURCES = {
+    'products': 'products',
+    'inventory_levels': 'products',
+    'inventory_items': 'products',
+    'collections': 'products',
+    'orders': 'orders',
+    'refunds': 'orders',
+    'fulfillments': 'orders',
+    'customers': 'customers',
+    'shop': 'shop',
+}
+
+_events = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+_seen = TTLCache(maxsize=WEBHOOK_QUEUE_SIZE)
+_worker = {'pid': None}
+_stats_lock = threading.Lock()
+_stats = {
+    'received': 0,
+    'duplicates': 0,
+    'rejected': 0,
+    'dropped': 0,
+    'processed': 0,
+    'failed': 0,
+    'last_error': None,
+    'last_processed_at': None,
+}
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def verify_hmac(body, signature, secret=None):
+    """Check X-Shopify-Hmac-Sha256 (base64 HMAC-SHA256 of the raw body)"""
+    secret = SHOPIFY_WEBHOOK_SECRET if secret is None else secret
+    if not secret or not signature:
+        return False
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
+
+def _event_gid(topic, payload):
+    resource = topic.split('/', 1)[0]
+    if resource not in MIRROR_MODELS or not isinstance(payload, dict):
+        return None
+    if payload.get('admin_graphql_api_id'):
+        return payload['admin_graphql_api_id']
+    if payload.get('id') is None:
+        return None
+    # Delete payloads carry only the numeric ID
+    type_name = {'products': 'Product', 'orders': 'Order', 'customers': 'Customer'}[resource]
+    return f'gid://shopify/{type_name}/{payload["id"]}'
+
+
+def handle_events(events):
+    """Apply a batch of webhook events to the mirror and response cache
+
+    Events for the same record collapse to the last one received, so a
+    burst of products/update deliveries costs a single re-fetch. Deleted
+    records are removed from the mirror; other changes are re-fetched
+    (only for resources the mirror has been synced for). Every affected
+    resource is invalidated once, which also marks agent turns built on
+    that data as stale.
+    """
+    resources = set()
+    latest = {}
+    for topic, payload in events:
+        resource = WEBHOOK_RESOURCES.get(topic.split('/', 1)[0])
+        if resource:
+            resources.add(resource)
+        gid = _event_gid(topic, payload)
+        if gid:
+            latest[gid] = (topic.split('/', 1)[0], topic.endswith('/delete'))
+
+    for resource in MIRROR_MODELS:
+        deleted = [gid for gid, (r, is_delete) in latest.items() if r == resource and is_delete]
+        changed = [gid for gid, (r, is_delete) in latest.items() if r == resource and not is_delete]
+        if deleted:
+            delete_nodes(resource, deleted)
+        if changed and get_sync_state(resource) is not None:
+            refresh_nodes(resource, changed)
+
+    if resources:
+        shopify_cache.invalidate(sorted(resources))
+    return resources
+
+
+def _drain(first):
+    events = [first]
+    while len(events) < WEBHOOK_BATCH_SIZE:
+        try:
+            events.append(_events.get_nowait())
+        except queue.Empty:
+            break
+    return events
+
+
+def _process_forever(app):
+    while True:
+        events = _drain(_events.get())
+        with app.app_context():
+            try:
+                handle_events(events)
+                _count('processed', len(events))
+                with _stats_lock:
+                    _stats['last_processed_at'] = time.time()
+            except Exception as e:
+                # The cache must not keep serving what these events changed
+                shopify_cache.invalidate()
+                _count('failed', len(events))
+                with _stats_lock:
+                    _stats['last_error'] = str(e)
+                app.logger.exception('Webhook processing failed')
+            finally:
+                for _ in events:
+                    _events.task_done()
+
+
+def start_webhook_worker(app):
+    """Start the event worker once per worker process"""
+    if _worker['pid'] == os.getpid():
+        return
+    _worker['pid'] = os.getpid()
+    threading.Thread(target=_process_forever, args=(app,), daemon=True, name='webhook-worker').start()
+
+
+@webhooks_bp.route('', methods=['POST'])
+def receive_webhook():
+    """Receive a Shopify webhook and queue it for processing"""
+    body = request.get_data()
+    if not verify_hmac(body, request.headers.get('X-Shopify-Hmac-Sha256')):
+        _count('rejected')
+        return jsonify({'error': 'Invalid webhook signature'}), 401
+
+    topic = request.headers.get('X-Shopify-Topic', '')
+    webhook_id = request.headers.get('X-Shopify-Webhook-Id') or request.headers.get('X-Shopify-Event-Id')
+    _count('received')
+    if webhook_id:
+        seen, _value = _seen.get(webhook_id)
+        if seen:
+            _count('duplicates')
+            return jsonify({'status': 'duplicate'})
+
+    payload = request.get_json(silent=True)
+    start_webhook_worker(current_app._get_current_object())
+    try:
+        _events.put_nowait((topic, payload))
+    except queue.Full:
+        # A non-2xx answer makes Shopify redeliver later
+        _count('dropped')
+        return jsonify({'error': 'Webhook queue is full'}), 503
+
+    if webhook_id:
+        _seen.set(webhook_id, True, WEBHOOK_DEDUPE_TTL)
+    return jsonify({'status': 'queued'})
+
+
+@webhooks_bp.route('/status', methods=['GET'])
+def get_webhook_status():
+    """Get webhook queue depth and processing counters"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['queued'] = _events.qsize()
+    stats['configured'] = bool(SHOPIFY_WEBHOOK_SECRET)
+    return jsonify(stats)
@@ -0,0 +1,169 @@
+import asyncio
+import time
+import httpx
+from src.services.shopify_cache import cache_key, operation_type, shopify_cache
+from src.services.shopify_client import (
+    SHOPIFY_ACCESS_TOKEN,
+    SHOPIFY_CONNECT_RETRIES,
+    SHOPIFY_CONNECT_TIMEOUT,
+    SHOPIFY_POOL_MAXSIZE,
+    SHOPIFY_READ_TIMEOUT,
+    _retry_after,
+    build_graphql_url,
+    get_shopify_client,
+)
+from src.services.shopify_throttle import (
+    SHOPIFY_THROTTLE_ENABLED,
+    SHOPIFY_THROTTLE_RETRIES,
+    ShopifyThrottledError,
+    backoff_delay,
+    is_throttled,
+)
+from src.services.singleflight import AsyncSingleFlight
+from src.services.tracing import span
+
+
+class AsyncShopifyClient:
+    """httpx.AsyncClient counterpart of ShopifyClient for the ASGI entry point
+
+    Waiting on Shopify, on the cost bucket or on a THROTTLED backoff yields
+    to the event loop instead of holding a thread. The cost bucket is the
+    sync client's, so both paths draw on the one budget the store has.
+    """
+
+    def __init__(self, access_token=None, max_connections=None):
+        self.url = build_graphql_url()
+        self.bucket = get_shopify_client().bucket
+        max_connections = max_connections or SHOPIFY_POOL_MAXSIZE
+        self.http = httpx.AsyncClient(
+            headers={
+                'X-Shopify-Access-Token': access_token or SHOPIFY_ACCESS_TOKEN or '',
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+            },
+            timeout=httpx.Timeout(SHOPIFY_READ_TIMEOUT, connect=SHOPIFY_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # Like the sync client, only failed connects are retried
+            transport=httpx.AsyncHTTPTransport(retries=SHOPIFY_CONNECT_RETRIES),
+        )
+        self.requests = 0
+        self.errors = 0
+        self.total_time = 0.0
+
+    async def post(self, payload, url=None):
+        started = time.perf_counter()
+        try:
+            return await self.http.post(url or self.url, json=payload)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.requests += 1
+            self.total_time += time.perf_counter() - started
+
+    async def execute(self, query, variables=None, api_version=None):
+        """Run a GraphQL query and return the decoded JSON body"""
+        payload = {'query': query}
+        if variables:
+            payload['variables'] = variables
+
+        url = build_graphql_url(api_version) if api_version else None
+        if not SHOPIFY_THROTTLE_ENABLED:
+            response = await self.post(payload, url=url)
+            response.raise_for_status()
+            return response.json()
+
+        cost_key = (query, (variables or {}).get('first'))
+        attempt = 0
+        while True:
+            cost = self.bucket.estimate_cost(cost_key)
+            wait = self.bucket.reserve(cost)
+            try:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                response = await self.post(payload, url=url)
+                if response.status_code == 429 and attempt < SHOPIFY_THROTTLE_RETRIES:
+                    self.bucket.settle(cost)
+                    await asyncio.sleep(max(_retry_after(response), backoff_delay(attempt)))
+                    attempt += 1
+                    continue
+                response.raise_for_status()
+                body = response.json()
+            except (httpx.HTTPError, ValueError, asyncio.CancelledError):
+                self.bucket.settle(cost)
+                raise
+
+            self.bucket.settle(cost, body, key=cost_key)
+            if is_throttled(body) and attempt < SHOPIFY_THROTTLE_RETRIES:
+                await asyncio.sleep(self.bucket.throttled_delay(body, attempt))
+                attempt += 1
+                continue
+            return body
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_latency_ms': round(self.total_time / self.requests * 1000, 2) if self.requests else 0,
+        }
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+_async_client = None
+async_flight = AsyncSingleFlight()
+
+
+def get_async_shopify_client():
+    """Return the event loop's Shopify client, creating it on first use"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncShopifyClient()
+    return _async_client
+
+
+async def close_async_shopify_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def _execute_async_request(query, variables=None, api_version=None):
+    try:
+        with span('shopify_api'):
+            return await get_async_shopify_client().execute(query, variables, api_version=api_version)
+    except (httpx.HTTPError, ShopifyThrottledError, ValueError) as e:
+        return {'error': str(e)}
+
+
+async def async_make_shopify_request(query, variables=None, use_cache=True, api_version=None):
+    """Async make_shopify_request: same response cache, mutation invalidation and coalescing"""
+    with span('shopify'):
+        return await _make_request(query, variables, use_cache, api_version)
+
+
+async def _make_request(query, variables, use_cache, api_version):
+    if operation_type(query) == 'mutation':
+        result = await _execute_async_request(query, variables, api_version)
+        if 'error' not in result:
+            shopify_cache.invalidate_for_mutation(query)
+        return result
+
+    key, hit, cached = (
+        shopify_cache.lookup(query, variables, api_version) if use_cache else (None, False, None)
+    )
+    if hit:
+        return cached
+
+    data_version = shopify_cache.data_version
+
+    async def fetch():
+        result = await _execute_async_request(query, variables, api_version)
+        shopify_cache.store(key, query, result, data_version=data_version)
+        return result
+
+    flight_key = (key or cache_key(query, variables, api_version), data_version)
+    result, _shared = await async_flight.do(flight_key, fetch)
+    return result
@@ -0,0 +1,379 @@
+import json
+import os
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.catalog import Customer, Order, Product, ProductVariant, SyncState
+from src.models.user import db
+from src.services.search_index import ensure_search_index, index_rows, match_customers, match_products, unindex
+
+CATALOG_MIRROR_ENABLED = os.getenv('CATALOG_MIRROR_ENABLED', '1') == '1'
+# Reads fall back to the live API once the last sync is older than this
+CATALOG_MAX_STALENESS = float(os.getenv('CATALOG_MAX_STALENESS', 300))
+
+MIRROR_MODELS = {
+    'products': Product,
+    'orders': Order,
+    'customers': Customer,
+}
+
+
+def legacy_id(gid):
+    """Numeric ID from a GID (gid://shopify/Product/123 -> 123)"""
+    try:
+        return int(str(gid).rsplit('/', 1)[-1])
+    except ValueError:
+        return 0
+
+
+def as_connection(value):
+    """Return bulk-export child lists in the edges/node shape of a live query"""
+    if isinstance(value, list):
+        return {'edges': [{'node': node} for node in value]}
+    return value
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _edges(connection):
+    return [edge['node'] for edge in (connection or {}).get('edges') or []]
+
+
+def _product_rows(node, synced_at):
+    for key in ('images', 'variants'):
+        if key in node:
+            node[key] = as_connection(node[key])
+    product = {
+        'id': node['id'],
+        'legacy_id': legacy_id(node['id']),
+        'title': node.get('title') or '',
+        'handle': node.get('handle'),
+        'vendor': node.get('vendor'),
+        'product_type': node.get('productType'),
+        'status': node.get('status'),
+        'tags': ', '.join(node.get('tags') or []),
+        'updated_at': node.get('updatedAt'),
+        'payload': json.dumps(node, separators=(',', ':')),
+        'synced_at': synced_at,
+    }
+    variants = [
+        {
+            'id': variant['id'],
+            'product_id': node['id'],
+            'title': variant.get('title'),
+            'sku': variant.get('sku'),
+            'price': _to_float(variant.get('price')),
+            'inventory_quantity': variant.get('inventoryQuantity'),
+        }
+        for variant in _edges(node.get('variants'))
+        if variant.get('id')
+    ]
+    return product, variants
+
+
+def _order_row(node, synced_at):
+    if 'lineItems' in node:
+        node['lineItems'] = as_connection(node['lineItems'])
+    customer = node.get('customer') or {}
+    return {
+        'id': node['id'],
+        'legacy_id': legacy_id(node['id']),
+        'name': node.get('name'),
+        'email': node.get('email'),
+        'customer_id': customer.get('id'),
+        'total_price': _to_float(node.get('totalPrice')),
+        'currency_code': node.get('currencyCode'),
+        'financial_status': node.get('financialStatus'),
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+        'payload': json.dumps(node, separators=(',', ':')),
+        'synced_at': synced_at,
+    }
+
+
+def _customer_row(node, synced_at):
+    return {
+        'id': node['id'],
+        'legacy_id': legacy_id(node['id']),
+        'first_name': node.get('firstName'),
+        'last_name': node.get('lastName'),
+        'email': node.get('email'),
+        'updated_at': node.get('updatedAt'),
+        'payload': json.dumps(node, separators=(',', ':')),
+        'synced_at': synced_at,
+    }
+
+
+def upsert_nodes(resource, nodes, synced_at=None):
+    """Write GraphQL nodes (live or bulk-export shape) into the mirror
+
+    Rows are replaced with one DELETE ... IN and one executemany INSERT per
+    table rather than a SELECT per node. Returns the number of nodes written.
+    """
+    synced_at = synced_at or datetime.utcnow()
+    nodes = [node for node in nodes if node.get('id')]
+    if not nodes:
+        return 0
+    ensure_search_index()
+    ids = [node['id'] for node in nodes]
+    model = MIRROR_MODELS[resource]
+
+    if resource == 'products':
+        rows, variants = [], []
+        for node in nodes:
+            product, product_variants = _product_rows(node, synced_at)
+            rows.append(product)
+            variants.extend(product_variants)
+        ProductVariant.query.filter(ProductVariant.product_id.in_(ids)).delete(synchronize_session=False)
+    elif resource == 'orders':
+        rows, variants = [_order_row(node, synced_at) for node in nodes], []
+    else:
+        rows, variants = [_customer_row(node, synced_at) for node in nodes], []
+
+    model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+    db.session.execute(insert(model), rows)
+    if variants:
+        db.session.execute(insert(ProductVariant), variants)
+    if resource == 'products':
+        index_rows(resource, [
+            {**row, 'description': node.get('description')} for row, node in zip(rows, nodes)
+        ], variants)
+    else:
+        index_rows(resource, rows)
+    db.session.commit()
+    return len(rows)
+
+
+def delete_nodes(resource, ids):
+    """Remove mirrored rows by GID"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    ensure_search_index()
+    model = MIRROR_MODELS[resource]
+    if resource == 'products':
+        ProductVariant.query.filter(ProductVariant.product_id.in_(ids)).delete(synchronize_session=False)
+    deleted = model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+    unindex(resource, [legacy_id(gid) for gid in ids])
+    db.session.commit()
+    return deleted
+
+
+def sweep(resource, before):
+    """Delete rows a full sync did not see (removed from the store)"""
+    model = MIRROR_MODELS[resource]
+    stale_ids = [row.id for row in model.query.with_entities(model.id).filter(model.synced_at < before)]
+    return delete_nodes(resource, stale_ids)
+
+
+def record_sync(resource, last_updated_at, synced_at, full=False):
+    """Advance a resource's sync cursor after a successful sync"""
+    state = db.session.get(SyncState, resource) or SyncState(resource=resource)
+    if last_updated_at and (not state.last_updated_at or last_updated_at > state.last_updated_at):
+        state.last_updated_at = last_updated_at
+    state.last_synced_at = synced_at
+    if full:
+        state.last_full_sync_at = synced_at
+    state.row_count = MIRROR_MODELS[resource].query.count()
+    db.session.add(state)
+    db.session.commit()
+    return state
+
+
+def get_sync_state(resource):
+    return db.session.get(SyncState, resource)
+
+
+def mirror_age(resource):
+    """Seconds since the resource was last synced, or None if never"""
+    state = get_sync_state(resource)
+    if state is None or state.last_synced_at is None:
+        return None
+    return (datetime.utcnow() - state.last_synced_at).total_seconds()
+
+
+def _fresh_age(resource):
+    if not CATALOG_MIRROR_ENABLED:
+        return None
+    age = mirror_age(resource)
+    if age is None or age > CATALOG_MAX_STALENESS:
+        return None
+    return age
+
+
+def _response(data, resource, age):
+    return {
+        'data': data,
+        'extensions': {'mirror': {'resource': resource, 'age_seconds': round(age, 1)}},
+    }
+
+
+def _limit_connection(node, key, count):
+    connection = node.get(key)
+    if isinstance(connection, dict) and 'edges' in connection:
+        node[key] = {'edges': connection['edges'][:count]}
+    return node
+
+
+def _connection(rows, shape=None):
+    nodes = [row.to_node() for row in rows]
+    if shape:
+        nodes = [shape(node) for node in nodes]
+    return {'edges': [{'node': node} for node in nodes]}
+
+
+def _list_product(node):
+    # Same selection sizes as the live products list query
+    _limit_connection(node, 'images', 1)
+    return _limit_connection(node, 'variants', 5)
+
+
+def read_products(limit=10, search_title=''):
+    """Products list in live-query shape, or None if the mirror cannot answer"""
+    try:
+        age = _fresh_age('products')
+        if age is None:
+            return None
+        query = Product.query
+        if search_title:
+            query = query.filter(Product.title.ilike(f'%{search_title}%'))
+        rows = query.order_by(Product.legacy_id).limit(limit).all()
+        return _response({'products': _connection(rows, _list_product)}, 'products', age)
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def read_product(product_id):
+    """Single product in live-query shape, or None if not mirrored or stale"""
+    try:
+        age = _fresh_age('products')
+        if age is None:
+            return None
+        row = db.session.get(Product, product_id)
+        if row is None:
+            # Possibly created since the last sync; let the live API decide
+            return None
+        node = row.to_node()
+        _limit_connection(node, 'images', 10)
+        _limit_connection(node, 'variants', 10)
+        return _response({'product': node}, 'products', age)
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def read_orders(limit=10):
+    """Orders list in live-query shape, or None if the mirror cannot answer"""
+    try:
+        age = _fresh_age('orders')
+        if age is None:
+            return None
+        rows = Order.query.order_by(Order.legacy_id).limit(limit).all()
+        return _response({'orders': _connection(rows)}, 'orders', age)
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def read_order_nodes(since=None, until=None):
+    """Every mirrored order created in [since, until) as (nodes, age), or None if the mirror cannot answer"""
+    try:
+        age = _fresh_age('orders')
+        if age is None:
+            return None
+        query = select(Order.payload)
+        # ISO-8601 UTC timestamps sort as strings
+        if since:
+            query = query.where(Order.created_at >= since)
+        if until:
+            query = query.where(Order.created_at < until)
+        payloads = db.session.execute(query.order_by(Order.legacy_id)).scalars()
+        return [json.loads(payload) for payload in payloads], age
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def read_customers(limit=10, search_query=''):
+    """Customers list in live-query shape, or None if the mirror cannot answer
+
+    Only plain-text searches are answered locally; Shopify search syntax
+    (field:value filters) goes to the live API.
+    """
+    if ':' in (search_query or ''):
+        return None
+    try:
+        age = _fresh_age('customers')
+        if age is None:
+            return None
+        query = Customer.query
+        if search_query:
+            pattern = f'%{search_query}%'
+            query = query.filter(db.or_(
+                Customer.first_name.ilike(pattern),
+                Customer.last_name.ilike(pattern),
+                Customer.email.ilike(pattern),
+            ))
+        rows = query.order_by(Customer.legacy_id).limit(limit).all()
+        return _response({'customers': _connection(rows)}, 'customers', age)
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def _search(resource, model, match, search, limit, shape=None):
+    try:
+        age = _fresh_age(resource)
+        if age is None:
+            return None
+        matches = match(search, limit)
+        if matches is None:
+            return None
+        rows = {row.id: row for row in model.query.filter(model.id.in_([gid for gid, _ in matches]))}
+        edges = []
+        for gid, score in matches:
+            if gid in rows:
+                node = rows[gid].to_node()
+                edges.append({'node': shape(node) if shape else node, 'score': round(score, 4)})
+        return _response({resource: {'edges': edges}}, resource, age)
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def search_products(search, limit=10):
+    """Ranked full-text product search over the mirror, or None if it cannot answer
+
+    Matches title, description, tags, SKUs and vendor; every word is a
+    prefix, so partial input ("blu sh") finds "Blue Shirt".
+    """
+    return _search('products', Product, match_products, search, limit, _list_product)
+
+
+def search_customers(search, limit=10):
+    """Ranked full-text customer search (name, email), or None if it cannot answer"""
+    return _search('customers', Customer, match_customers, search, limit)
+
+
+def mirror_status():
+    """Sync state and freshness for every mirrored resource"""
+    status = {}
+    for resource in MIRROR_MODELS:
+        state = get_sync_state(resource)
+        age = mirror_age(resource)
+        status[resource] = {
+            **(state.to_dict() if state else {'resource': resource}),
+            'age_seconds': round(age, 1) if age is not None else None,
+            'fresh': age is not None and age <= CATALOG_MAX_STALENESS,
+        }
+    return {
+        'enabled': CATALOG_MIRROR_ENABLED,
+        'max_staleness': CATALOG_MAX_STALENESS,
+        'resources': status,
+    }
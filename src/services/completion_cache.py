@@ -0,0 +1,176 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from src.services.shopify_cache import TTLCache, shopify_cache
+
+AI_COMPLETION_CACHE_ENABLED = os.getenv('AI_COMPLETION_CACHE_ENABLED', '1') == '1'
+AI_COMPLETION_CACHE_TTL = float(os.getenv('AI_COMPLETION_CACHE_TTL', 300))
+AI_COMPLETION_CACHE_MAXSIZE = int(os.getenv('AI_COMPLETION_CACHE_MAXSIZE', 256))
+# Near-duplicate matching on the last user message; off unless asked for
+AI_COMPLETION_CACHE_SEMANTIC = os.getenv('AI_COMPLETION_CACHE_SEMANTIC', '0') == '1'
+AI_COMPLETION_CACHE_SIMILARITY = float(os.getenv('AI_COMPLETION_CACHE_SIMILARITY', 0.9))
+
+EMBEDDING_DIMENSIONS = 512
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive form of a prompt"""
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def _normalize_message(message):
+    normalized = {'role': message.get('role')}
+    if message.get('role') == 'user':
+        normalized['content'] = normalize_text(message.get('content'))
+    else:
+        normalized['content'] = ' '.join((message.get('content') or '').split())
+    if message.get('tool_calls'):
+        normalized['tool_calls'] = [
+            [call['function']['name'], call['function']['arguments']]
+            for call in message['tool_calls']
+        ]
+    if message.get('tool_call_id'):
+        normalized['tool_call_id'] = message['tool_call_id']
+    return normalized
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def local_embedding(text):
+    """Cheap local embedding: L2-normalized hashed word and character-trigram counts
+
+    Good enough to match rephrasings of the same short canned prompt
+    ("show me my recent orders" vs "show my recent orders") without a model.
+    """
+    normalized = normalize_text(text)
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    features = normalized.split()
+    padded = f' {normalized} '
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for feature in features:
+        vector[zlib.crc32(feature.encode()) % EMBEDDING_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class CompletionCache:
+    """Cache of finished agent turns keyed on normalized messages plus tool definitions
+
+    Entries remember the Shopify data version they were built from; any
+    mutation or invalidation bumps that version and makes them stale.
+    """
+
+    def __init__(self, maxsize=AI_COMPLETION_CACHE_MAXSIZE, ttl=AI_COMPLETION_CACHE_TTL,
+                 semantic=AI_COMPLETION_CACHE_SEMANTIC, embedder=local_embedding):
+        self.ttl = ttl
+        self.semantic = semantic
+        self.embedder = embedder
+        self.entries = TTLCache(maxsize)
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.stale = 0
+        self.semantic_hits = 0
+        self.saved_ms = 0.0
+
+    def keys_for(self, messages, tools, model='gpt-4'):
+        """Return (exact key, context key) for a turn's input messages"""
+        normalized = [_normalize_message(m) for m in messages]
+        tools_digest = _digest(tools or [])
+        context = _digest([model, tools_digest, normalized[:-1]])
+        return _digest([context, normalized[-1]]), context
+
+    def _get_fresh(self, key):
+        hit, entry = self.entries.get(key)
+        if not hit:
+            return None
+        if entry['data_version'] != shopify_cache.data_version:
+            with self._lock:
+                self.stale += 1
+            return None
+        return entry
+
+    def lookup(self, messages, tools, model='gpt-4'):
+        """Return a cached turn for these messages, or None"""
+        if not AI_COMPLETION_CACHE_ENABLED:
+            return None
+        key, context = self.keys_for(messages, tools, model)
+        entry = self._get_fresh(key)
+
+        if entry is None and self.semantic and messages[-1].get('role') == 'user':
+            vector = self.embedder(messages[-1].get('content') or '')
+            with self._lock:
+                candidates = [
+                    (_cosine(vector, entry_vector), entry_key)
+                    for entry_key, (entry_context, entry_vector) in self._vectors.items()
+                    if entry_context == context
+                ]
+            for score, entry_key in sorted(candidates, reverse=True):
+                if score < AI_COMPLETION_CACHE_SIMILARITY:
+                    break
+                entry = self._get_fresh(entry_key)
+                if entry is not None:
+                    with self._lock:
+                        self.semantic_hits += 1
+                    break
+
+        with self._lock:
+            self.lookups += 1
+            if entry is not None:
+                self.hits += 1
+                self.saved_ms += entry['elapsed_ms']
+        return entry
+
+    def store(self, messages, tools, turn_messages, result, model='gpt-4'):
+        """Cache a finished turn: the messages it added and its result payload"""
+        if not AI_COMPLETION_CACHE_ENABLED:
+            return
+        key, context = self.keys_for(messages, tools, model)
+        entry = {
+            'messages': turn_messages,
+            'result': result,
+            'elapsed_ms': result.get('elapsed_ms', 0),
+            'data_version': shopify_cache.data_version,
+        }
+        self.entries.set(key, entry, self.ttl)
+        if self.semantic and messages[-1].get('role') == 'user':
+            vector = self.embedder(messages[-1].get('content') or '')
+            with self._lock:
+                self._vectors[key] = (context, vector)
+                # Keep the vector index no larger than the entry cache
+                while len(self._vectors) > self.entries.maxsize:
+                    self._vectors.pop(next(iter(self._vectors)))
+
+    def stats(self):
+        entries = self.entries.stats()
+        with self._lock:
+            return {
+                'enabled': AI_COMPLETION_CACHE_ENABLED,
+                'size': entries['size'],
+                'maxsize': entries['maxsize'],
+                'evictions': entries['evictions'],
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0,
+                'semantic': self.semantic,
+                'semantic_hits': self.semantic_hits,
+                'stale': self.stale,
+                'saved_ms': round(self.saved_ms, 1),
+                'ttl': self.ttl,
+            }
+
+
+completion_cache = CompletionCache()
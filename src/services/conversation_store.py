@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from src.models.conversation import Conversation, ConversationMessage
+from src.models.user import db
+from src.services.storage import write_batcher
+from src.services.tool_compaction import estimate_tokens
+
+AI_CONVERSATION_CACHE_SIZE = int(os.getenv('AI_CONVERSATION_CACHE_SIZE', 256))
+AI_CONVERSATION_TOKEN_BUDGET = int(os.getenv('AI_CONVERSATION_TOKEN_BUDGET', 6000))
+AI_CONVERSATION_SUMMARY_CHARS = int(os.getenv('AI_CONVERSATION_SUMMARY_CHARS', 2000))
+# Times append() reloads and retries after another turn wrote the conversation first
+AI_CONVERSATION_APPEND_RETRIES = int(os.getenv('AI_CONVERSATION_APPEND_RETRIES', 3))
+
+
+class ConversationNotFound(Exception):
+    """Raised when a conversation ID is unknown"""
+
+
+class ConversationConflict(Exception):
+    """Raised when concurrent turns keep writing the same conversation"""
+
+
+def _clip(text, limit=200):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def summarize_turn(turn):
+    """One-line extractive summary of an evicted turn (tool payloads are dropped)"""
+    user = next((m.get('content') for m in turn if m.get('role') == 'user'), '')
+    tools = sorted({
+        call['function']['name']
+        for m in turn if m.get('role') == 'assistant'
+        for call in m.get('tool_calls') or []
+    })
+    answer = next((m.get('content') for m in reversed(turn)
+                   if m.get('role') == 'assistant' and m.get('content')), '')
+    line = f'- User: {_clip(user)}'
+    if tools:
+        line += f" (tools: {', '.join(tools)})"
+    if answer:
+        line += f' / Assistant: {_clip(answer)}'
+    return line
+
+
+class _State:
+    __slots__ = ('summary', 'messages', 'tokens', 'next_position', 'version')
+
+    def __init__(self, summary, messages, tokens, next_position, version):
+        self.summary = summary
+        self.messages = messages
+        self.tokens = tokens
+        self.next_position = next_position
+        self.version = version
+
+
+class ConversationStore:
+    """Server-side chat history: SQLite via db, with an in-memory LRU in front
+
+    Each cached entry remembers the conversation's version; a cheap primary
+    key lookup on every read catches writes made by another worker process.
+    Once the stored history exceeds the token budget, the oldest whole turns
+    are evicted into a short running summary so the prompt stays bounded.
+    """
+
+    def __init__(self, maxsize=AI_CONVERSATION_CACHE_SIZE, token_budget=AI_CONVERSATION_TOKEN_BUDGET):
+        self.maxsize = maxsize
+        self.token_budget = token_budget
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, conversation_id, state):
+        with self._lock:
+            self._cache[conversation_id] = state
+            self._cache.move_to_end(conversation_id)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _load(self, conversation):
+        rows = (ConversationMessage.query
+                .filter_by(conversation_id=conversation.id)
+                .order_by(ConversationMessage.position)
+                .all())
+        messages = [row.to_message() for row in rows]
+        return _State(
+            conversation.summary,
+            messages,
+            [row.tokens for row in rows],
+            rows[-1].position + 1 if rows else 0,
+            conversation.version,
+        )
+
+    def _state(self, conversation_id):
+        conversation = db.session.get(Conversation, conversation_id)
+        if conversation is None:
+            with self._lock:
+                self._cache.pop(conversation_id, None)
+            raise ConversationNotFound(conversation_id)
+
+        with self._lock:
+            state = self._cache.get(conversation_id)
+            if state is not None and state.version == conversation.version:
+                self._cache.move_to_end(conversation_id)
+                self.hits += 1
+                return conversation, state
+            self.misses += 1
+
+        state = self._load(conversation)
+        self._remember(conversation_id, state)
+        return conversation, state
+
+    def create(self):
+        """Start a new conversation and return its ID"""
+        conversation = Conversation(id=str(uuid.uuid4()), version=0)
+        db.session.add(conversation)
+        db.session.commit()
+        self._remember(conversation.id, _State(None, [], [], 0, 0))
+        return conversation.id
+
+    def history(self, conversation_id):
+        """Messages to send to the model ahead of the next user message"""
+        _conversation, state = self._state(conversation_id)
+        history = list(state.messages)
+        if state.summary:
+            history.insert(0, {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{state.summary}",
+            })
+        return history
+
+    def transcript(self, conversation_id):
+        """User and assistant text for display (no tool payloads)"""
+        _conversation, state = self._state(conversation_id)
+        return [
+            {'role': m['role'], 'content': m['content']}
+            for m in state.messages
+            if m.get('role') in ('user', 'assistant') and m.get('content')
+        ]
+
+    def append(self, conversation_id, messages):
+        """Persist the messages of a finished turn and enforce the token budget
+
+        The write only applies if the conversation is still at the version
+        it was read at; when a concurrent turn got there first, the state is
+        reloaded and the messages go after that turn's.
+        """
+        for _attempt in range(AI_CONVERSATION_APPEND_RETRIES + 1):
+            conversation, state = self._state(conversation_id)
+            result = self._try_append(conversation_id, state, messages)
+            # The write went through another session; don't reuse our stale copy
+            db.session.expire(conversation)
+            if result is not None:
+                return result
+            with self._lock:
+                self._cache.pop(conversation_id, None)
+        raise ConversationConflict(conversation_id)
+
+    def _try_append(self, conversation_id, state, messages):
+        # None when the conversation moved past state.version
+        new_messages = list(state.messages)
+        new_tokens = list(state.tokens)
+        position = state.next_position
+        rows = []
+        for message in messages:
+            content = json.dumps(message)
+            tokens = estimate_tokens(content)
+            rows.append({
+                'conversation_id': conversation_id,
+                'position': position,
+                'role': message.get('role', ''),
+                'content': content,
+                'tokens': tokens,
+            })
+            new_messages.append(message)
+            new_tokens.append(tokens)
+            position += 1
+
+        summary = state.summary
+        evicted = 0
+        # Evict whole turns (a user message up to the next one) so tool
+        # results never lose the assistant message that requested them
+        while sum(new_tokens) > self.token_budget:
+            next_turn = next((i for i, m in enumerate(new_messages) if i > 0 and m.get('role') == 'user'), None)
+            if next_turn is None:
+                break
+            line = summarize_turn(new_messages[:next_turn])
+            summary = f'{summary}\n{line}' if summary else line
+            evicted += next_turn
+            del new_messages[:next_turn]
+            del new_tokens[:next_turn]
+
+        if evicted and len(summary) > AI_CONVERSATION_SUMMARY_CHARS:
+            # Keep the most recent summary lines
+            summary = summary[-AI_CONVERSATION_SUMMARY_CHARS:].split('\n', 1)[-1]
+        first_kept = position - len(new_messages)
+        version = state.version + 1
+
+        def write():
+            # Claim the next version first; if another turn already did, write nothing
+            claimed = db.session.execute(update(Conversation)
+                                         .where(Conversation.id == conversation_id,
+                                                Conversation.version == state.version)
+                                         .values(summary=summary, version=version))
+            if claimed.rowcount != 1:
+                return False
+            if rows:
+                db.session.execute(insert(ConversationMessage), rows)
+            if evicted:
+                db.session.execute(delete(ConversationMessage).where(
+                    ConversationMessage.conversation_id == conversation_id,
+                    ConversationMessage.position < first_kept,
+                ))
+            return True
+
+        # Shares a commit with other requests' turns; returns once durable
+        try:
+            if not write_batcher.run(write):
+                return None
+        except IntegrityError:
+            # Positions taken by a writer that bypassed the version check
+            return None
+
+        self._remember(conversation_id, _State(summary, new_messages, new_tokens, position, version))
+        return {'evicted_messages': evicted, 'history_tokens': sum(new_tokens)}
+
+    def delete(self, conversation_id):
+        with self._lock:
+            self._cache.pop(conversation_id, None)
+        ConversationMessage.query.filter_by(conversation_id=conversation_id).delete()
+        deleted = Conversation.query.filter_by(id=conversation_id).delete()
+        db.session.commit()
+        return bool(deleted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached': len(self._cache),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'token_budget': self.token_budget,
+            }
+
+
+conversation_store = ConversationStore()
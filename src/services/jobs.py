@@ -0,0 +1,124 @@
+import json
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import insert, update
+from src.models.job import Job
+from src.models.user import db
+from src.services.storage import write_batcher
+
+# Worker threads per process; Shopify's cost bucket is per store, so more
+# workers mostly means more waiting
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 1))
+JOBS_QUEUE_SIZE = int(os.getenv('JOBS_QUEUE_SIZE', 1000))
+
+
+class JobQueueFull(Exception):
+    """Raised when a job cannot be queued"""
+
+
+class JobContext:
+    """Handed to a job handler so it can report progress"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.completed = 0
+        self.failed = 0
+
+    def progress(self, completed=0, failed=0):
+        """Add to the job's completed / failed counts, visible to status polls"""
+        self.completed += completed
+        self.failed += failed
+        _update(self.job_id, completed=self.completed, failed=self.failed)
+
+
+def _update(job_id, **values):
+    write_batcher.run(lambda: db.session.execute(update(Job).where(Job.id == job_id).values(**values)))
+
+
+class JobQueue:
+    """In-process background jobs with their status kept in the database
+
+    Handlers are registered by kind and called as handler(context, payload)
+    on a worker thread with an app context; their return value is stored as
+    the job's JSON result. Payloads only live in memory: a job still queued
+    or running when its process exits stays in that state and must be
+    resubmitted.
+    """
+
+    def __init__(self, workers=JOBS_WORKERS, maxsize=JOBS_QUEUE_SIZE):
+        self.workers = workers
+        self._handlers = {}
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def _ensure_started(self, app):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for index in range(self.workers):
+                threading.Thread(target=self._work_forever, args=(app,), daemon=True,
+                                 name=f'job-worker-{index}').start()
+
+    def submit(self, app, kind, payload, total=0):
+        """Record a queued job, hand it to a worker and return its ID"""
+        if kind not in self._handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        if self._queue.full():
+            raise JobQueueFull('Too many queued jobs, try again later')
+        job_id = str(uuid.uuid4())
+        write_batcher.run(lambda: db.session.execute(insert(Job).values(
+            id=job_id, kind=kind, status='queued', total=total, created_at=datetime.utcnow(),
+        )))
+        self._ensure_started(app)
+        try:
+            self._queue.put_nowait((job_id, kind, payload))
+        except queue.Full:
+            _update(job_id, status='failed', error='Job queue is full', finished_at=datetime.utcnow())
+            raise JobQueueFull('Too many queued jobs, try again later')
+        return job_id
+
+    def _work_forever(self, app):
+        while True:
+            job_id, kind, payload = self._queue.get()
+            try:
+                with app.app_context():
+                    self._run(job_id, kind, payload)
+            except Exception:
+                app.logger.exception('Job %s failed to record its outcome', job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id, kind, payload):
+        _update(job_id, status='running', started_at=datetime.utcnow())
+        context = JobContext(job_id)
+        try:
+            result = self._handlers[kind](context, payload)
+        except Exception as e:
+            _update(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+            return
+        finally:
+            db.session.remove()
+        _update(job_id, status='succeeded', completed=context.completed, failed=context.failed,
+                result=json.dumps(result), finished_at=datetime.utcnow())
+
+    def stats(self):
+        return {'workers': self.workers, 'queued': self._queue.qsize(), 'kinds': sorted(self._handlers)}
+
+
+def get_job(job_id, include_result=True):
+    """Job status as a dict, or None if unknown"""
+    job = db.session.get(Job, job_id)
+    return job.to_dict(include_result) if job is not None else None
+
+
+job_queue = JobQueue()
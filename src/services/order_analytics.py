@@ -0,0 +1,261 @@
+import numpy as np
+
+PERIODS = ('day', 'week', 'month')
+TOP_PRODUCTS_BY = ('revenue', 'quantity', 'orders')
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _money(money_bag):
+    return _to_float(((money_bag or {}).get('shopMoney') or {}).get('amount'))
+
+
+def _line_revenue(item, quantity):
+    """What the customer paid for a line, after line-level discounts
+
+    Falls back to the unit price at the time of the order, then (for
+    payloads mirrored before those fields were selected) the variant's
+    current price.
+    """
+    paid = _money(item.get('discountedTotalSet'))
+    if not np.isnan(paid):
+        return paid
+    unit = _money(item.get('originalUnitPriceSet'))
+    if np.isnan(unit):
+        unit = _to_float((item.get('variant') or {}).get('price'))
+    return unit * quantity
+
+
+def _line_items(node):
+    line_items = node.get('lineItems') or {}
+    if isinstance(line_items, list):
+        return line_items
+    return [edge['node'] for edge in line_items.get('edges') or []]
+
+
+def _codes(values):
+    """Integer code per value plus the distinct values, in first-seen order"""
+    uniques, first_index, inverse = np.unique(np.asarray(values, dtype=object).astype(str),
+                                              return_index=True, return_inverse=True)
+    order = np.argsort(first_index, kind='stable')
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return remap[inverse.reshape(-1)], uniques[order]
+
+
+class OrderFrame:
+    """Orders and their line items as parallel NumPy columns
+
+    Order columns are indexed by order; line item columns carry line_order,
+    the index of the order each line belongs to. Strings are dictionary
+    encoded (customer, product) so grouping is np.bincount over int codes.
+    """
+
+    def __init__(self, nodes):
+        created = []
+        totals = []
+        customers = []
+        currencies = []
+        line_order = []
+        line_keys = []
+        line_titles = []
+        quantities = []
+        revenues = []
+        for index, node in enumerate(nodes):
+            created.append((node.get('createdAt') or '1970-01-01T00:00:00')[:19])
+            totals.append(_to_float(node.get('totalPrice')))
+            customers.append((node.get('customer') or {}).get('id') or '')
+            currencies.append(node.get('currencyCode') or '')
+            for item in _line_items(node):
+                variant = item.get('variant') or {}
+                quantity = item.get('quantity') or 0
+                line_order.append(index)
+                # SKU when there is one, else the line title
+                line_keys.append(item.get('sku') or variant.get('sku') or item.get('title') or '')
+                line_titles.append(item.get('title') or '')
+                quantities.append(quantity)
+                revenues.append(_line_revenue(item, quantity))
+
+        self.created = np.array(created, dtype='datetime64[s]')
+        self.total = np.nan_to_num(np.array(totals, dtype=np.float64))
+        customer_codes, customer_ids = _codes(customers) if customers else (np.zeros(0, np.int64), np.zeros(0, str))
+        # Guest checkouts have no customer: code -1
+        guest = np.flatnonzero(customer_ids == '')
+        if len(guest):
+            customer_codes = np.where(customer_codes == guest[0], -1, customer_codes)
+            customer_codes = customer_codes - (customer_codes > guest[0])
+            customer_ids = np.delete(customer_ids, guest[0])
+        self.customer = customer_codes.astype(np.int64)
+        self.customer_ids = customer_ids
+        self.currencies = sorted(set(currencies) - {''})
+
+        self.line_order = np.array(line_order, dtype=np.int64)
+        if line_keys:
+            self.line_key, self.product_keys = _codes(line_keys)
+        else:
+            self.line_key, self.product_keys = np.zeros(0, np.int64), np.zeros(0, str)
+        self.line_title = np.array(line_titles, dtype=object)
+        self.quantity = np.array(quantities, dtype=np.int64)
+        self.line_revenue = np.nan_to_num(np.array(revenues, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.created)
+
+
+def _date(value):
+    return str(value.astype('datetime64[D]'))
+
+
+def period_start(created, period):
+    """Truncate datetime64 values to the start of their day, ISO week (Monday) or month"""
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    days = created.astype('datetime64[D]')
+    if period == 'day':
+        return days
+    if period == 'week':
+        # 1970-01-01 was a Thursday
+        return days - ((days.astype(np.int64) + 3) % 7)
+    return created.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def summary(frame):
+    """Order count, revenue, AOV, units and repeat-customer rate"""
+    if not len(frame):
+        return {'orders': 0, 'revenue': 0.0, 'average_order_value': 0.0, 'median_order_value': 0.0,
+                'units': 0, 'customers': 0, 'guest_orders': 0, 'repeat_customer_rate': 0.0,
+                'first_order_at': None, 'last_order_at': None, 'currencies': []}
+    known = frame.customer[frame.customer >= 0]
+    orders_per_customer = np.bincount(known, minlength=len(frame.customer_ids))
+    customers = int(np.count_nonzero(orders_per_customer))
+    revenue = float(frame.total.sum())
+    return {
+        'orders': len(frame),
+        'revenue': round(revenue, 2),
+        'average_order_value': round(revenue / len(frame), 2),
+        'median_order_value': round(float(np.median(frame.total)), 2),
+        'units': int(frame.quantity.sum()),
+        'customers': customers,
+        'guest_orders': int(np.count_nonzero(frame.customer < 0)),
+        'repeat_customer_rate': round(float(np.count_nonzero(orders_per_customer > 1)) / customers, 4) if customers else 0.0,
+        'first_order_at': _date(frame.created.min()),
+        'last_order_at': _date(frame.created.max()),
+        'currencies': frame.currencies,
+    }
+
+
+def revenue_by_period(frame, period='day'):
+    """Revenue, orders and AOV per day, week or month"""
+    if not len(frame):
+        return []
+    buckets, inverse = np.unique(period_start(frame.created, period), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    revenue = np.bincount(inverse, weights=frame.total, minlength=len(buckets))
+    orders = np.bincount(inverse, minlength=len(buckets))
+    units = np.bincount(inverse[frame.line_order], weights=frame.quantity, minlength=len(buckets))
+    aov = revenue / np.maximum(orders, 1)
+    return [
+        {
+            'period': str(bucket),
+            'orders': int(count),
+            'revenue': round(float(total), 2),
+            'average_order_value': round(float(average), 2),
+            'units': int(unit_count),
+        }
+        for bucket, count, total, average, unit_count in zip(buckets, orders, revenue, aov, units)
+    ]
+
+
+def top_products(frame, by='revenue', limit=10):
+    """Best sellers by line item revenue, units sold or number of orders"""
+    if by not in TOP_PRODUCTS_BY:
+        raise ValueError(f"by must be one of {', '.join(TOP_PRODUCTS_BY)}")
+    products = len(frame.product_keys)
+    if not products:
+        return []
+    revenue = np.bincount(frame.line_key, weights=frame.line_revenue, minlength=products)
+    units = np.bincount(frame.line_key, weights=frame.quantity, minlength=products)
+    # An order with the same product on two lines counts once
+    pairs = np.unique(frame.line_key * max(len(frame), 1) + frame.line_order)
+    orders = np.bincount(pairs // max(len(frame), 1), minlength=products)
+    ranking = {'revenue': revenue, 'quantity': units, 'orders': orders}[by]
+
+    limit = max(1, min(limit, products))
+    top = np.argpartition(-ranking, limit - 1)[:limit]
+    top = top[np.lexsort((top, -ranking[top]))]
+    # Title from the first line item of each product
+    _codes_seen, first_line = np.unique(frame.line_key, return_index=True)
+    total_revenue = revenue.sum()
+    return [
+        {
+            'product': str(frame.product_keys[code]),
+            'title': frame.line_title[first_line[code]],
+            'revenue': round(float(revenue[code]), 2),
+            'units': int(units[code]),
+            'orders': int(orders[code]),
+            'revenue_share': round(float(revenue[code] / total_revenue), 4) if total_revenue else 0.0,
+        }
+        for code in top
+    ]
+
+
+def _period_number(starts, period):
+    """Consecutive integers for consecutive periods"""
+    if period == 'month':
+        return starts.astype('datetime64[M]').astype(np.int64)
+    days = starts.astype(np.int64)
+    # Weeks start on Monday; 1970-01-05 was the first one
+    return (days - 4) // 7 if period == 'week' else days
+
+
+def _period_label(number, period):
+    if period == 'month':
+        return str(np.datetime64(int(number), 'M'))
+    return str(np.datetime64(int(number) * 7 + 4 if period == 'week' else int(number), 'D'))
+
+
+def cohorts(frame, period='month'):
+    """Customers grouped by the period of their first order, with activity and revenue per later period"""
+    known = np.flatnonzero(frame.customer >= 0)
+    if not len(known):
+        return []
+    customer = frame.customer[known]
+    number = _period_number(period_start(frame.created[known], period), period)
+
+    first = np.full(len(frame.customer_ids), np.iinfo(np.int64).max)
+    np.minimum.at(first, customer, number)
+    cohort = first[customer]
+    offset = number - cohort
+
+    cohort_numbers, cohort_index = np.unique(cohort, return_inverse=True)
+    cohort_index = cohort_index.reshape(-1)
+    width = int(offset.max()) + 1
+    cells = cohort_index * width + offset
+
+    # Distinct customers per (cohort, offset) cell
+    active = np.unique(cells.astype(np.int64) * len(frame.customer_ids) + customer)
+    active = np.bincount(active // len(frame.customer_ids), minlength=len(cohort_numbers) * width)
+    revenue = np.bincount(cells, weights=frame.total[known], minlength=len(cohort_numbers) * width)
+    active = active.reshape(len(cohort_numbers), width)
+    revenue = revenue.reshape(len(cohort_numbers), width)
+
+    result = []
+    for row, number in enumerate(cohort_numbers):
+        size = int(active[row, 0])
+        activity = active[row]
+        # Trailing periods after the cohort's last activity are dropped
+        last = np.flatnonzero(activity)
+        activity = activity[:last[-1] + 1] if len(last) else activity[:1]
+        result.append({
+            'cohort': _period_label(number, period),
+            'customers': size,
+            'active_customers': activity.tolist(),
+            'retention': np.round(activity / max(size, 1), 4).tolist(),
+            'revenue': np.round(revenue[row, :len(activity)], 2).tolist(),
+        })
+    return result
@@ -0,0 +1,208 @@
+import re
+import threading
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from src.models.catalog import Customer, Product, ProductVariant
+from src.models.user import db
+
+# FTS5 tables over the catalog mirror. rowid is the record's numeric ID so
+# upserts and deletes are primary-key operations. prefix='2 3 4' keeps
+# short prefix queries (what a user has typed so far) off a full scan.
+PRODUCT_SEARCH_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+    gid UNINDEXED, title, description, tags, skus, vendor,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+)
+"""
+
+CUSTOMER_SEARCH_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS customer_search USING fts5(
+    gid UNINDEXED, name, email,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+)
+"""
+
+# bm25 column weights (gid first): a title hit outranks a description hit
+PRODUCT_RANK = 'bm25(product_search, 0.0, 10.0, 1.0, 4.0, 6.0, 3.0)'
+CUSTOMER_RANK = 'bm25(customer_search, 0.0, 5.0, 3.0)'
+
+_TERM_RE = re.compile(r'\w+')
+_state = {'ready': False, 'available': False}
+_state_lock = threading.Lock()
+
+
+def to_match_query(search, any_term=False):
+    """Turn free text into an FTS5 query with every term treated as a prefix
+
+    Each term also matches as a whole word, so for "17" the row containing
+    17 itself scores above rows that only contain 170 or 1703.
+    """
+    terms = _TERM_RE.findall((search or '').lower())
+    joiner = ' OR ' if any_term else ' AND '
+    return joiner.join(f'("{term}" OR "{term}"*)' for term in terms)
+
+
+def _create(connection):
+    existed = connection.execute(text(
+        "SELECT count(*) FROM sqlite_master WHERE name IN ('product_search', 'customer_search')"
+    )).scalar()
+    connection.execute(text(PRODUCT_SEARCH_DDL))
+    connection.execute(text(CUSTOMER_SEARCH_DDL))
+    return existed < 2
+
+
+def ensure_search_index():
+    """Create the FTS tables once per process; False if FTS5 is unavailable"""
+    if _state['ready']:
+        return _state['available']
+    with _state_lock:
+        if _state['ready']:
+            return _state['available']
+        available = False
+        if db.engine.dialect.name == 'sqlite':
+            try:
+                with db.engine.begin() as connection:
+                    created = _create(connection)
+                available = True
+                if created:
+                    # Mirror rows written before the index existed
+                    rebuild_search_index()
+            except OperationalError:
+                available = False
+        _state.update(ready=True, available=available)
+        return available
+
+
+def _product_documents(rows, variants):
+    skus = {}
+    for variant in variants:
+        if variant.get('sku'):
+            skus.setdefault(variant['product_id'], []).append(variant['sku'])
+    return [
+        {
+            'rowid': row['legacy_id'],
+            'gid': row['id'],
+            'title': row.get('title') or '',
+            'description': row.get('description') or '',
+            'tags': row.get('tags') or '',
+            'skus': ' '.join(skus.get(row['id'], [])),
+            'vendor': row.get('vendor') or '',
+        }
+        for row in rows
+    ]
+
+
+def _customer_documents(rows):
+    return [
+        {
+            'rowid': row['legacy_id'],
+            'gid': row['id'],
+            'name': ' '.join(filter(None, [row.get('first_name'), row.get('last_name')])),
+            'email': row.get('email') or '',
+        }
+        for row in rows
+    ]
+
+
+def _replace(table, documents):
+    if not documents:
+        return
+    db.session.execute(
+        text(f'DELETE FROM {table} WHERE rowid = :rowid'),
+        [{'rowid': document['rowid']} for document in documents],
+    )
+    columns = list(documents[0])
+    db.session.execute(
+        text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"),
+        documents,
+    )
+
+
+def index_rows(resource, rows, variants=()):
+    """Index mirror rows inside the caller's transaction
+
+    rows are the column dicts the mirror inserts; product rows may carry a
+    'description' taken from the node payload.
+    """
+    if resource not in ('products', 'customers') or not rows or not ensure_search_index():
+        return
+    if resource == 'products':
+        _replace('product_search', _product_documents(rows, variants))
+    else:
+        _replace('customer_search', _customer_documents(rows))
+
+
+def unindex(resource, legacy_ids):
+    """Remove records from the index inside the caller's transaction"""
+    if resource not in ('products', 'customers') or not legacy_ids or not ensure_search_index():
+        return
+    table = 'product_search' if resource == 'products' else 'customer_search'
+    db.session.execute(
+        text(f'DELETE FROM {table} WHERE rowid = :rowid'),
+        [{'rowid': rowid} for rowid in legacy_ids],
+    )
+
+
+def rebuild_search_index():
+    """Rebuild both FTS tables from the mirror"""
+    db.session.execute(text('DELETE FROM product_search'))
+    db.session.execute(text('DELETE FROM customer_search'))
+    variants = [
+        {'product_id': variant.product_id, 'sku': variant.sku}
+        for variant in ProductVariant.query.with_entities(ProductVariant.product_id, ProductVariant.sku)
+    ]
+    products = [
+        {
+            'id': row.id,
+            'legacy_id': row.legacy_id,
+            'title': row.title,
+            'description': row.to_node().get('description'),
+            'tags': row.tags,
+            'vendor': row.vendor,
+        }
+        for row in Product.query.all()
+    ]
+    customers = [
+        {
+            'id': row.id,
+            'legacy_id': row.legacy_id,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'email': row.email,
+        }
+        for row in Customer.query.all()
+    ]
+    _replace('product_search', _product_documents(products, variants))
+    _replace('customer_search', _customer_documents(customers))
+    db.session.commit()
+    return {'products': len(products), 'customers': len(customers)}
+
+
+def _match(table, rank, search, limit):
+    for any_term in (False, True):
+        match = to_match_query(search, any_term)
+        if not match:
+            return []
+        rows = db.session.execute(
+            text(f'SELECT gid, {rank} AS score FROM {table} WHERE {table} MATCH :match '
+                 f'ORDER BY score LIMIT :limit'),
+            {'match': match, 'limit': limit},
+        ).all()
+        # All terms first; if nothing has them all, rank partial matches
+        if rows or ' AND ' not in match:
+            return [(row.gid, -row.score) for row in rows]
+    return []
+
+
+def match_products(search, limit=10):
+    """Return [(gid, score)] for the best-matching products, best first"""
+    if not ensure_search_index():
+        return None
+    return _match('product_search', PRODUCT_RANK, search, limit)
+
+
+def match_customers(search, limit=10):
+    """Return [(gid, score)] for the best-matching customers, best first"""
+    if not ensure_search_index():
+        return None
+    return _match('customer_search', CUSTOMER_RANK, search, limit)
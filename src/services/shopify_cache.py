@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+SHOPIFY_CACHE_ENABLED = os.getenv('SHOPIFY_CACHE_ENABLED', '1') == '1'
+SHOPIFY_CACHE_MAXSIZE = int(os.getenv('SHOPIFY_CACHE_MAXSIZE', 512))
+SHOPIFY_CACHE_DEFAULT_TTL = float(os.getenv('SHOPIFY_CACHE_DEFAULT_TTL', 30))
+# Scales every TTL below. Stores that deliver webhooks to /api/shopify/webhooks
+# get changed resources invalidated as they happen and can raise this. That is
+# only safe because store() refuses results an invalidation overtook, so the
+# multiplier applies only to results stored with the data_version they were
+# fetched at; anything else keeps the base TTL.
+SHOPIFY_CACHE_TTL_MULTIPLIER = float(os.getenv('SHOPIFY_CACHE_TTL_MULTIPLIER', 1))
+
+# Seconds each top-level field may be served from cache. Shop details almost
+# never change; order lists change the fastest. A TTL of 0 disables caching
+# (bulk operation polling must always see the live status).
+SHOPIFY_CACHE_TTLS = {
+    'shop': 3600,
+    'product': 300,
+    'products': 60,
+    'productsCount': 300,
+    'orders': 30,
+    'order': 60,
+    'ordersCount': 60,
+    'customers': 60,
+    'customer': 120,
+    'customersCount': 300,
+    'node': 0,
+    'currentBulkOperation': 0,
+}
+
+_TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|[{}():]|[_A-Za-z][_0-9A-Za-z]*')
+_OPERATION_RE = re.compile(r'^\s*(query|mutation|subscription)\b')
+
+
+def operation_type(query):
+    """Return 'query', 'mutation' or 'subscription' for a GraphQL document"""
+    match = _OPERATION_RE.match(query or '')
+    return match.group(1) if match else 'query'
+
+
+def top_level_fields(query):
+    """Return the root field names selected by a GraphQL operation (aliases resolved)"""
+    start = (query or '').find('{')
+    if start < 0:
+        return []
+    fields = []
+    depth = 0
+    parens = 0
+    aliased = False
+    for token in _TOKEN_RE.findall(query, start):
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                break
+        elif token == '(':
+            parens += 1
+        elif token == ')':
+            parens -= 1
+        elif depth != 1 or parens:
+            continue
+        elif token == ':':
+            aliased = True
+        elif not token.startswith('"'):
+            if aliased and fields:
+                # "alias: field" -> keep the field
+                fields[-1] = token
+            else:
+                fields.append(token)
+            aliased = False
+    return fields
+
+
+def resource_tag(field):
+    """Map a root field or mutation name to the resource it reads or writes"""
+    for prefix, tag in (('product', 'products'), ('order', 'orders'),
+                        ('customer', 'customers'), ('shop', 'shop')):
+        if field.startswith(prefix):
+            return tag
+    return field
+
+
+def query_ttl(fields, scaled=True):
+    """Seconds a result for these root fields may be cached (scaled by the multiplier if asked)"""
+    multiplier = SHOPIFY_CACHE_TTL_MULTIPLIER if scaled else 1
+    if not fields:
+        return SHOPIFY_CACHE_DEFAULT_TTL * multiplier
+    ttl = min(SHOPIFY_CACHE_TTLS.get(field, SHOPIFY_CACHE_DEFAULT_TTL) for field in fields)
+    return ttl * multiplier
+
+
+def cache_key(query, variables=None, api_version=None):
+    """Stable key for a query plus its variables"""
+    normalized = ' '.join((query or '').split())
+    material = json.dumps([normalized, variables or {}, api_version], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a per-entry TTL"""
+
+    def __init__(self, maxsize=SHOPIFY_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return (hit, value) for a key, treating expired entries as misses"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, expires, _tags = entry
+            if expires <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value, ttl, tags=()):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_tags(self, tags):
+        """Drop every entry tagged with any of the given tags"""
+        tags = set(tags)
+        with self._lock:
+            stale = [key for key, (_v, _e, entry_tags) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.invalidations += count
+            return count
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class ShopifyResponseCache:
+    """Response cache for read-only Shopify GraphQL queries"""
+
+    def __init__(self, maxsize=SHOPIFY_CACHE_MAXSIZE):
+        self.entries = TTLCache(maxsize)
+        # Bumped whenever store data is known to have changed, so caches
+        # derived from Shopify data can tell their entries are stale
+        self.data_version = 0
+        self._version_lock = threading.Lock()
+        # Results not stored because an invalidation ran while they were fetched
+        self.stale_stores = 0
+
+    def _bump_version(self):
+        with self._version_lock:
+            self.data_version += 1
+
+    def lookup(self, query, variables=None, api_version=None):
+        """Return (key, hit, value); key is None when the query is not cacheable"""
+        if not SHOPIFY_CACHE_ENABLED or operation_type(query) != 'query':
+            return None, False, None
+        key = cache_key(query, variables, api_version)
+        hit, value = self.entries.get(key)
+        return key, hit, value
+
+    def store(self, key, query, result, ttl=None, data_version=None):
+        """Cache a successful result; errors are never cached
+
+        data_version is the version read before the request was sent. If an
+        invalidation ran while it was in flight, the result may predate the
+        change and is not stored.
+        """
+        if key is None or not isinstance(result, dict):
+            return
+        if 'error' in result or result.get('errors') or not result.get('data'):
+            return
+        fields = top_level_fields(query)
+        if ttl is None:
+            ttl = query_ttl(fields, scaled=data_version is not None)
+        # Checked and set under the version lock: invalidations bump the
+        # version before dropping entries, so an entry set here either
+        # predates the bump (and is dropped) or is refused
+        with self._version_lock:
+            if data_version is not None and data_version != self.data_version:
+                self.stale_stores += 1
+                return
+            self.entries.set(key, result, ttl, tags={resource_tag(field) for field in fields})
+
+    def invalidate_for_mutation(self, query):
+        """Drop cached reads affected by a mutation"""
+        tags = {resource_tag(field) for field in top_level_fields(query)}
+        if tags and tags <= {'bulkOperationRunQuery'}:
+            # Starting an export changes nothing that is cached
+            return 0
+        self._bump_version()
+        if not tags:
+            return self.entries.clear()
+        if tags & {'products', 'orders', 'customers', 'shop'}:
+            return self.entries.invalidate_tags(tags)
+        # Unknown mutation: be safe rather than serve stale data
+        return self.entries.clear()
+
+    def invalidate(self, resources=None):
+        """Drop cached reads for the given resources, or everything"""
+        self._bump_version()
+        if not resources:
+            return self.entries.clear()
+        return self.entries.invalidate_tags(resources)
+
+    def stats(self):
+        stats = self.entries.stats()
+        stats['enabled'] = SHOPIFY_CACHE_ENABLED
+        stats['data_version'] = self.data_version
+        stats['stale_stores'] = self.stale_stores
+        return stats
+
+
+shopify_cache = ShopifyResponseCache()
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from src.services.shopify_throttle import (
+    SHOPIFY_THROTTLE_ENABLED,
+    SHOPIFY_THROTTLE_RETRIES,
+    CostBucket,
+    backoff_delay,
+    is_throttled,
+)
+
+load_dotenv()
+
+SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN')
+MYSHOPIFY_DOMAIN = os.getenv('MYSHOPIFY_DOMAIN')
+SHOPIFY_API_VERSION = os.getenv('SHOPIFY_API_VERSION', '2023-07')
+
+# Connection pool tuning. One pool per host is enough since we only talk to
+# the store's Admin API, so pool_maxsize is what bounds concurrent sockets.
+SHOPIFY_POOL_CONNECTIONS = int(os.getenv('SHOPIFY_POOL_CONNECTIONS', 4))
+SHOPIFY_POOL_MAXSIZE = int(os.getenv('SHOPIFY_POOL_MAXSIZE', 32))
+SHOPIFY_POOL_BLOCK = os.getenv('SHOPIFY_POOL_BLOCK', '0') == '1'
+SHOPIFY_CONNECT_TIMEOUT = float(os.getenv('SHOPIFY_CONNECT_TIMEOUT', 3.05))
+SHOPIFY_READ_TIMEOUT = float(os.getenv('SHOPIFY_READ_TIMEOUT', 30))
+SHOPIFY_CONNECT_RETRIES = int(os.getenv('SHOPIFY_CONNECT_RETRIES', 2))
+
+
+def build_graphql_url(api_version=None):
+    """Build the Admin API GraphQL endpoint URL"""
+    # SHOPIFY_GRAPHQL_URL points the client at a local stand-in (see src/devtools)
+    override = os.getenv('SHOPIFY_GRAPHQL_URL')
+    if override:
+        return override
+    version = api_version or SHOPIFY_API_VERSION
+    return f"https://{MYSHOPIFY_DOMAIN}/admin/api/{version}/graphql.json"
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After') or 0)
+    except ValueError:
+        return 0.0
+
+
+class ShopifyClient:
+    """Shared keep-alive HTTP client for the Shopify Admin GraphQL API"""
+
+    def __init__(self, access_token=None, pool_connections=None, pool_maxsize=None,
+                 connect_timeout=None, read_timeout=None):
+        self.access_token = access_token or SHOPIFY_ACCESS_TOKEN
+        self.url = build_graphql_url()
+        self.timeout = (
+            connect_timeout or SHOPIFY_CONNECT_TIMEOUT,
+            read_timeout or SHOPIFY_READ_TIMEOUT,
+        )
+
+        # Only connection errors are retried here; a POST that reached Shopify
+        # is never replayed blindly.
+        retry = Retry(
+            total=SHOPIFY_CONNECT_RETRIES,
+            connect=SHOPIFY_CONNECT_RETRIES,
+            read=0,
+            status=0,
+            backoff_factor=0.2,
+            allowed_methods=None,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections or SHOPIFY_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or SHOPIFY_POOL_MAXSIZE,
+            pool_block=SHOPIFY_POOL_BLOCK,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({
+            'X-Shopify-Access-Token': self.access_token or '',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Connection': 'keep-alive',
+        })
+
+        self.bucket = CostBucket()
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._total_time = 0.0
+
+    def post(self, payload, url=None):
+        """POST a GraphQL payload and return the raw response"""
+        started = time.perf_counter()
+        try:
+            return self.session.post(url or self.url, json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._requests += 1
+                self._total_time += elapsed
+
+    def execute(self, query, variables=None, api_version=None):
+        """Run a GraphQL query and return the decoded JSON body
+
+        Requests are paced by the cost bucket and THROTTLED responses are
+        retried with backoff, so callers only see a throttle error once the
+        retry budget is spent.
+        """
+        payload = {'query': query}
+        if variables:
+            payload['variables'] = variables
+
+        url = build_graphql_url(api_version) if api_version else None
+        if not SHOPIFY_THROTTLE_ENABLED:
+            response = self.post(payload, url=url)
+            response.raise_for_status()
+            return response.json()
+
+        # Query cost scales with page size, so learn it per (query, first)
+        cost_key = (query, (variables or {}).get('first'))
+        attempt = 0
+        while True:
+            cost = self.bucket.estimate_cost(cost_key)
+            self.bucket.acquire(cost)
+            try:
+                response = self.post(payload, url=url)
+                if response.status_code == 429 and attempt < SHOPIFY_THROTTLE_RETRIES:
+                    self.bucket.settle(cost)
+                    time.sleep(max(_retry_after(response), backoff_delay(attempt)))
+                    attempt += 1
+                    continue
+                response.raise_for_status()
+                body = response.json()
+            except (requests.exceptions.RequestException, ValueError):
+                self.bucket.settle(cost)
+                raise
+
+            self.bucket.settle(cost, body, key=cost_key)
+            if is_throttled(body) and attempt < SHOPIFY_THROTTLE_RETRIES:
+                time.sleep(self.bucket.throttled_delay(body, attempt))
+                attempt += 1
+                continue
+            return body
+
+    def stats(self):
+        """Return request counters and connection pool usage"""
+        pools = []
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            # The pool queue is pre-filled with None placeholders; only real
+            # connection objects are idle keep-alive sockets.
+            queued = list(pool.pool.queue) if pool.pool is not None else []
+            pools.append({
+                'host': pool.host,
+                'port': pool.port,
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': sum(1 for conn in queued if conn is not None),
+                'maxsize': pool.pool.maxsize if pool.pool is not None else 0,
+            })
+
+        with self._lock:
+            requests_made = self._requests
+            errors = self._errors
+            total_time = self._total_time
+
+        return {
+            'requests': requests_made,
+            'errors': errors,
+            'avg_latency_ms': round(total_time / requests_made * 1000, 2) if requests_made else 0,
+            'timeout': {'connect': self.timeout[0], 'read': self.timeout[1]},
+            'pools': pools,
+            'throttle': self.bucket.stats(),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_shopify_client():
+    """Return the process-wide Shopify client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ShopifyClient()
+    return _client
+
+
+def reset_shopify_client():
+    """Drop the shared client (e.g. after fork or a config change)"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
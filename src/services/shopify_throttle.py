@@ -0,0 +1,174 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults for a standard plan; both are replaced by the store's real limits
+# from the first throttleStatus we see.
+SHOPIFY_BUCKET_SIZE = float(os.getenv('SHOPIFY_BUCKET_SIZE', 1000))
+SHOPIFY_RESTORE_RATE = float(os.getenv('SHOPIFY_RESTORE_RATE', 50))
+SHOPIFY_DEFAULT_QUERY_COST = float(os.getenv('SHOPIFY_DEFAULT_QUERY_COST', 50))
+SHOPIFY_THROTTLE_MAX_WAIT = float(os.getenv('SHOPIFY_THROTTLE_MAX_WAIT', 30))
+SHOPIFY_THROTTLE_RETRIES = int(os.getenv('SHOPIFY_THROTTLE_RETRIES', 4))
+SHOPIFY_THROTTLE_ENABLED = os.getenv('SHOPIFY_THROTTLE_ENABLED', '1') == '1'
+# Learned costs kept per (query, first); least recently used ones are dropped
+SHOPIFY_QUERY_COST_CACHE_SIZE = int(os.getenv('SHOPIFY_QUERY_COST_CACHE_SIZE', 512))
+
+
+class ShopifyThrottledError(Exception):
+    """Raised when a request would have to wait longer than the allowed maximum"""
+
+
+def get_throttle_status(body):
+    """Extract extensions.cost.throttleStatus from a GraphQL response"""
+    if not isinstance(body, dict):
+        return None
+    cost = (body.get('extensions') or {}).get('cost') or {}
+    return cost.get('throttleStatus')
+
+
+def get_requested_cost(body):
+    """Extract extensions.cost.requestedQueryCost from a GraphQL response"""
+    if not isinstance(body, dict):
+        return None
+    cost = (body.get('extensions') or {}).get('cost') or {}
+    return cost.get('requestedQueryCost')
+
+
+def is_throttled(body):
+    """True when Shopify rejected the query with a THROTTLED error"""
+    if not isinstance(body, dict):
+        return False
+    for error in body.get('errors') or []:
+        if isinstance(error, dict) and (error.get('extensions') or {}).get('code') == 'THROTTLED':
+            return True
+    return False
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CostBucket:
+    """Client-side mirror of Shopify's leaky bucket for GraphQL query cost
+
+    Callers reserve the query's expected cost before sending it. When the
+    bucket cannot cover the cost the reservation still succeeds, but the
+    caller is told how long to wait for the points to restore, so concurrent
+    requests queue up in arrival order instead of all hitting THROTTLED.
+    """
+
+    def __init__(self, maximum=None, restore_rate=None, max_query_costs=SHOPIFY_QUERY_COST_CACHE_SIZE):
+        self.maximum = maximum or SHOPIFY_BUCKET_SIZE
+        self.restore_rate = restore_rate or SHOPIFY_RESTORE_RATE
+        self._available = self.maximum
+        self._updated = time.monotonic()
+        self._in_flight = 0.0
+        self._lock = threading.Lock()
+        # Generated queries (e.g. batch mutations of varying size) make new
+        # keys all the time, so this is an LRU rather than a plain dict
+        self._query_costs = OrderedDict()
+        self.max_query_costs = max_query_costs
+
+        self.waits = 0
+        self.wait_time = 0.0
+        self.throttled = 0
+        self.retries = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._available = min(self.maximum, self._available + elapsed * self.restore_rate)
+            self._updated = now
+
+    def estimate_cost(self, key):
+        """Expected cost for a query, learned from previous responses"""
+        with self._lock:
+            cost = self._query_costs.get(key)
+            if cost is None:
+                return SHOPIFY_DEFAULT_QUERY_COST
+            self._query_costs.move_to_end(key)
+            return cost
+
+    def reserve(self, cost):
+        """Reserve points for a request and return how long to wait before sending"""
+        cost = min(cost, self.maximum)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._available -= cost
+            self._in_flight += cost
+            if self._available >= 0:
+                return 0.0
+            wait = -self._available / self.restore_rate
+            if wait > SHOPIFY_THROTTLE_MAX_WAIT:
+                # Give the reservation back rather than queue behind it
+                self._available += cost
+                self._in_flight -= cost
+                raise ShopifyThrottledError(
+                    f'Shopify query cost budget exhausted; next slot in {wait:.1f}s'
+                )
+            self.waits += 1
+            self.wait_time += wait
+            return wait
+
+    def acquire(self, cost):
+        """Reserve points for a request, sleeping until they are available"""
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def settle(self, reserved, body=None, key=None):
+        """Reconcile a reservation with the throttleStatus Shopify reported"""
+        reserved = min(reserved, self.maximum)
+        status = get_throttle_status(body)
+        requested = get_requested_cost(body)
+        with self._lock:
+            self._in_flight = max(0.0, self._in_flight - reserved)
+            if key is not None and requested is not None:
+                self._query_costs[key] = float(requested)
+                self._query_costs.move_to_end(key)
+                while len(self._query_costs) > self.max_query_costs:
+                    self._query_costs.popitem(last=False)
+
+            if not status:
+                # Nothing reached Shopify (or it did not report a cost); refund
+                self._available = min(self.maximum, self._available + reserved)
+                return
+
+            self.maximum = float(status.get('maximumAvailable') or self.maximum)
+            self.restore_rate = float(status.get('restoreRate') or self.restore_rate)
+            # Shopify's number is authoritative, less whatever other callers
+            # have reserved but not yet reported back.
+            self._available = float(status.get('currentlyAvailable', 0)) - self._in_flight
+            self._updated = time.monotonic()
+
+    def throttled_delay(self, body, attempt):
+        """How long to back off after a THROTTLED response"""
+        with self._lock:
+            self.throttled += 1
+            self.retries += 1
+        status = get_throttle_status(body) or {}
+        requested = get_requested_cost(body) or SHOPIFY_DEFAULT_QUERY_COST
+        available = float(status.get('currentlyAvailable', 0))
+        restore = float(status.get('restoreRate') or self.restore_rate)
+        refill = max(0.0, (float(requested) - available) / restore)
+        return refill + backoff_delay(attempt, base=0.25)
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'enabled': SHOPIFY_THROTTLE_ENABLED,
+                'maximum_available': self.maximum,
+                'restore_rate': self.restore_rate,
+                'estimated_available': round(self._available, 2),
+                'in_flight_cost': round(self._in_flight, 2),
+                'queued_requests': self.waits,
+                'queued_seconds': round(self.wait_time, 3),
+                'throttled_responses': self.throttled,
+                'retries': self.retries,
+                'known_query_costs': len(self._query_costs),
+            }
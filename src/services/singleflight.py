@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution
+
+    The first caller for a key runs the function; callers that arrive while
+    it is in flight block until it finishes and receive the same result (or
+    the same exception). Once the call completes the key is released, so
+    later callers start a fresh execution.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Run fn once per in-flight key and return (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            'executions': self.executions,
+            'shared': self.shared,
+            'in_flight': in_flight,
+        }
+
+
+# Published to followers when the leader was cancelled, so they start over
+_LEADER_CANCELLED = object()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop
+
+    A leader's cancellation belongs to its own request only: followers are
+    not cancelled with it, and the next of them becomes the new leader.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        """Await fn() once per in-flight key and return (result, shared)"""
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            self.shared += 1
+            # shield: a cancelled follower must not cancel the leader's call
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result, True
+            self.shared -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a flight nobody joined does not log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+    def stats(self):
+        return {
+            'executions': self.executions,
+            'shared': self.shared,
+            'in_flight': len(self._calls),
+        }
@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Hashed names never change content, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names (index.html, favicon.ico, old links) are revalidated with the ETag
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+STATIC_COMPRESS_MIN_BYTES = int(os.getenv('STATIC_COMPRESS_MIN_BYTES', 512))
+# Requested by their own name (browsers ask for /favicon.ico); HTML pages are never hashed
+UNHASHED_FILES = {'index.html', 'favicon.ico'}
+
+_REFERENCE_RE = re.compile(r'''(\b(?:href|src)\s*=\s*["'])([^"'#?]+)(["'])''')
+
+
+class _Asset:
+    __slots__ = ('body', 'variants', 'mimetype', 'etag', 'immutable')
+
+    def __init__(self, body, mimetype, etag, immutable):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.immutable = immutable
+        # Content-Encoding -> (body, ETag); the ETag differs per encoding
+        self.variants = {None: (body, etag)}
+
+
+def fingerprint(relative_path, digest):
+    """script.js -> script.<first 10 hex digits>.js"""
+    root, ext = os.path.splitext(relative_path)
+    return f'{root}.{digest[:10]}{ext}'
+
+
+def _compressed(asset):
+    if len(asset.body) < STATIC_COMPRESS_MIN_BYTES:
+        return
+    candidates = [('gzip', 'gz', gzip.compress(asset.body, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidates.append(('br', 'br', brotli.compress(asset.body, quality=11)))
+    for encoding, suffix, body in candidates:
+        # Not worth a Content-Encoding for already-compressed formats
+        if len(body) < len(asset.body) * 0.9:
+            asset.variants[encoding] = (body, f'{asset.etag[:-1]}-{suffix}"')
+
+
+def _rewrite_references(html, hashed_names, base):
+    def replace(match):
+        target = match.group(2)
+        if '://' in target or target.startswith('//'):
+            return match.group(0)
+        resolved = os.path.normpath(os.path.join(base, target.lstrip('/'))).replace(os.sep, '/')
+        hashed = hashed_names.get(resolved)
+        if hashed is None:
+            return match.group(0)
+        prefix = '/' if target.startswith('/') else ''
+        rel = hashed if prefix else os.path.relpath(hashed, base or '.').replace(os.sep, '/')
+        return f'{match.group(1)}{prefix}{rel}{match.group(3)}'
+    return _REFERENCE_RE.sub(replace, html)
+
+
+class StaticAssets:
+    """In-memory copy of the static folder, built once at startup
+
+    Every file except UNHASHED_FILES also gets a fingerprinted name with an
+    immutable Cache-Control, and references to them in the HTML pages are
+    rewritten to point there. Bodies are pre-compressed with gzip (and brotli
+    when installed), so serving a request is a dict lookup with no stat.
+    """
+
+    def __init__(self):
+        self.folder = None
+        self._assets = {}
+        self._manifest = {}
+        self._mtimes = {}
+        self._lock = threading.Lock()
+
+    def load(self, folder):
+        """(Re)build the manifest from folder"""
+        files = {}
+        mtimes = {}
+        if folder and os.path.isdir(folder):
+            for directory, _dirs, names in os.walk(folder):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    relative = os.path.relpath(path, folder).replace(os.sep, '/')
+                    with open(path, 'rb') as f:
+                        files[relative] = f.read()
+                    mtimes[relative] = os.stat(path).st_mtime_ns
+
+        assets = {}
+        manifest = {}
+        for relative, body in files.items():
+            if os.path.basename(relative) in UNHASHED_FILES or relative.endswith('.html'):
+                continue
+            digest = hashlib.sha256(body).hexdigest()
+            manifest[relative] = fingerprint(relative, digest)
+            mimetype = mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+            assets[manifest[relative]] = _Asset(body, mimetype, f'"{digest[:20]}"', True)
+            assets[relative] = _Asset(body, mimetype, f'"{digest[:20]}"', False)
+
+        for relative, body in files.items():
+            if relative in assets:
+                continue
+            if relative.endswith('.html'):
+                base = os.path.dirname(relative)
+                body = _rewrite_references(body.decode('utf-8'), manifest, base).encode('utf-8')
+            mimetype = mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+            assets[relative] = _Asset(body, mimetype, f'"{hashlib.sha256(body).hexdigest()[:20]}"', False)
+
+        for asset in assets.values():
+            _compressed(asset)
+
+        with self._lock:
+            self.folder = folder
+            self._assets = assets
+            self._manifest = manifest
+            self._mtimes = mtimes
+        return self
+
+    def reload_if_changed(self):
+        """Rebuild when a file was added, removed or edited (stats every file; for development)"""
+        current = {}
+        if self.folder and os.path.isdir(self.folder):
+            for directory, _dirs, names in os.walk(self.folder):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    current[os.path.relpath(path, self.folder).replace(os.sep, '/')] = os.stat(path).st_mtime_ns
+        if current != self._mtimes:
+            self.load(self.folder)
+
+    def manifest(self):
+        """Source path -> fingerprinted path"""
+        return dict(self._manifest)
+
+    def response(self, path):
+        """Response for a static path, or None if there is no such asset"""
+        asset = self._assets.get(path)
+        if asset is None:
+            return None
+
+        encoding = None
+        for candidate in ('br', 'gzip'):
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        body, etag = asset.variants[encoding]
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL,
+        }
+        if len(asset.variants) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+
+        # Every encoding is the same resource; any of its ETags validates it
+        if any(request.if_none_match.contains(tag.strip('"')) for _body, tag in asset.variants.values()):
+            return Response(status=304, headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype=asset.mimetype, headers=headers)
+
+
+static_assets = StaticAssets()
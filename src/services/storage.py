@@ -0,0 +1,315 @@
+import os
+import queue
+import threading
+import time
+from sqlalchemy import event, insert
+from sqlalchemy.engine import make_url
+from src.models.user import db
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+
+# Pool settings; ignored for in-memory SQLite, which must stay on one connection
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '0') == '1'
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, and synchronous=NORMAL only fsyncs at checkpoints; a power
+# loss can drop the last commits but never corrupts the file.
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
+# Group commit: writes queued by concurrent requests share one transaction
+DB_WRITE_BATCHING = os.getenv('DB_WRITE_BATCHING', '1') == '1'
+DB_WRITE_BATCH_MAX = int(os.getenv('DB_WRITE_BATCH_MAX', 200))
+# How long the writer waits for more work before committing (0 = commit what is queued)
+DB_WRITE_BATCH_LINGER_MS = float(os.getenv('DB_WRITE_BATCH_LINGER_MS', 0))
+DB_WRITE_QUEUE_SIZE = int(os.getenv('DB_WRITE_QUEUE_SIZE', 10000))
+
+
+def database_url():
+    """DATABASE_URL, or the bundled SQLite file (its directory is created on demand)"""
+    url = os.getenv('DATABASE_URL')
+    if url:
+        return url
+    os.makedirs(os.path.dirname(DEFAULT_DATABASE_PATH), exist_ok=True)
+    return f'sqlite:///{DEFAULT_DATABASE_PATH}'
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URL"""
+    url = make_url(url)
+    if _is_memory_sqlite(url):
+        return {}
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+    if url.get_backend_name() == 'sqlite':
+        # Pooled connections move between request threads
+        options['connect_args'] = {'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+    return options
+
+
+def sqlite_pragmas():
+    return [
+        f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}',
+        f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+        f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}',
+        # Negative sizes are in KiB rather than pages
+        f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def init_storage(app):
+    """Configure the engine for app and bind db to it"""
+    url = app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_url())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(url))
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _apply_sqlite_pragmas)
+    write_batcher.init_app(app)
+
+
+def storage_info():
+    """Engine, pool and (for SQLite) the pragmas a pooled connection ended up with"""
+    engine = db.engine
+    info = {'dialect': engine.dialect.name, 'pool': engine.pool.status()}
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            info['pragmas'] = {
+                name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size')
+            }
+    return info
+
+
+class _WriteJob:
+    __slots__ = ('fn', 'model', 'rows', 'done', 'result', 'error')
+
+    def __init__(self, fn=None, model=None, rows=None, wait=True):
+        self.fn = fn
+        self.model = model
+        self.rows = rows
+        self.done = threading.Event() if wait else None
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        if self.done is not None:
+            self.done.set()
+
+
+class WriteBatcher:
+    """Single writer thread that commits queued writes in shared transactions
+
+    run() hands a function to the writer and blocks until the transaction
+    holding it has committed, so callers keep read-after-write semantics while
+    N concurrent writers cost one commit instead of N (and never contend for
+    SQLite's write lock). insert() queues rows without waiting; rows for the
+    same model in one batch go out as a single executemany. If a batch fails,
+    its jobs are retried one transaction each so only the bad one errors.
+    """
+
+    def __init__(self, max_batch=DB_WRITE_BATCH_MAX, linger_ms=DB_WRITE_BATCH_LINGER_MS,
+                 maxsize=DB_WRITE_QUEUE_SIZE, enabled=DB_WRITE_BATCHING):
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000
+        self.enabled = enabled
+        self.app = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'batches': 0, 'jobs': 0, 'rows': 0, 'retried_batches': 0, 'failed_jobs': 0,
+                       'commit_seconds': 0.0, 'largest_batch': 0}
+
+    def init_app(self, app):
+        self.app = app
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._write_forever, daemon=True, name='db-writer').start()
+
+    def _inline(self, job):
+        # Batching off (or no app yet): the caller's own session and commit
+        try:
+            result = self._execute(job)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+
+    def run(self, fn):
+        """Run fn() inside the writer's transaction and return its result once committed"""
+        job = _WriteJob(fn=fn)
+        if not self.enabled or self.app is None:
+            return self._inline(job)
+        self._ensure_started()
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def insert(self, model, rows, wait=False):
+        """Queue rows for model; with wait=True, block until they are committed"""
+        job = _WriteJob(model=model, rows=list(rows), wait=wait)
+        if not job.rows:
+            return
+        if not self.enabled or self.app is None:
+            return self._inline(job)
+        self._ensure_started()
+        self._queue.put(job)
+        if wait:
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+
+    def flush(self):
+        """Block until everything queued so far has been written"""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            try:
+                if self.linger:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_forever(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                with self.app.app_context():
+                    self._write_batch(batch)
+            except Exception as e:
+                for job in batch:
+                    if job.done is not None and not job.done.is_set():
+                        job.finish(error=e)
+                self.app.logger.exception('Batched database write failed')
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _execute(job):
+        if job.fn is not None:
+            return job.fn()
+        db.session.execute(insert(job.model), job.rows)
+        return None
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            results = []
+            pending = {}
+            for job in batch:
+                if job.fn is not None:
+                    self._flush_inserts(pending)
+                    results.append(job.fn())
+                else:
+                    pending.setdefault(job.model, []).extend(job.rows)
+                    results.append(None)
+            self._flush_inserts(pending)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+            else:
+                self._count(retried_batches=1)
+                self._write_one_by_one(batch)
+            return
+        finally:
+            db.session.remove()
+        for job, result in zip(batch, results):
+            job.finish(result)
+        self._count(batches=1, jobs=len(batch), rows=sum(len(job.rows or ()) for job in batch),
+                    commit_seconds=time.perf_counter() - started, largest_batch=len(batch))
+
+    @staticmethod
+    def _flush_inserts(pending):
+        for model, rows in pending.items():
+            db.session.execute(insert(model), rows)
+        pending.clear()
+
+    def _write_one_by_one(self, batch):
+        for job in batch:
+            try:
+                result = self._execute(job)
+                db.session.commit()
+                job.finish(result)
+                self._count(batches=1, jobs=1, rows=len(job.rows or ()))
+            except Exception as e:
+                db.session.rollback()
+                self._fail(job, e)
+            finally:
+                db.session.remove()
+
+    def _fail(self, job, error):
+        self._count(failed_jobs=1)
+        if job.done is None:
+            # Nobody is waiting to hear about it
+            self.app.logger.error('Dropped a queued insert into %s: %s', job.model.__tablename__, error)
+        job.finish(error=error)
+
+    def _count(self, **changes):
+        with self._stats_lock:
+            for key, value in changes.items():
+                if key == 'largest_batch':
+                    self._stats[key] = max(self._stats[key], value)
+                else:
+                    self._stats[key] += value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['queued'] = self._queue.qsize()
+        stats['avg_batch'] = round(stats['jobs'] / stats['batches'], 2) if stats['batches'] else 0
+        stats['commit_seconds'] = round(stats['commit_seconds'], 4)
+        return stats
+
+
+write_batcher = WriteBatcher()
@@ -0,0 +1,147 @@
+import json
+import math
+import os
+
+AI_TOOL_TOKEN_BUDGET = int(os.getenv('AI_TOOL_TOKEN_BUDGET', 2000))
+AI_TOOL_MAX_LIST_ITEMS = int(os.getenv('AI_TOOL_MAX_LIST_ITEMS', 25))
+AI_TOOL_MAX_STRING = int(os.getenv('AI_TOOL_MAX_STRING', 300))
+
+# Fields the model never needs to answer store questions, per tool. Paths
+# are relative to each node after connections have been flattened.
+TOOL_DROPPED_FIELDS = {
+    'get_products': {'images', 'handle'},
+    'get_product_by_id': {'images'},
+    'search_products': {'images', 'handle'},
+    'get_orders': {
+        'phone',
+        'shippingAddress.address1',
+        'shippingAddress.address2',
+        'shippingAddress.zip',
+        'shippingAddress.phone',
+    },
+    'get_customers': {
+        'addresses.address1',
+        'addresses.address2',
+        'addresses.zip',
+        'addresses.phone',
+    },
+}
+TOOL_DROPPED_FIELDS['search_customers'] = TOOL_DROPPED_FIELDS['get_customers']
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for JSON-heavy English)"""
+    return math.ceil(len(text) / 4)
+
+
+def flatten(value):
+    """Strip GraphQL plumbing: unwrap edges/node, drop pageInfo and empty values"""
+    if isinstance(value, dict):
+        if 'edges' in value and isinstance(value['edges'], list):
+            return [flatten((edge or {}).get('node')) for edge in value['edges']]
+        if 'nodes' in value and isinstance(value['nodes'], list):
+            return [flatten(node) for node in value['nodes']]
+        flat = {}
+        for key, item in value.items():
+            if key in ('pageInfo', '__typename'):
+                continue
+            item = flatten(item)
+            if item is None or item == '' or item == [] or item == {}:
+                continue
+            flat[key] = item
+        return flat
+    if isinstance(value, list):
+        return [flatten(item) for item in value]
+    return value
+
+
+def drop_fields(value, paths):
+    """Remove dotted paths from every node, descending through lists"""
+    if not paths:
+        return value
+    if isinstance(value, list):
+        return [drop_fields(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    heads = {path.split('.', 1)[0] for path in paths if '.' not in path}
+    nested = {}
+    for path in paths:
+        if '.' in path:
+            head, rest = path.split('.', 1)
+            nested.setdefault(head, set()).add(rest)
+
+    result = {}
+    for key, item in value.items():
+        if key in heads:
+            continue
+        if key in nested:
+            item = drop_fields(item, nested[key])
+        elif isinstance(item, (list, dict)):
+            # Paths apply to nodes at any depth (e.g. data.products[*].images)
+            item = drop_fields(item, paths)
+        result[key] = item
+    return result
+
+
+def cap_lists(value, max_items, max_string, truncated, path=''):
+    """Limit list lengths and long strings, recording what was cut"""
+    if isinstance(value, list):
+        if len(value) > max_items:
+            truncated[path or '.'] = len(value)
+            value = value[:max_items]
+        return [cap_lists(item, max_items, max_string, truncated, path) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: cap_lists(item, max_items, max_string, truncated, f'{path}.{key}' if path else key)
+            for key, item in value.items()
+        }
+    if isinstance(value, str) and len(value) > max_string:
+        return value[:max_string] + '…'
+    return value
+
+
+def compact_tool_result(function_name, result, token_budget=None, max_items=None):
+    """Shrink a raw tool result before it is sent to the model
+
+    Returns (content, stats) where content is the JSON string for the tool
+    message and stats reports the bytes and estimated tokens saved.
+    """
+    token_budget = token_budget or AI_TOOL_TOKEN_BUDGET
+    max_items = max_items or AI_TOOL_MAX_LIST_ITEMS
+    raw = json.dumps(result)
+
+    compact = flatten(result)
+    if isinstance(compact, dict) and isinstance(compact.get('data'), dict) and len(compact) == 1:
+        compact = compact['data']
+    compact = drop_fields(compact, TOOL_DROPPED_FIELDS.get(function_name, set()))
+
+    # Halve list caps until the payload fits the budget
+    max_string = AI_TOOL_MAX_STRING
+    while True:
+        truncated = {}
+        capped = cap_lists(compact, max_items, max_string, truncated)
+        if truncated:
+            capped = {'result': capped, 'truncated_lists': truncated}
+        content = json.dumps(capped, separators=(',', ':'), ensure_ascii=False)
+        if estimate_tokens(content) <= token_budget or (max_items <= 1 and max_string <= 80):
+            break
+        max_items = max(1, max_items // 2)
+        max_string = max(80, max_string // 2)
+
+    if estimate_tokens(content) > token_budget:
+        # Last resort: hard cut. The model is told the payload is partial.
+        content = content[:token_budget * 4] + ' …[truncated to fit the tool token budget]'
+
+    raw_bytes = len(raw.encode())
+    compact_bytes = len(content.encode())
+    stats = {
+        'tool': function_name,
+        'raw_bytes': raw_bytes,
+        'compact_bytes': compact_bytes,
+        'saved_bytes': raw_bytes - compact_bytes,
+        'raw_tokens': estimate_tokens(raw),
+        'compact_tokens': estimate_tokens(content),
+    }
+    stats['saved_tokens'] = stats['raw_tokens'] - stats['compact_tokens']
+    return content, stats
@@ -0,0 +1,436 @@
+import bisect
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from flask.json.provider import DefaultJSONProvider
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1') == '1'
+# Rolling quantiles cover this many seconds of observations
+TRACE_WINDOW_SECONDS = float(os.getenv('TRACE_WINDOW_SECONDS', 60))
+TRACE_WINDOW_SLOTS = int(os.getenv('TRACE_WINDOW_SLOTS', 6))
+# Per-request sampling profiles (?profile=1 or X-Profile: 1) are off unless enabled
+TRACE_PROFILE_ENABLED = os.getenv('TRACE_PROFILE_ENABLED', '0') == '1'
+TRACE_PROFILE_INTERVAL = float(os.getenv('TRACE_PROFILE_INTERVAL', 0.005))
+TRACE_PROFILE_KEEP = int(os.getenv('TRACE_PROFILE_KEEP', 20))
+
+# Upper bounds in seconds, from cache hits to slow model calls
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Latency histogram with cumulative buckets and a rolling window
+
+    The cumulative counts feed Prometheus; the window, split into slots
+    that are reset as time moves on, answers "what is p95 right now".
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS, window=None, slots=None):
+        self.buckets = tuple(buckets)
+        self.window = window or TRACE_WINDOW_SECONDS
+        self.slots = slots or TRACE_WINDOW_SLOTS
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._slot_seconds = self.window / self.slots
+        self._slot_counts = [[0] * (len(self.buckets) + 1) for _ in range(self.slots)]
+        self._slot_epochs = [None] * self.slots
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        epoch = int(time.monotonic() / self._slot_seconds)
+        slot = epoch % self.slots
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            if self._slot_epochs[slot] != epoch:
+                self._slot_epochs[slot] = epoch
+                self._slot_counts[slot] = [0] * (len(self.buckets) + 1)
+            self._slot_counts[slot][index] += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count) for exposition"""
+        with self._lock:
+            cumulative = []
+            running = 0
+            for count in self.counts:
+                running += count
+                cumulative.append(running)
+            return cumulative, self.sum, self.count
+
+    def window_quantiles(self, quantiles=(0.5, 0.95, 0.99)):
+        """Quantiles over the rolling window, interpolated within buckets"""
+        current = int(time.monotonic() / self._slot_seconds)
+        with self._lock:
+            merged = [0] * (len(self.buckets) + 1)
+            for epoch, counts in zip(self._slot_epochs, self._slot_counts):
+                if epoch is not None and current - epoch < self.slots:
+                    merged = [a + b for a, b in zip(merged, counts)]
+        total = sum(merged)
+        if not total:
+            return {}
+
+        result = {}
+        for q in quantiles:
+            target = q * total
+            running = 0
+            for index, count in enumerate(merged):
+                if running + count >= target and count:
+                    lower = self.buckets[index - 1] if index else 0.0
+                    upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                    result[q] = lower + (upper - lower) * (target - running) / count
+                    break
+                running += count
+        return result
+
+
+class HistogramFamily:
+    """Histograms keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        histogram = self._histograms.get(values)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(values, Histogram())
+        return histogram
+
+    def items(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+
+span_seconds = HistogramFamily('app_span_seconds', 'Time spent in instrumented operations', ['span'])
+request_seconds = HistogramFamily(
+    'app_http_request_seconds', 'HTTP request latency', ['method', 'endpoint', 'status']
+)
+
+_in_flight = {'requests': 0}
+_in_flight_lock = threading.Lock()
+
+
+class Trace:
+    """Span totals for one request, shared by every thread working on it"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.totals[name] += seconds
+            self.counts[name] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value; durations are in milliseconds"""
+        with self._lock:
+            parts = [
+                f'{name};dur={self.totals[name] * 1000:.1f};desc="{self.counts[name]}x"'
+                for name in sorted(self.totals, key=self.totals.get, reverse=True)
+            ]
+        parts.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(parts)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                name: {'ms': round(self.totals[name] * 1000, 2), 'count': self.counts[name]}
+                for name in self.totals
+            }
+
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def start_trace():
+    """Begin a trace for the current request; returns a token for end_trace"""
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def record_span(name, seconds):
+    """Add a finished span to the request's trace and the histograms"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+    span_seconds.labels(name).observe(seconds)
+
+
+class span:
+    """Time a block as a named span: `with span('shopify'): ...`
+
+    Nested spans are each recorded in full, so a tool span includes the
+    Shopify span inside it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if TRACING_ENABLED:
+            record_span(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def traced(name):
+    """Decorator form of span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_iter(name, open_iterable):
+    """Iterate open_iterable(), counting only the time spent producing items
+
+    Opening the iterator (e.g. sending the HTTP request) is included; time
+    the consumer spends between items (e.g. writing tokens to the client)
+    is left out.
+    """
+    total = 0.0
+    try:
+        started = time.perf_counter()
+        try:
+            iterator = iter(open_iterable())
+        finally:
+            total += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter() - started
+            yield item
+    finally:
+        if TRACING_ENABLED:
+            record_span(name, total)
+
+
+async def traced_aiter(name, open_iterable):
+    """Async traced_iter; open_iterable returns an awaitable async iterable"""
+    total = 0.0
+    try:
+        started = time.perf_counter()
+        try:
+            iterator = (await open_iterable()).__aiter__()
+        finally:
+            total += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                total += time.perf_counter() - started
+            yield item
+    finally:
+        if TRACING_ENABLED:
+            record_span(name, total)
+
+
+def request_started():
+    with _in_flight_lock:
+        _in_flight['requests'] += 1
+
+
+def request_finished(method, endpoint, status, seconds):
+    with _in_flight_lock:
+        _in_flight['requests'] -= 1
+    request_seconds.labels(method, endpoint, str(status)).observe(seconds)
+
+
+def queue_seconds(request_start_header):
+    """Time since a proxy's X-Request-Start header ("t=<epoch seconds>")"""
+    value = (request_start_header or '').strip()
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # nginx sends seconds with milliseconds; some proxies send microseconds
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    waited = time.time() - started
+    return waited if 0 <= waited < 3600 else None
+
+
+class TracingJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records encoding time as the serialize span"""
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+# -- Sampling profiler ----------------------------------------------------
+
+class SamplingProfiler:
+    """Sample one thread's stack at a fixed interval
+
+    Results are collapsed stacks ("outer;inner;leaf count" per line), the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval or TRACE_PROFILE_INTERVAL
+        self.samples = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        return '\n'.join(
+            f'{stack} {count}'
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1])
+        )
+
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def store_profile(profiler, trace=None, path=None):
+    """Keep a finished profile for later download; returns its ID"""
+    profile_id = uuid.uuid4().hex[:12]
+    with _profiles_lock:
+        _profiles[profile_id] = {
+            'path': path,
+            'created_at': time.time(),
+            'interval': profiler.interval,
+            'samples': sum(profiler.samples.values()),
+            'spans': trace.to_dict() if trace else {},
+            'collapsed': profiler.collapsed(),
+        }
+        while len(_profiles) > TRACE_PROFILE_KEEP:
+            _profiles.popitem(last=False)
+    return profile_id
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [
+            {key: value for key, value in dict(profile, id=profile_id).items() if key != 'collapsed'}
+            for profile_id, profile in _profiles.items()
+        ]
+
+
+# -- Prometheus exposition --------------------------------------------------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render_histogram_family(family):
+    lines = [
+        f'# HELP {family.name} {family.help}',
+        f'# TYPE {family.name} histogram',
+    ]
+    window_lines = []
+    for values, histogram in family.items():
+        cumulative, total, count = histogram.snapshot()
+        for bound, running in zip(histogram.buckets + (float('inf'),), cumulative):
+            le = '+Inf' if bound == float('inf') else f'{bound:g}'
+            lines.append(f'{family.name}_bucket{_label_text(family.label_names, values, [("le", le)])} {running}')
+        labels = _label_text(family.label_names, values)
+        lines.append(f'{family.name}_sum{labels} {total:.6f}')
+        lines.append(f'{family.name}_count{labels} {count}')
+        for q, value in histogram.window_quantiles().items():
+            window_lines.append(
+                f'{family.name}_window{_label_text(family.label_names, values, [("quantile", q)])} {value:.6f}'
+            )
+    if window_lines:
+        lines.append(f'# HELP {family.name}_window Quantiles over the last {TRACE_WINDOW_SECONDS:g}s')
+        lines.append(f'# TYPE {family.name}_window summary')
+        lines.extend(window_lines)
+    return lines
+
+
+def render_metrics(gauges=None):
+    """Prometheus text exposition of every histogram plus the given gauges
+
+    gauges maps a metric name to (help text, value).
+    """
+    lines = []
+    for family in (request_seconds, span_seconds):
+        lines.extend(render_histogram_family(family))
+    with _in_flight_lock:
+        in_flight = _in_flight['requests']
+    all_gauges = {'app_http_requests_in_flight': ('Requests currently being handled', in_flight)}
+    all_gauges.update(gauges or {})
+    for name, (help_text, value) in all_gauges.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -1,5 +1,5 @@
 // Global variables
-let conversationHistory = [];
+let conversationId = null;
 let isLoading = false;
 
 // DOM elements
@@ -66,41 +66,135 @@ async function sendMessage() {
     addMessageToChat(message, 'user');
     chatInput.value = '';
     
-    // Show loading
-    setLoading(true);
+    // Tokens are rendered as they arrive, so only the send button shows
+    // progress instead of the full-screen overlay
+    setLoading(true, false);
+
+    const contentDiv = addMessageToChat('', 'assistant');
+    const toolStatus = document.createElement('div');
+    toolStatus.className = 'tool-status';
+    const textElement = document.createElement('p');
+    textElement.innerHTML = '<span class="typing-indicator"><i class="fas fa-ellipsis-h"></i></span>';
+    contentDiv.replaceChildren(toolStatus, textElement);
+
+    let responseText = '';
+    let receivedToken = false;
 
     try {
-        const response = await fetch('/api/ai/chat', {
+        const response = await fetch('/api/ai/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
                 message: message,
-                history: conversationHistory
+                conversation_id: conversationId
             })
         });
 
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
-        
-        // Add assistant response to chat
-        addMessageToChat(data.response, 'assistant');
-        
-        // Update conversation history
-        conversationHistory = data.conversation_history || [];
+        await readEventStream(response, (event, data) => {
+            if (event === 'start') {
+                conversationId = data.conversation_id;
+            } else if (event === 'tool_call') {
+                const item = document.createElement('div');
+                item.className = 'tool-status-item';
+                item.dataset.toolId = data.id;
+                renderToolStatus(item, 'fa-cog fa-spin', data.name);
+                toolStatus.appendChild(item);
+            } else if (event === 'tool_result') {
+                // Compared, not interpolated into a selector: the ID comes from the model
+                const item = Array.from(toolStatus.children).find(el => el.dataset.toolId === data.id);
+                if (item) {
+                    const icon = data.ok ? 'fa-check' : 'fa-exclamation-triangle';
+                    renderToolStatus(item, icon, data.name, data.elapsed_ms);
+                }
+            } else if (event === 'token') {
+                if (!receivedToken) {
+                    receivedToken = true;
+                    textElement.textContent = '';
+                }
+                responseText += data.content;
+                textElement.textContent = responseText;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (event === 'done') {
+                // Re-render with the same formatting as non-streamed replies
+                textElement.innerHTML = formatMessage(data.response || responseText);
+                conversationId = data.conversation_id;
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        });
 
     } catch (error) {
         console.error('Error sending message:', error);
+        contentDiv.parentElement.remove();
         addMessageToChat('Sorry, I encountered an error while processing your request. Please try again.', 'assistant', true);
     } finally {
         setLoading(false);
     }
 }
 
+// Read a text/event-stream response and dispatch each event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
+// Show a tool's progress: icon, name and (once finished) timing.
+// The name comes from the model, so it is only ever set as text.
+function renderToolStatus(item, iconClass, name, elapsedMs) {
+    const icon = document.createElement('i');
+    icon.className = `fas ${iconClass}`;
+    item.replaceChildren(icon, document.createTextNode(` ${name} `));
+    if (elapsedMs !== undefined) {
+        const timing = document.createElement('span');
+        timing.className = 'tool-timing';
+        timing.textContent = `${elapsedMs} ms`;
+        item.appendChild(timing);
+    }
+}
+
+// Format message content (handle JSON responses)
+function formatMessage(message) {
+    try {
+        const parsed = JSON.parse(message);
+        if (typeof parsed === 'object') {
+            return formatObjectResponse(parsed);
+        }
+    } catch (e) {
+        // Not JSON, use as is
+    }
+    return message;
+}
+
 // Add message to chat
 function addMessageToChat(message, sender, isError = false) {
     const messageDiv = document.createElement('div');
@@ -118,25 +212,14 @@ function addMessageToChat(message, sender, isError = false) {
         contentDiv.style.background = 'rgba(239, 68, 68, 0.05)';
     }
     
-    // Format message content (handle JSON responses)
-    let formattedMessage = message;
-    try {
-        const parsed = JSON.parse(message);
-        if (typeof parsed === 'object') {
-            formattedMessage = formatObjectResponse(parsed);
-        }
-    } catch (e) {
-        // Not JSON, use as is
-        formattedMessage = message;
-    }
-    
-    contentDiv.innerHTML = `<p>${formattedMessage}</p>`;
+    contentDiv.innerHTML = `<p>${formatMessage(message)}</p>`;
     
     messageDiv.appendChild(avatarDiv);
     messageDiv.appendChild(contentDiv);
     
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return contentDiv;
 }
 
 // Format object responses for better display
@@ -254,12 +337,14 @@ function handleQuickAction(action) {
 }
 
 // Show/hide loading state
-function setLoading(loading) {
+function setLoading(loading, showOverlay = true) {
     isLoading = loading;
     sendBtn.disabled = loading;
     
     if (loading) {
-        loadingOverlay.classList.add('active');
+        if (showOverlay) {
+            loadingOverlay.classList.add('active');
+        }
         sendBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
     } else {
         loadingOverlay.classList.remove('active');
@@ -270,32 +355,26 @@ function setLoading(loading) {
 // Load store statistics
 async function loadStoreStats() {
     try {
-        // Load products count
-        const productsResponse = await fetch('/api/shopify/products?limit=1');
-        if (productsResponse.ok) {
-            const productsData = await productsResponse.json();
-            if (productsData.data && productsData.data.products) {
-                document.getElementById('productCount').textContent = productsData.data.products.edges.length > 0 ? '1+' : '0';
-            }
-        }
-
-        // Load orders count
-        const ordersResponse = await fetch('/api/shopify/orders?limit=1');
-        if (ordersResponse.ok) {
-            const ordersData = await ordersResponse.json();
-            if (ordersData.data && ordersData.data.orders) {
-                document.getElementById('orderCount').textContent = ordersData.data.orders.edges.length > 0 ? '1+' : '0';
-            }
+        // All three counts come from one cached, aliased query
+        const response = await fetch('/api/shopify/stats');
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        // Load customers count
-        const customersResponse = await fetch('/api/shopify/customers?limit=1');
-        if (customersResponse.ok) {
-            const customersData = await customersResponse.json();
-            if (customersData.data && customersData.data.customers) {
-                document.getElementById('customerCount').textContent = customersData.data.customers.edges.length > 0 ? '1+' : '0';
+        const data = await response.json();
+        const stats = data.stats || {};
+        const counters = {
+            products: 'productCount',
+            orders: 'orderCount',
+            customers: 'customerCount'
+        };
+        Object.entries(counters).forEach(([name, elementId]) => {
+            const stat = stats[name];
+            if (stat) {
+                const suffix = stat.precision === 'AT_LEAST' ? '+' : '';
+                document.getElementById(elementId).textContent = `${stat.count.toLocaleString()}${suffix}`;
             }
-        }
+        });
     } catch (error) {
         console.error('Error loading store stats:', error);
     }
@@ -414,6 +493,27 @@ style.textContent = `
         line-height: 1.4;
     }
     
+    .tool-status {
+        display: flex;
+        flex-direction: column;
+        gap: 0.25rem;
+        font-size: 0.75rem;
+        color: #94a3b8;
+    }
+    
+    .tool-status:not(:empty) {
+        margin-bottom: 0.5rem;
+    }
+    
+    .tool-status-item i {
+        color: #3b82f6;
+        margin-right: 0.25rem;
+    }
+    
+    .tool-timing {
+        opacity: 0.7;
+    }
+    
     .error-message {
         text-align: center;
         color: #ef4444;
@@ -0,0 +1,11 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import app, init_database
+
+# WSGI entry point: gunicorn -c gunicorn.conf.py src.wsgi:app
+#
+# With preload_app the schema is set up here once, in the master, before
+# the workers fork.
+init_database()
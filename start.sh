@@ -1,8 +1,15 @@
 #!/bin/bash
 
 # Shopify AI Agent Startup Script
+#
+# Usage: ./start.sh [dev|wsgi|asgi]
+#   dev   Flask development server (default)
+#   wsgi  gunicorn with threaded workers (gunicorn.conf.py)
+#   asgi  gunicorn with uvicorn workers; chats run as coroutines
 
-echo "Starting Shopify AI Agent..."
+MODE="${1:-dev}"
+
+echo "Starting Shopify AI Agent ($MODE)..."
 
 # Check if virtual environment exists
 if [ ! -d "venv" ]; then
@@ -14,9 +21,15 @@ fi
 echo "Activating virtual environment..."
 source venv/bin/activate
 
-# Install/update dependencies
-echo "Installing dependencies..."
-pip install -r requirements.txt
+# Install dependencies only when requirements.txt changed since the last install
+REQUIREMENTS_HASH=$(sha256sum requirements.txt | cut -d' ' -f1)
+REQUIREMENTS_STAMP="venv/.requirements.sha256"
+if [ "$(cat "$REQUIREMENTS_STAMP" 2>/dev/null)" != "$REQUIREMENTS_HASH" ]; then
+    echo "Installing dependencies..."
+    pip install -r requirements.txt && echo "$REQUIREMENTS_HASH" > "$REQUIREMENTS_STAMP"
+else
+    echo "Dependencies up to date."
+fi
 
 # Check if .env file exists
 if [ ! -f ".env" ]; then
@@ -28,14 +41,31 @@ if [ ! -f ".env" ]; then
     echo "OPENAI_API_KEY=your_openai_api_key"
     echo "OPENAI_API_BASE=https://api.openai.com/v1"
     echo ""
-    read -p "Press Enter to continue anyway or Ctrl+C to exit..."
+    # Only wait for confirmation when someone is at the terminal
+    if [ -t 0 ]; then
+        read -p "Press Enter to continue anyway or Ctrl+C to exit..."
+    fi
 fi
 
-# Start the Flask application
-echo "Starting Flask application..."
-echo "Access the application at: http://localhost:5000"
+echo "Access the application at: http://localhost:${PORT:-5000}"
 echo "Press Ctrl+C to stop the server"
 echo ""
 
-python src/main.py
-
+case "$MODE" in
+    dev)
+        echo "Starting Flask application..."
+        exec python src/main.py
+        ;;
+    wsgi)
+        echo "Starting gunicorn (threaded workers)..."
+        exec gunicorn -c gunicorn.conf.py src.wsgi:app
+        ;;
+    asgi)
+        echo "Starting gunicorn (uvicorn workers)..."
+        GUNICORN_ASGI=1 exec gunicorn -c gunicorn.conf.py src.asgi:app
+        ;;
+    *)
+        echo "Unknown mode: $MODE (expected dev, wsgi or asgi)"
+        exit 1
+        ;;
+esac
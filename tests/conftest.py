@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import src.models.conversation  # noqa: E402,F401  (registers the tables)
+from src.models.user import db  # noqa: E402
+from src.services.storage import engine_options  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Flask app bound to db on a fresh SQLite file"""
+    app = Flask(__name__)
+    url = f'sqlite:///{tmp_path}/test.db'
+    app.config.update(SQLALCHEMY_DATABASE_URI=url, SQLALCHEMY_ENGINE_OPTIONS=engine_options(url))
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
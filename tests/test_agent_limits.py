@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from src.models.conversation import Conversation
+from src.routes import ai_agent, ai_agent_async
+from src.routes.ai_agent import AI_MAX_ROUNDS, agent_limits
+
+
+def test_overrides_can_only_tighten_limits():
+    limits = agent_limits({'max_rounds': 2, 'max_seconds': 10 ** 6, 'max_tokens': -5, 'other': 1})
+    assert limits['max_rounds'] == min(2, AI_MAX_ROUNDS)
+    assert limits['max_seconds'] == ai_agent.AI_MAX_SECONDS
+    assert limits['max_tokens'] == ai_agent.AI_MAX_TOTAL_TOKENS
+
+
+@pytest.mark.parametrize('value', [True, False])
+def test_boolean_limits_are_rejected(value):
+    with pytest.raises(ValueError):
+        agent_limits({'max_rounds': value})
+
+
+@pytest.mark.parametrize('path', ['/api/ai/chat', '/api/ai/chat/stream'])
+def test_chat_routes_reject_boolean_limits_before_starting_a_turn(app, path):
+    app.register_blueprint(ai_agent.ai_agent_bp, url_prefix='/api/ai')
+    response = app.test_client().post(path, json={'message': 'hi', 'limits': {'max_rounds': True}})
+    assert response.status_code == 400
+    assert 'max_rounds' in response.get_json()['error']
+    with app.app_context():
+        assert Conversation.query.count() == 0
+
+
+def test_async_chat_routes_reject_boolean_limits(app):
+    data = {'message': 'hi', 'limits': {'max_seconds': True}}
+    assert asyncio.run(ai_agent_async.chat(app, data))[0] == 400
+    assert asyncio.run(ai_agent_async.chat_stream(app, data))[0] == 400
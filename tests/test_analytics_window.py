@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+
+from src.routes.analytics import order_window
+
+
+def test_days_rounds_since_down_to_midnight():
+    since, until = order_window({'days': 7})
+    expected = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%dT00:00:00Z')
+    assert since == expected
+    assert until is None
+
+
+def test_days_gives_the_same_window_on_every_call():
+    assert order_window({'days': 30}) == order_window({'days': '30'})
+
+
+def test_fractional_days_round_to_the_minute():
+    since, _until = order_window({'days': 0.5})
+    assert since.endswith(':00Z')
+    assert datetime.utcnow() - timedelta(hours=12, minutes=1) <= datetime.strptime(since, '%Y-%m-%dT%H:%M:%SZ')
+
+
+def test_explicit_since_is_not_rounded():
+    assert order_window({'since': '2024-02-10T13:45:07Z', 'days': 7}) == ('2024-02-10T13:45:07Z', None)
@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.models.conversation import ConversationMessage
+from src.routes import ai_agent, ai_agent_async
+from src.services import conversation_store as store_module
+from src.services.conversation_store import (
+    AI_CONVERSATION_APPEND_RETRIES,
+    ConversationConflict,
+    ConversationStore,
+)
+
+
+class InterleavingWriter:
+    """Inline writer that lets another turn commit just before each write"""
+
+    def __init__(self, before_write, times=1):
+        self.before_write = before_write
+        self.times = times
+        self._nested = False
+
+    def run(self, fn):
+        if self.times and not self._nested:
+            self.times -= 1
+            self._nested = True
+            try:
+                self.before_write()
+            finally:
+                self._nested = False
+        result = fn()
+        store_module.db.session.commit()
+        return result
+
+
+def _turn(name):
+    return [{'role': 'user', 'content': f'question {name}'}, {'role': 'assistant', 'content': f'answer {name}'}]
+
+
+def _positions(conversation_id):
+    return [row.position for row in ConversationMessage.query
+            .filter_by(conversation_id=conversation_id)
+            .order_by(ConversationMessage.position)]
+
+
+def test_append_goes_after_a_concurrent_turn(app, monkeypatch):
+    store, other_worker = ConversationStore(), ConversationStore()
+    with app.app_context():
+        conversation_id = store.create()
+        store.history(conversation_id)
+        monkeypatch.setattr(store_module, 'write_batcher',
+                            InterleavingWriter(lambda: other_worker.append(conversation_id, _turn('b'))))
+
+        result = store.append(conversation_id, _turn('a'))
+
+        assert result['history_tokens'] > 0
+        assert _positions(conversation_id) == [0, 1, 2, 3]
+        assert [m['content'] for m in store.transcript(conversation_id)] == [
+            'question b', 'answer b', 'question a', 'answer a',
+        ]
+
+
+def test_append_gives_up_with_a_conflict(app, monkeypatch):
+    store, other_worker = ConversationStore(), ConversationStore()
+    with app.app_context():
+        conversation_id = store.create()
+        monkeypatch.setattr(store_module, 'write_batcher', InterleavingWriter(
+            lambda: other_worker.append(conversation_id, _turn('b')), times=100,
+        ))
+
+        with pytest.raises(ConversationConflict):
+            store.append(conversation_id, _turn('a'))
+
+        # Only the other worker's turns were written, each at its own positions
+        assert _positions(conversation_id) == list(range(2 * (AI_CONVERSATION_APPEND_RETRIES + 1)))
+
+
+def test_unique_position_errors_are_retried(app, monkeypatch):
+    store = ConversationStore()
+    calls = []
+
+    class FailingOnce:
+        def run(self, fn):
+            calls.append(fn)
+            if len(calls) == 1:
+                raise IntegrityError('INSERT', {}, Exception('UNIQUE constraint failed'))
+            result = fn()
+            store_module.db.session.commit()
+            return result
+
+    with app.app_context():
+        conversation_id = store.create()
+        monkeypatch.setattr(store_module, 'write_batcher', FailingOnce())
+        store.append(conversation_id, _turn('a'))
+        assert len(calls) == 2
+        assert _positions(conversation_id) == [0, 1]
+
+
+DONE = {'response': 'the answer', 'messages': [], 'stopped_reason': 'completed'}
+
+
+def _conflicting_finish(*_args):
+    raise ConversationConflict('conversation')
+
+
+@pytest.fixture
+def chat_app(app, monkeypatch):
+    def agent(*_args, **_kwargs):
+        yield 'done', dict(DONE)
+
+    async def async_agent(*_args, **_kwargs):
+        yield 'done', dict(DONE)
+
+    monkeypatch.setattr(ai_agent, 'run_agent_cached', agent)
+    monkeypatch.setattr(ai_agent, '_finish_turn', _conflicting_finish)
+    monkeypatch.setattr(ai_agent_async, 'arun_agent_cached', async_agent)
+    monkeypatch.setattr(ai_agent_async, '_finish_turn', _conflicting_finish)
+    app.register_blueprint(ai_agent.ai_agent_bp, url_prefix='/api/ai')
+    return app
+
+
+def _done_event(stream_text):
+    for block in stream_text.split('\n\n'):
+        if block.startswith('event: done'):
+            return json.loads(block.split('data: ', 1)[1])
+    raise AssertionError(f'no done event in {stream_text!r}')
+
+
+def test_chat_returns_409_with_the_answer(chat_app):
+    response = chat_app.test_client().post('/api/ai/chat', json={'message': 'hi'})
+    assert response.status_code == 409
+    assert response.get_json()['response'] == 'the answer'
+    assert response.get_json()['error'] == ai_agent.CONVERSATION_CONFLICT_ERROR
+
+
+def test_chat_stream_reports_the_conflict_on_done(chat_app):
+    response = chat_app.test_client().post('/api/ai/chat/stream', json={'message': 'hi'})
+    done = _done_event(response.get_data(as_text=True))
+    assert done['response'] == 'the answer'
+    assert done['error'] == ai_agent.CONVERSATION_CONFLICT_ERROR
+
+
+def test_async_chat_returns_409_with_the_answer(chat_app):
+    status, payload = asyncio.run(ai_agent_async.chat(chat_app, {'message': 'hi'}))
+    assert status == 409
+    assert payload['response'] == 'the answer'
+    assert payload['error'] == ai_agent.CONVERSATION_CONFLICT_ERROR
+
+
+def test_async_chat_stream_reports_the_conflict_on_done(chat_app):
+    async def collect():
+        status, events = await ai_agent_async.chat_stream(chat_app, {'message': 'hi'})
+        assert status == 200
+        return ''.join([event async for event in events])
+
+    done = _done_event(asyncio.run(collect()))
+    assert done['response'] == 'the answer'
+    assert done['error'] == ai_agent.CONVERSATION_CONFLICT_ERROR
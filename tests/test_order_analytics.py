@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+from src.services.order_analytics import OrderFrame, cohorts, period_start, revenue_by_period, summary, top_products
+
+
+def _money(amount):
+    return {'shopMoney': {'amount': f'{amount:.2f}'}}
+
+
+def _line(sku, title, quantity, unit_price, paid, variant=True):
+    # The variant's current price is always 5 more than what was paid per unit
+    return {
+        'title': title,
+        'quantity': quantity,
+        'sku': sku,
+        'originalUnitPriceSet': _money(unit_price),
+        'discountedTotalSet': _money(paid),
+        'variant': {'sku': sku, 'price': f'{unit_price + 5:.2f}'} if variant else None,
+    }
+
+
+def _order(created_at, total, customer, lines):
+    return {
+        'createdAt': created_at,
+        'totalPrice': str(total),
+        'currencyCode': 'USD',
+        'customer': {'id': customer} if customer else None,
+        'lineItems': {'edges': [{'node': line} for line in lines]},
+    }
+
+
+# 2024-01-01 and 2024-01-08 are Mondays; 2024-01-07 is the Sunday in between
+ORDERS = [
+    # SKU-1 twice in one order: two lines, but one order for top_products.
+    # The cap was discounted from 30 to 25.
+    _order('2024-01-01T10:00:00Z', 100, 'A', [
+        _line('SKU-1', 'Mug', 2, 10, 20), _line('SKU-1', 'Mug', 1, 10, 10), _line('SKU-2', 'Cap', 1, 30, 25),
+    ]),
+    _order('2024-01-07T23:00:00Z', 50, None, [_line('SKU-2', 'Cap', 1, 30, 30)]),
+    # The pen's variant has since been deleted
+    _order('2024-01-08T01:00:00Z', 20, 'B', [_line('SKU-3', 'Pen', 1, 20, 20, variant=False)]),
+    _order('2024-02-03T12:00:00Z', 40, 'A', [_line('SKU-1', 'Mug', 4, 10, 40)]),
+]
+
+
+@pytest.fixture
+def frame():
+    return OrderFrame(ORDERS)
+
+
+def test_guest_orders_get_code_minus_one(frame):
+    assert frame.customer.tolist() == [0, -1, 1, 0]
+    assert frame.customer_ids.tolist() == ['A', 'B']
+
+
+def test_guest_first_shifts_later_codes_down():
+    frame = OrderFrame([ORDERS[1], ORDERS[0], ORDERS[2]])
+    assert frame.customer.tolist() == [-1, 0, 1]
+    assert frame.customer_ids.tolist() == ['A', 'B']
+
+
+def test_period_start_weeks_begin_on_monday(frame):
+    assert period_start(frame.created, 'week').astype(str).tolist() == [
+        '2024-01-01', '2024-01-01', '2024-01-08', '2024-01-29',
+    ]
+    assert period_start(frame.created, 'month').astype(str).tolist() == [
+        '2024-01-01', '2024-01-01', '2024-01-01', '2024-02-01',
+    ]
+
+
+def test_period_start_rejects_unknown_period(frame):
+    with pytest.raises(ValueError):
+        period_start(frame.created, 'year')
+
+
+def test_summary(frame):
+    assert summary(frame) == {
+        'orders': 4,
+        'revenue': 210.0,
+        'average_order_value': 52.5,
+        'median_order_value': 45.0,
+        'units': 10,
+        'customers': 2,
+        'guest_orders': 1,
+        'repeat_customer_rate': 0.5,
+        'first_order_at': '2024-01-01',
+        'last_order_at': '2024-02-03',
+        'currencies': ['USD'],
+    }
+
+
+def test_summary_of_no_orders():
+    assert summary(OrderFrame([]))['orders'] == 0
+
+
+def test_revenue_by_week(frame):
+    assert revenue_by_period(frame, 'week') == [
+        {'period': '2024-01-01', 'orders': 2, 'revenue': 150.0, 'average_order_value': 75.0, 'units': 5},
+        {'period': '2024-01-08', 'orders': 1, 'revenue': 20.0, 'average_order_value': 20.0, 'units': 1},
+        {'period': '2024-01-29', 'orders': 1, 'revenue': 40.0, 'average_order_value': 40.0, 'units': 4},
+    ]
+
+
+def test_top_products_by_revenue_uses_what_was_paid(frame):
+    # Discounted line totals, not the variants' current prices; 145 in all
+    assert top_products(frame, 'revenue') == [
+        {'product': 'SKU-1', 'title': 'Mug', 'revenue': 70.0, 'units': 7, 'orders': 2, 'revenue_share': 0.4828},
+        {'product': 'SKU-2', 'title': 'Cap', 'revenue': 55.0, 'units': 2, 'orders': 2, 'revenue_share': 0.3793},
+        {'product': 'SKU-3', 'title': 'Pen', 'revenue': 20.0, 'units': 1, 'orders': 1, 'revenue_share': 0.1379},
+    ]
+
+
+def test_line_revenue_falls_back_to_unit_price_then_variant_price():
+    unit_only = dict(_line('SKU-1', 'Mug', 3, 10, 0), discountedTotalSet=None)
+    legacy = {'title': 'Cap', 'quantity': 2, 'variant': {'sku': 'SKU-2', 'price': '7.50'}}
+    frame = OrderFrame([_order('2024-01-01T00:00:00Z', 45, 'A', [unit_only, legacy])])
+    assert frame.line_revenue.tolist() == [30.0, 15.0]
+
+
+def test_top_products_by_orders_counts_repeated_lines_once(frame):
+    # SKU-1 and SKU-2 tie on two orders each; ties keep first-seen order
+    ranked = top_products(frame, 'orders', limit=2)
+    assert [(p['product'], p['orders']) for p in ranked] == [('SKU-1', 2), ('SKU-2', 2)]
+
+
+def test_top_products_by_quantity(frame):
+    assert [p['product'] for p in top_products(frame, 'quantity')] == ['SKU-1', 'SKU-2', 'SKU-3']
+
+
+def test_weekly_cohorts(frame):
+    # A: weeks 0 and 4 of the 2024-01-01 cohort; B: the 2024-01-08 cohort; the guest is left out
+    assert cohorts(frame, 'week') == [
+        {'cohort': '2024-01-01', 'customers': 1, 'active_customers': [1, 0, 0, 0, 1],
+         'retention': [1.0, 0.0, 0.0, 0.0, 1.0], 'revenue': [100.0, 0.0, 0.0, 0.0, 40.0]},
+        {'cohort': '2024-01-08', 'customers': 1, 'active_customers': [1],
+         'retention': [1.0], 'revenue': [20.0]},
+    ]
+
+
+def test_monthly_cohorts(frame):
+    assert cohorts(frame, 'month') == [
+        {'cohort': '2024-01', 'customers': 2, 'active_customers': [2, 1],
+         'retention': [1.0, 0.5], 'revenue': [120.0, 40.0]},
+    ]
+
+
+def test_cohorts_ignore_guest_only_frames():
+    assert cohorts(OrderFrame([ORDERS[1]])) == []
+    assert np.array_equal(OrderFrame([ORDERS[1]]).customer, [-1])
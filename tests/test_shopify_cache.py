@@ -0,0 +1,57 @@
+from src.routes import shopify
+from src.services.shopify_cache import ShopifyResponseCache, shopify_cache
+
+QUERY = 'query { products(first: 1) { edges { node { id } } } }'
+RESULT = {'data': {'products': {'edges': []}}}
+
+
+def test_store_keeps_results_fetched_at_the_current_version():
+    cache = ShopifyResponseCache()
+    key, _hit, _value = cache.lookup(QUERY)
+    cache.store(key, QUERY, RESULT, data_version=cache.data_version)
+    assert cache.lookup(QUERY)[1:] == (True, RESULT)
+
+
+def test_store_refuses_results_fetched_before_an_invalidation():
+    cache = ShopifyResponseCache()
+    key, _hit, _value = cache.lookup(QUERY)
+    version = cache.data_version
+    cache.invalidate(['products'])
+    cache.store(key, QUERY, RESULT, data_version=version)
+    assert cache.lookup(QUERY)[1] is False
+    assert cache.stats()['stale_stores'] == 1
+
+
+def test_read_overtaken_by_a_mutation_is_not_cached(monkeypatch):
+    shopify_cache.invalidate()
+    calls = []
+
+    def execute(query, variables=None, api_version=None):
+        calls.append(query)
+        if len(calls) == 1:
+            # A mutation lands while the read is on the wire
+            shopify_cache.invalidate_for_mutation('mutation { productCreate(input: {}) { product { id } } }')
+        return RESULT
+
+    monkeypatch.setattr(shopify, '_execute_shopify_request', execute)
+    assert shopify.make_shopify_request(QUERY) == RESULT
+    assert shopify.make_shopify_request(QUERY) == RESULT
+    assert len(calls) == 2
+    # The second read started after the mutation and was cached
+    assert shopify.make_shopify_request(QUERY) == RESULT
+    assert len(calls) == 2
+
+
+def test_ttl_multiplier_only_scales_version_checked_stores(monkeypatch):
+    from src.services import shopify_cache as cache_module
+    monkeypatch.setattr(cache_module, 'SHOPIFY_CACHE_TTL_MULTIPLIER', 10)
+    assert cache_module.query_ttl(['products']) == 600
+    assert cache_module.query_ttl(['products'], scaled=False) == 60
+
+    cache = ShopifyResponseCache()
+    stored = []
+    monkeypatch.setattr(cache.entries, 'set', lambda key, value, ttl, tags=(): stored.append(ttl))
+    key, _hit, _value = cache.lookup(QUERY)
+    cache.store(key, QUERY, RESULT)
+    cache.store(key, QUERY, RESULT, data_version=cache.data_version)
+    assert stored == [60, 600]
@@ -0,0 +1,29 @@
+from src.services.shopify_throttle import SHOPIFY_DEFAULT_QUERY_COST, CostBucket
+
+
+def _response(requested):
+    return {'extensions': {'cost': {
+        'requestedQueryCost': requested,
+        'throttleStatus': {'maximumAvailable': 1000.0, 'currentlyAvailable': 1000.0, 'restoreRate': 50.0},
+    }}}
+
+
+def test_learned_costs_are_reused():
+    bucket = CostBucket()
+    bucket.settle(0, _response(120), key=('query a', 10))
+    assert bucket.estimate_cost(('query a', 10)) == 120
+    assert bucket.estimate_cost(('query a', 20)) == SHOPIFY_DEFAULT_QUERY_COST
+
+
+def test_learned_costs_are_bounded_and_keep_recently_used_queries():
+    bucket = CostBucket(max_query_costs=3)
+    for size in range(3):
+        bucket.settle(0, _response(10 * (size + 1)), key=(f'mutation batch{size}', None))
+    # Touch the oldest so the next insert evicts batch1 instead
+    assert bucket.estimate_cost(('mutation batch0', None)) == 10
+    bucket.settle(0, _response(40), key=('mutation batch3', None))
+
+    assert bucket.stats()['known_query_costs'] == 3
+    assert bucket.estimate_cost(('mutation batch0', None)) == 10
+    assert bucket.estimate_cost(('mutation batch1', None)) == SHOPIFY_DEFAULT_QUERY_COST
+    assert bucket.estimate_cost(('mutation batch3', None)) == 40
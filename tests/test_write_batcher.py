@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import User, db
+from src.services.storage import WriteBatcher
+
+
+def _batcher(app, **kwargs):
+    batcher = WriteBatcher(**kwargs)
+    batcher.init_app(app)
+    return batcher
+
+
+def _add_user(name):
+    return lambda: db.session.execute(
+        insert(User).values(username=name, email=f'{name}@example.com')
+    ).inserted_primary_key[0]
+
+
+def _usernames(app):
+    with app.app_context():
+        return sorted(user.username for user in User.query.all())
+
+
+def _run_in_threads(batcher, fns):
+    """Call batcher.run for each fn in its own thread; returns (results, errors) by index"""
+    results = [None] * len(fns)
+    errors = [None] * len(fns)
+
+    def call(index, fn):
+        try:
+            results[index] = batcher.run(fn)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=call, args=(index, fn)) for index, fn in enumerate(fns)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def _queue_behind_gate(batcher, fns):
+    # Hold the writer on a first job so everything after it lands in one batch
+    entered = threading.Event()
+    release = threading.Event()
+
+    def gate():
+        entered.set()
+        release.wait(5)
+
+    gate_threads, _results, _errors = _run_in_threads(batcher, [gate])
+    assert entered.wait(5)
+    threads, results, errors = _run_in_threads(batcher, fns)
+    while batcher.stats()['queued'] < len(fns):
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in gate_threads + threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_run_returns_each_result_from_one_shared_commit(app):
+    batcher = _batcher(app, enabled=True)
+    results, errors = _queue_behind_gate(batcher, [_add_user(f'user{i}') for i in range(5)])
+
+    assert errors == [None] * 5
+    assert sorted(results) == [1, 2, 3, 4, 5]
+    assert _usernames(app) == [f'user{i}' for i in range(5)]
+    stats = batcher.stats()
+    assert stats['largest_batch'] == 5
+    assert stats['batches'] == 2
+    assert stats['jobs'] == 6
+
+
+def test_bad_job_fails_alone(app):
+    batcher = _batcher(app, enabled=True)
+    results, errors = _queue_behind_gate(batcher, [
+        _add_user('first'),
+        _add_user('first'),  # duplicate username
+        _add_user('second'),
+    ])
+
+    assert errors[0] is None and errors[2] is None
+    assert isinstance(errors[1], IntegrityError)
+    assert results[0] is not None and results[2] is not None
+    assert _usernames(app) == ['first', 'second']
+    stats = batcher.stats()
+    assert stats['retried_batches'] == 1
+    assert stats['failed_jobs'] == 1
+
+
+def test_inline_mode_commits_in_the_callers_session(app):
+    batcher = _batcher(app, enabled=False)
+    with app.app_context():
+        assert batcher.run(_add_user('inline')) == 1
+        with pytest.raises(IntegrityError):
+            batcher.run(_add_user('inline'))
+        # The failed write was rolled back; the session is usable again
+        assert batcher.run(_add_user('after')) == 2
+
+    assert _usernames(app) == ['after', 'inline']
+    assert batcher.stats()['batches'] == 0
+
+
+def test_queued_inserts_are_written_by_flush(app):
+    batcher = _batcher(app, enabled=True)
+    batcher.insert(User, [{'username': f'bulk{i}', 'email': f'bulk{i}@example.com'} for i in range(3)])
+    batcher.insert(User, [{'username': 'bulk3', 'email': 'bulk3@example.com'}])
+    batcher.flush()
+
+    assert _usernames(app) == ['bulk0', 'bulk1', 'bulk2', 'bulk3']
+    assert batcher.stats()['rows'] == 4